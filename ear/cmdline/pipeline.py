@@ -0,0 +1,144 @@
+import threading
+import time
+from six.moves import queue
+
+
+# time spent in the current thread which has been attributed to a stage, used
+# to exclude time spent in inner stages from the busy time of outer stages
+_thread_local = threading.local()
+
+
+def _get_accounted():
+    return getattr(_thread_local, "accounted", 0.0)
+
+
+class PipelineStage(object):
+    """Iterate through an iterable in a background thread, passing its items
+    to the consumer through a bounded queue, so that producing the items
+    overlaps with consuming them.
+
+    This also measures the throughput of the stage: the time spent producing
+    items (excluding time spent in or waiting for other stages that iterable
+    consumes from), and the number of samples in the items produced.
+
+    Parameters:
+        name (str): name of the stage, for reporting
+        iterable (iterable of arrays): items to produce; the length of each
+            item is the number of samples in it. If this is a generator, it is
+            closed in the background thread once iteration stops.
+        maxsize (int): maximum number of items to hold in the queue
+        threaded (bool): if False, iterate in the consumer thread instead,
+            while still measuring the throughput
+
+    Attributes:
+        busy_time (float): time in seconds spent producing items
+        wait_time (float): time in seconds that the consumer spent waiting
+            for items
+        n_samples (int): number of samples produced
+    """
+
+    def __init__(self, name, iterable, maxsize=4, threaded=True):
+        self.name = name
+        self.iterable = iterable
+        self.maxsize = maxsize
+        self.threaded = threaded
+
+        self.busy_time = 0.0
+        self.wait_time = 0.0
+        self.n_samples = 0
+
+    def _produce(self):
+        """Get the next item from iterable, updating the statistics; raises
+        StopIteration at the end."""
+        start_time = time.time()
+        start_accounted = _get_accounted()
+
+        try:
+            item = next(self._iterator)
+        finally:
+            elapsed = time.time() - start_time
+            self.busy_time += elapsed - (_get_accounted() - start_accounted)
+            _thread_local.accounted = start_accounted + elapsed
+
+        self.n_samples += len(item)
+        return item
+
+    def _run(self, item_queue, stop):
+        """Thread function: put tuples of (item, None) on item_queue, followed
+        by (None, exception) if an exception was raised, or (None, None)."""
+        end = (None, None)
+        try:
+            while not stop.is_set():
+                try:
+                    item = (self._produce(), None)
+                except StopIteration:
+                    break
+
+                while not stop.is_set():
+                    try:
+                        item_queue.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        pass
+        except Exception as e:
+            end = (None, e)
+        finally:
+            if hasattr(self._iterator, "close"):
+                self._iterator.close()
+
+        item_queue.put(end)
+
+    def __iter__(self):
+        self._iterator = iter(self.iterable)
+
+        if not self.threaded:
+            while True:
+                try:
+                    yield self._produce()
+                except StopIteration:
+                    return
+
+        # one extra space for the end marker
+        item_queue = queue.Queue(self.maxsize + 1)
+        stop = threading.Event()
+        thread = threading.Thread(target=self._run, args=(item_queue, stop))
+        thread.daemon = True
+        thread.start()
+
+        try:
+            while True:
+                start_time = time.time()
+                item, exception = item_queue.get()
+                wait_time = time.time() - start_time
+                self.wait_time += wait_time
+                _thread_local.accounted = _get_accounted() + wait_time
+
+                if item is None:
+                    if exception is not None:
+                        raise exception
+                    return
+
+                yield item
+        finally:
+            # if the consumer stopped early, stop the thread, and wait for it
+            # so that the iterable is closed
+            stop.set()
+            while thread.is_alive():
+                try:
+                    item_queue.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            thread.join()
+
+    def throughput(self):
+        """Get the throughput in samples per second, or None if no time was
+        spent."""
+        return self.n_samples / self.busy_time if self.busy_time > 0 else None
+
+    def format_stats(self, sample_rate):
+        """Get a summary of the statistics for this stage as a string."""
+        throughput = self.throughput()
+        if throughput is None:
+            return "{name}: {n} samples".format(name=self.name, n=self.n_samples)
+        return "{name}: {n} samples in {t:.3f}s busy, {speed:.1f}x real time".format(
+            name=self.name, n=self.n_samples, t=self.busy_time, speed=throughput / sample_rate)
@@ -1,11 +1,17 @@
 from __future__ import print_function
 import argparse
+import multiprocessing
+import numpy as np
+import os
+import shutil
 import sys
-from attr import attrs, attrib, Factory
+import tempfile
+from attr import attrs, attrib, evolve, Factory
 import scipy.sparse
 from itertools import chain
 from ..core import bs2051, layout, Renderer
 from ..core.monitor import PeakMonitor
+from .pipeline import PipelineStage
 from ..core.metadata_processing import preprocess_rendering_items, convert_objects_to_cartesian, convert_objects_to_polar
 from ..core.select_items import select_rendering_items
 from ..fileio import openBw64, openBw64Adm
@@ -31,12 +37,22 @@ class OfflineRenderDriver(object):
     enable_block_duration_fix = attrib()
     config = attrib(default=Factory(dict))
 
+    lazy_block_formats = attrib(default=False)
+    block_format_columns = attrib(default=False)
+
     programme_id = attrib(default=None)
     complementary_object_ids = attrib(default=Factory(list))
 
     conversion_mode = attrib(default=None)
 
-    blocksize = 8192
+    jobs = attrib(default=1)
+
+    pipeline = attrib(default=False)
+    report_throughput = attrib(default=False)
+
+    blocksize = attrib(default=8192)
+    # size in bytes of the buffer used to coalesce writes to the output file
+    write_buffer_size = attrib(default=2**20)
 
     @classmethod
     def add_args(cls, parser):
@@ -54,6 +70,13 @@ class OfflineRenderDriver(object):
                             help="fail if an overload condition is detected in the output")
         parser.add_argument("--enable-block-duration-fix", action="store_true",
                             help="automatically try to fix faulty block format durations")
+        parser.add_argument("--lazy-block-formats", action="store_true",
+                            help="parse each audioBlockFormat when it is rendered, rather than all of them "
+                                 "when the file is opened")
+        parser.add_argument("--block-format-columns", action="store_true",
+                            help="store Objects audioBlockFormats as arrays, which uses less memory; with the "
+                                 "gain_batch_size object renderer option, gains are calculated straight from "
+                                 "these arrays")
 
         parser.add_argument("--programme", metavar="id",
                             help="select an audioProgramme to render by ID")
@@ -63,6 +86,14 @@ class OfflineRenderDriver(object):
         parser.add_argument('--apply-conversion', choices=("to_cartesian", "to_polar"),
                             help='Apply conversion to Objects audioBlockFormats before rendering')
 
+        parser.add_argument("-j", "--jobs", type=int, metavar="N", default=1,
+                            help="split the input into N segments and render them in parallel processes "
+                                 "(default: 1)")
+        parser.add_argument("--pipeline", action="store_true",
+                            help="read, render and write in separate threads")
+        parser.add_argument("--report-throughput", action="store_true",
+                            help="print the throughput of the read, render and write stages")
+
     @classmethod
     def from_args(cls, args):
         return cls(
@@ -71,9 +102,14 @@ class OfflineRenderDriver(object):
             output_gain_db=args.output_gain_db,
             fail_on_overload=args.fail_on_overload,
             enable_block_duration_fix=args.enable_block_duration_fix,
+            lazy_block_formats=args.lazy_block_formats,
+            block_format_columns=args.block_format_columns,
             programme_id=args.programme,
             complementary_object_ids=args.comp_object,
             conversion_mode=args.apply_conversion,
+            jobs=args.jobs,
+            pipeline=args.pipeline,
+            report_throughput=args.report_throughput,
         )
 
     def load_output_layout(self):
@@ -162,32 +198,186 @@ class OfflineRenderDriver(object):
 
         return selected_items
 
-    def render_input_file(self, infile, spkr_layout, upmix=None):
+    def render_input_file(self, infile, spkr_layout, upmix=None, start=0, end=None, stages=None):
         """Get sample blocks of the input file after rendering.
 
         Parameters:
             infile (Bw64AdmReader): file to read from
             spkr_layout (Layout): layout to render to
             upmix (sparse array or None): optional upmix to apply
+            start (int): index of the first output sample to produce; must be
+                a multiple of blocksize
+            end (int or None): index after the last output sample to
+                produce, or None to render to the end of the file
+            stages (list or None): if not None, reading the input is done in
+                a PipelineStage (threaded if self.pipeline), which is appended
+                to this list
 
         Yields:
             2D sample blocks
+
+        Note:
+            If start is not 0, rendering starts some blocks before start to
+            fill the internal state of the renderer, so that the output is the
+            same as the corresponding part of a complete render.
         """
+        assert start % self.blocksize == 0, "start must be a multiple of blocksize"
+        if end is None:
+            end = len(infile)
+
         renderer = Renderer(spkr_layout, **self.config)
-        renderer.set_rendering_items(self.get_rendering_items(infile.adm))
+        try:
+            renderer.set_rendering_items(self.get_rendering_items(infile.adm))
+
+            # position of the next output sample, starting at least history
+            # samples before start, on a multiple of both blocksize (so that
+            # the renderer is given the same blocks as in a complete render)
+            # and the alignment required by skip_to
+            output_pos = 0
+            if start > 0:
+                history = renderer.history_length(infile.sampleRate)
+                step = self.blocksize
+                while step % renderer.skip_to_alignment:
+                    step += self.blocksize
+                output_pos = max(0, (start - history) // step * step)
+
+                renderer.skip_to(infile.sampleRate, output_pos)
+                infile.seek(output_pos)
+
+            input_blocks = infile.iter_sample_blocks(self.blocksize, renderer.dtype)
+            if stages is not None:
+                input_blocks = PipelineStage("read", input_blocks, threaded=self.pipeline)
+                stages.append(input_blocks)
+
+            for input_samples in chain(input_blocks, [None]):
+                if input_samples is None:
+                    output_samples = renderer.get_tail(infile.sampleRate, infile.channels)
+                else:
+                    output_samples = renderer.render(infile.sampleRate, input_samples)
+
+                # discard samples outside of start:end
+                block_start = output_pos
+                output_pos += len(output_samples)
+                output_samples = output_samples[max(start - block_start, 0):max(end - block_start, 0)]
+
+                output_samples *= self.output_gain_linear
+
+                if upmix is not None:
+                    output_samples *= upmix
+
+                yield output_samples
+
+                if output_pos >= end:
+                    break
+        finally:
+            renderer.close()
+
+    def get_segments(self, n_samples):
+        """Split n_samples samples into self.jobs segments which start on
+        block boundaries.
+
+        Returns:
+            list of (start, end) tuples
+        """
+        n_blocks = (n_samples + self.blocksize - 1) // self.blocksize
+        n_segments = min(self.jobs, n_blocks)
+        if n_segments == 0:
+            return []
+
+        block_bounds = [(n_blocks * i) // n_segments for i in range(n_segments + 1)]
+        return [(start_block * self.blocksize, min(end_block * self.blocksize, n_samples))
+                for start_block, end_block in zip(block_bounds[:-1], block_bounds[1:])]
+
+    def render_segment(self, input_file, spkr_layout, upmix, n_channels, start, end, output_path):
+        """Render samples start:end of input_file, saving the result to
+        output_path in .npy format."""
+        # map the input file, so that the processes share the same memory
+        with openBw64Adm(input_file, self.enable_block_duration_fix, use_mmap=True,
+                         lazy_block_formats=self.lazy_block_formats,
+                         block_format_columns=self.block_format_columns,
+                         lazy_common_definitions=True) as infile:
+            output = None
+            output_pos = 0
+            for output_block in self.render_input_file(infile, spkr_layout, upmix, start, end):
+                # store samples in the same type as the renderer output, so
+                # that the written file is the same as a serial render
+                if output is None:
+                    output = np.lib.format.open_memmap(output_path, mode="w+", dtype=output_block.dtype,
+                                                       shape=(end - start, n_channels))
+                output[output_pos:output_pos + len(output_block)] = output_block
+                output_pos += len(output_block)
+            assert output_pos == end - start
+
+            output.flush()
+            del output
+
+    def iter_output_blocks(self, input_file, infile, spkr_layout, upmix, n_channels, stages=None):
+        """Get rendered sample blocks for the whole of input_file, rendering
+        segments in self.jobs processes if required.
+
+        Parameters:
+            stages (list or None): passed to render_input_file when rendering
+                in this process
 
-        for input_samples in chain(infile.iter_sample_blocks(self.blocksize), [None]):
-            if input_samples is None:
-                output_samples = renderer.get_tail(infile.sampleRate, infile.channels)
-            else:
-                output_samples = renderer.render(infile.sampleRate, input_samples)
+        Yields:
+            2D sample blocks
+        """
+        segments = self.get_segments(len(infile))
+
+        if len(segments) <= 1:
+            for output_block in self.render_input_file(infile, spkr_layout, upmix, stages=stages):
+                yield output_block
+            return
+
+        # the speakers file has already been read and can not be pickled
+        driver = evolve(self, speakers_file=None)
+
+        tmp_dir = tempfile.mkdtemp()
+        pool = multiprocessing.Pool(min(self.jobs, len(segments)))
+        try:
+            segment_args = [(driver, input_file, spkr_layout, upmix, n_channels, start, end,
+                             os.path.join(tmp_dir, "segment_{i}.npy".format(i=i)))
+                            for i, (start, end) in enumerate(segments)]
+
+            # imap yields when each segment is finished, in order
+            for segment, _ in zip(segment_args, pool.imap(_render_segment, segment_args)):
+                output_path = segment[-1]
+                output = np.load(output_path, mmap_mode="r")
+                for block_start in range(0, len(output), self.blocksize):
+                    yield np.array(output[block_start:block_start + self.blocksize])
+                del output
+                os.remove(output_path)
+        finally:
+            pool.terminate()
+            pool.join()
+            shutil.rmtree(tmp_dir)
+
+    def write_pipelined(self, outfile, output_blocks, stages, sample_rate):
+        """Write output blocks to outfile, with the read, render and write
+        stages in separate threads if self.pipeline is set, and report the
+        throughput of each stage if self.report_throughput is set.
+
+        Parameters:
+            outfile (Bw64Writer): file to write to
+            output_blocks (iterable of arrays): blocks to write
+            stages (list of PipelineStage): earlier stages used by
+                output_blocks, to report along with the render and write stages
+            sample_rate (int): sample rate, for reporting
+        """
+        render_stage = PipelineStage("render", output_blocks, threaded=self.pipeline)
 
-            output_samples *= self.output_gain_linear
+        def write_blocks():
+            for output_block in render_stage:
+                outfile.write(output_block)
+                yield output_block
 
-            if upmix is not None:
-                output_samples *= upmix
+        write_stage = PipelineStage("write", write_blocks(), threaded=False)
+        for output_block in write_stage:
+            pass
 
-            yield output_samples
+        if self.report_throughput:
+            for stage in stages + [render_stage, write_stage]:
+                print(stage.format_stats(sample_rate), file=sys.stderr)  # noqa
 
     def run(self, input_file, output_file):
         """Render input_file to output_file."""
@@ -195,21 +385,38 @@ class OfflineRenderDriver(object):
 
         output_monitor = PeakMonitor(n_channels)
 
-        with openBw64Adm(input_file, self.enable_block_duration_fix) as infile:
-            formatInfo = FormatInfoChunk(formatTag=1,
+        with openBw64Adm(input_file, self.enable_block_duration_fix,
+                         lazy_block_formats=self.lazy_block_formats,
+                         block_format_columns=self.block_format_columns,
+                         lazy_common_definitions=True) as infile:
+            formatInfo = FormatInfoChunk(formatTag=infile.formatTag,
                                          channelCount=n_channels,
                                          sampleRate=infile.sampleRate,
                                          bitsPerSample=infile.bitdepth)
-            with openBw64(output_file, "w", formatInfo=formatInfo) as outfile:
-                for output_block in self.render_input_file(infile, spkr_layout, upmix):
-                    output_monitor.process(output_block)
-                    outfile.write(output_block)
+            with openBw64(output_file, "w", formatInfo=formatInfo, writeBufferSize=self.write_buffer_size) as outfile:
+                if self.pipeline or self.report_throughput:
+                    stages = []
+                    output_blocks = self.iter_output_blocks(input_file, infile, spkr_layout, upmix, n_channels,
+                                                            stages=stages)
+                    self.write_pipelined(outfile, output_blocks, stages, infile.sampleRate)
+                else:
+                    for output_block in self.iter_output_blocks(input_file, infile, spkr_layout, upmix, n_channels):
+                        outfile.write(output_block)
+
+            # the writer measures the peak level while encoding
+            output_monitor.process_peak(outfile.peak)
 
         output_monitor.warn_overloaded()
         if self.fail_on_overload and output_monitor.has_overloaded():
             sys.exit("error: output overloaded")
 
 
+def _render_segment(args):
+    """Call OfflineRenderDriver.render_segment in a worker process."""
+    driver, segment_args = args[0], args[1:]
+    driver.render_segment(*segment_args)
+
+
 def parse_command_line():
     parser = argparse.ArgumentParser(description="EBU ADM renderer")
 
@@ -0,0 +1,42 @@
+import numpy as np
+import pytest
+from ..pipeline import PipelineStage
+
+
+@pytest.mark.parametrize("threaded", [False, True])
+def test_pipeline_stage(threaded):
+    blocks = [np.zeros(n) for n in range(10)]
+    read = PipelineStage("read", iter(blocks), maxsize=2, threaded=threaded)
+    double = PipelineStage("double", (block * 2 for block in read), maxsize=2, threaded=threaded)
+
+    assert [len(block) for block in double] == list(range(10))
+    assert read.n_samples == double.n_samples == sum(range(10))
+
+
+def test_pipeline_stage_exception():
+    def blocks():
+        yield np.zeros(1)
+        raise ValueError("error in stage")
+
+    stage = PipelineStage("read", blocks())
+    with pytest.raises(ValueError, match="error in stage"):
+        list(stage)
+
+
+def test_pipeline_stage_stop_early():
+    closed = []
+
+    def blocks():
+        try:
+            while True:
+                yield np.zeros(1)
+        finally:
+            closed.append(True)
+
+    stage = PipelineStage("read", blocks(), maxsize=1)
+    iterator = iter(stage)
+    next(iterator)
+
+    # stopping the stage stops the thread, which closes the generator
+    iterator.close()
+    assert closed
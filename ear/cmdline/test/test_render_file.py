@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from ..render_file import OfflineRenderDriver
+from ...fileio import openBw64Adm
+from ...test.test_integrate import bwf_file
+
+
+def make_driver(**kwargs):
+    # use small blocks so that the test file is split into many segments
+    kwargs.setdefault("blocksize", 512)
+    return OfflineRenderDriver(
+        target_layout="4+5+0",
+        speakers_file=None,
+        output_gain_db=0.0,
+        fail_on_overload=False,
+        enable_block_duration_fix=False,
+        **kwargs)
+
+
+def test_segments():
+    driver = make_driver(jobs=3)
+    assert driver.get_segments(2000) == [(0, 512), (512, 1024), (1024, 2000)]
+    assert driver.get_segments(600) == [(0, 512), (512, 600)]
+    assert driver.get_segments(0) == []
+
+
+# 1000 is not a multiple of the object renderer block size, so the rendering
+# must start on a multiple of both
+@pytest.mark.parametrize("blocksize", [512, 1000])
+def test_render_segments(blocksize):
+    driver = make_driver(jobs=3, blocksize=blocksize)
+    spkr_layout, upmix, n_channels = driver.load_output_layout()
+
+    with openBw64Adm(bwf_file) as infile:
+        n_samples = len(infile)
+        expected = np.concatenate(list(driver.render_input_file(infile, spkr_layout, upmix)))
+    assert expected.shape == (n_samples, n_channels)
+
+    segments = driver.get_segments(n_samples)
+    assert len(segments) == 3
+
+    segment_outputs = []
+    for start, end in segments:
+        with openBw64Adm(bwf_file) as infile:
+            segment_outputs.append(np.concatenate(list(driver.render_input_file(infile, spkr_layout, upmix,
+                                                                                start, end))))
+
+    np.testing.assert_array_equal(np.concatenate(segment_outputs), expected)
+
+
+def test_run_jobs(tmpdir):
+    serial_file = str(tmpdir / "serial.wav")
+    parallel_file = str(tmpdir / "parallel.wav")
+
+    make_driver().run(bwf_file, serial_file)
+    make_driver(jobs=3).run(bwf_file, parallel_file)
+
+    assert open(parallel_file, "rb").read() == open(serial_file, "rb").read()
+
+
+def test_render_block_format_columns():
+    outputs = []
+    for options in [dict(), dict(block_format_columns=True, config=dict(object_renderer_opts=dict(gain_batch_size=64)))]:
+        driver = make_driver(**options)
+        spkr_layout, upmix, n_channels = driver.load_output_layout()
+
+        with openBw64Adm(bwf_file, block_format_columns=driver.block_format_columns) as infile:
+            outputs.append(np.concatenate(list(driver.render_input_file(infile, spkr_layout, upmix))))
+
+    np.testing.assert_allclose(outputs[1], outputs[0], atol=1e-10)
+
+
+def test_render_float32():
+    outputs = []
+    for dtype in ["float64", "float32"]:
+        driver = make_driver(config=dict(dtype=dtype))
+        spkr_layout, upmix, n_channels = driver.load_output_layout()
+
+        with openBw64Adm(bwf_file) as infile:
+            outputs.append(np.concatenate(list(driver.render_input_file(infile, spkr_layout, upmix))))
+
+    output_64, output_32 = outputs
+    assert output_32.dtype == np.float32
+
+    # documented error bound in Renderer
+    np.testing.assert_allclose(output_32, output_64, rtol=0, atol=2**-24)
+
+
+def test_run_pipeline(tmpdir, capsys):
+    serial_file = str(tmpdir / "serial.wav")
+    pipeline_file = str(tmpdir / "pipeline.wav")
+
+    make_driver().run(bwf_file, serial_file)
+    make_driver(pipeline=True, report_throughput=True).run(bwf_file, pipeline_file)
+
+    assert open(pipeline_file, "rb").read() == open(serial_file, "rb").read()
+
+    stats = capsys.readouterr().err
+    for stage in ["read", "render", "write"]:
+        assert "{stage}: ".format(stage=stage) in stats
@@ -10,19 +10,64 @@ class BlockAligner(object):
         - one call to add with a block and delay for each input stream
         - one call to get
 
+    Samples are summed into a circular buffer, so the cost of each call only
+    depends on the number of samples added or returned. The buffer grows if
+    the samples added do not fit, which normally only happens on the first
+    few blocks, as its required size is determined by the difference between
+    the delays of the input streams and the block size.
+
     Args:
         n_channels (int): number of channels in all inputs and outputs.
+        start (int): index of the first output sample; samples added before
+            this are discarded.
+        dtype (numpy dtype): type of output samples.
+        capacity (int): initial size of the circular buffer in samples.
     """
 
-    def __init__(self, n_channels):
-        self.buf = np.zeros((0, n_channels))
-        # sample number of the first sample in the buffer
-        self.buf_start = 0
+    def __init__(self, n_channels, start=0, dtype=np.float64, capacity=0):
+        self.buf = np.zeros((capacity, n_channels), dtype=dtype)
+        self.start = start
+        # sample number of the first sample in the buffer; sample number s is
+        # stored in self.buf[s % len(self.buf)]
+        self.buf_start = start
         # sample number of the end of the earliest buffer added, or None if we
         # are at the start of a round. This indicates the end of the completed
         # region in buf.
         self.first_end = None
 
+    def _ring_slices(self, start, n):
+        """Get pairs of slices of self.buf and of a block of n samples, such
+        that the block is stored in the buffer starting at sample number
+        start."""
+        if n == 0:
+            return []
+
+        capacity = len(self.buf)
+        buf_start = start % capacity
+        first_len = min(n, capacity - buf_start)
+
+        slices = [(slice(buf_start, buf_start + first_len), slice(0, first_len))]
+        if first_len < n:
+            slices.append((slice(0, n - first_len), slice(first_len, n)))
+        return slices
+
+    def _read(self, n, out=None):
+        """Copy n samples starting at buf_start from the buffer."""
+        if out is None:
+            out = np.empty((n, self.buf.shape[1]), dtype=self.buf.dtype)
+        for buf_slice, samples_slice in self._ring_slices(self.buf_start, n):
+            out[samples_slice] = self.buf[buf_slice]
+        return out
+
+    def _grow(self, capacity):
+        """Re-allocate the buffer to hold at least capacity samples."""
+        old_samples = self._read(len(self.buf))
+
+        self.buf = np.zeros((max(capacity, 2 * len(self.buf)), self.buf.shape[1]), dtype=self.buf.dtype)
+
+        for buf_slice, samples_slice in self._ring_slices(self.buf_start, len(old_samples)):
+            self.buf[buf_slice] = old_samples[samples_slice]
+
     def add(self, start, samples):
         """Add a block of samples to be summed into the output.
 
@@ -31,9 +76,9 @@ class BlockAligner(object):
                 in the output; may be negative.
             samples (ndarray of n,k floats): n samples for k channels.
         """
-        # strip off any samples before time 0
+        # strip off any samples before the start
         if start < self.buf_start:
-            assert self.buf_start == 0, "samples in past only allowed before time 0"
+            assert self.buf_start == self.start, "samples in past only allowed before the start"
 
             to_discard = min(self.buf_start - start, len(samples))
             samples = samples[to_discard:]
@@ -43,38 +88,46 @@ class BlockAligner(object):
 
         end = start + len(samples)
 
-        # start and end indices of samples in self.buf
-        start_buf = start - self.buf_start
-        end_buf = end - self.buf_start
+        if len(samples):
+            assert start >= self.buf_start
 
-        if end_buf > len(self.buf):
-            self.buf.resize((end_buf, self.buf.shape[1]), refcheck=False)
+            if end - self.buf_start > len(self.buf):
+                self._grow(end - self.buf_start)
 
-        if len(samples):
-            assert 0 <= start_buf and 0 < end_buf
-            self.buf[start_buf:end_buf] += samples
+            for buf_slice, samples_slice in self._ring_slices(start, len(samples)):
+                self.buf[buf_slice] += samples[samples_slice]
 
         if self.first_end is None or self.first_end > end:
             self.first_end = end
 
-    def get(self):
+    def get(self, out=None):
         """Get the samples that have been completely filled by all input streams.
 
+        Args:
+            out (ndarray of (m, k) or None): array to write the samples to; if
+                this is provided, the samples are written to the start of it,
+                and a view of the part that was written is returned. m must be
+                at least the number of samples returned.
+
         Returns:
             ndarray of (n, k): n samples for k channels.
 
             The number of samples returned varies according to the number of
             input samples and their times, and may be 0. The first sample
-            returned is the sample for time 0.
+            returned is the sample for time `start`.
         """
         assert self.first_end is not None
         # number of samples that are completely filled and can be returned
         n_samples = max(self.first_end - self.buf_start, 0)
 
-        # return the first n_samples samples, and shift the remaining samples to the start
-        to_return = self.buf[:n_samples].copy()
-        self.buf[:len(self.buf) - n_samples] = self.buf[n_samples:]
-        self.buf[len(self.buf) - n_samples:] = 0
+        if out is not None:
+            assert len(out) >= n_samples, "out is too short"
+            out = out[:n_samples]
+        to_return = self._read(n_samples, out)
+
+        # clear the returned samples so that their space can be re-used
+        for buf_slice, samples_slice in self._ring_slices(self.buf_start, n_samples):
+            self.buf[buf_slice] = 0
 
         self.buf_start += n_samples
         self.first_end = None
@@ -1,5 +1,49 @@
 import numpy as np
 
+try:
+    import scipy.fft as scipy_fft
+except ImportError:  # scipy < 1.4
+    scipy_fft = None
+
+
+class NumpyFFTBackend(object):
+    """FFT backend using numpy.fft; this always uses one thread, and produces
+    double precision output."""
+
+    def rfft(self, x, n=None):
+        return np.fft.rfft(x, n, axis=0)
+
+    def irfft(self, x, n=None):
+        return np.fft.irfft(x, n, axis=0)
+
+
+class ScipyFFTBackend(object):
+    """FFT backend using scipy.fft, which preserves single precision and can
+    use multiple threads.
+
+    Parameters:
+        workers (int): number of threads to use for each transform.
+    """
+
+    def __init__(self, workers=1):
+        assert scipy_fft is not None, "scipy.fft is not available; scipy >= 1.4 is required"
+        self.workers = workers
+
+    def rfft(self, x, n=None):
+        return scipy_fft.rfft(x, n, axis=0, workers=self.workers)
+
+    def irfft(self, x, n=None):
+        return scipy_fft.irfft(x, n, axis=0, workers=self.workers)
+
+
+def default_fft_backend(workers=1):
+    """Get the preferred FFT backend; this is ScipyFFTBackend if scipy.fft is
+    available, otherwise NumpyFFTBackend, in which case workers is ignored."""
+    if scipy_fft is not None:
+        return ScipyFFTBackend(workers)
+    else:
+        return NumpyFFTBackend()
+
 
 class OverlapSaveConvolver(object):
     """Objects that convolve a signal with a filter in fixed-size blocks.
@@ -9,15 +53,25 @@ class OverlapSaveConvolver(object):
         nchannels (int): number of channels to process
         f (array of (n, nchannels) floats): specification of nchannels length n
             FIR filters to convolve the input channels with.
+        dtype (numpy dtype): type of input and output samples and of the
+            filter state.
+        fft_backend: object with rfft(x, n) and irfft(x, n) methods which
+            transform along the first axis, like NumpyFFTBackend or
+            ScipyFFTBackend; if None, default_fft_backend() is used.
 
     Attributes:
         block_size (int): time domain block size for input and output blocks
-        filter_blocks_fd (list of complex arrays): blocks of block_size samples
-            of the filter, padded to 2*block_size and fft-ed
-        blocks_fd (list of complex arrays): The filter state; blocks_fd[i] will
-            form the output in i blocks time, so each input block is multiplied
-            by filter_blocks_fd[i] and summed into blocks_fd[i]. After each
-            block this queue is rotated to maintain this invariant.
+        filter_blocks_fd (complex array of (nblocks, block_size+1, nchannels)):
+            blocks of block_size samples of the filter, padded to 2*block_size
+            and fft-ed
+        blocks_fd (complex array of (nblocks, block_size+1, nchannels)): The
+            filter state, indexed circularly from first_block;
+            blocks_fd[(first_block + i) % nblocks] will form the output in i
+            blocks time, so each input block is multiplied by
+            filter_blocks_fd[i] and summed into it. After each block
+            first_block is advanced to maintain this invariant.
+        first_block (int): index in blocks_fd of the block that forms the next
+            output block
         input_block (array of (block_size*2, nchannels) floats): input to the
             forward fft; the first half contains the input for this block, and the
             second half contains the input from the previous block, so that the
@@ -25,25 +79,48 @@ class OverlapSaveConvolver(object):
             previous block.
     """
 
-    def __init__(self, block_size, nchannels, f):
+    def __init__(self, block_size, nchannels, f, dtype=np.float64, fft_backend=None):
         self.block_size = block_size
-        self.input_block = np.zeros((block_size * 2, nchannels))
+        self.dtype = np.dtype(dtype)
+        self.fft = default_fft_backend() if fft_backend is None else fft_backend
+        self.input_block = np.zeros((block_size * 2, nchannels), dtype=self.dtype)
 
-        self.filter_blocks_fd = []
-        self.blocks_fd = []
-        for start in range(0, len(f), self.block_size):
-            end = min(len(f), start + self.block_size)
-            block_fd = np.fft.rfft(f[start:end], self.block_size * 2, axis=0)
+        complex_dtype = np.result_type(self.dtype, np.complex64)
 
-            self.filter_blocks_fd.append(block_fd)
-            self.blocks_fd.append(np.zeros_like(block_fd))
+        nblocks = max((len(f) + block_size - 1) // block_size, 1)
+        f_padded = np.zeros((nblocks * block_size, nchannels), dtype=self.dtype)
+        f_padded[:len(f)] = f
+        self.filter_blocks_fd = np.stack([
+            self.fft.rfft(f_padded[start:start + block_size], block_size * 2).astype(complex_dtype)
+            for start in range(0, nblocks * block_size, block_size)])
 
-    def filter_block(self, in_block_td):
+        self.blocks_fd = np.zeros_like(self.filter_blocks_fd)
+        self.first_block = 0
+
+        # temporary for the product of the filters and each input block
+        self._product_fd = np.zeros_like(self.filter_blocks_fd)
+
+    @property
+    def history_length(self):
+        """Number of output samples from filter_block, starting with the
+        block containing a given input sample, which that sample can affect.
+
+        Each input block is multiplied by all filter blocks, and is also the
+        overlap in the input to the following block, so this is one block
+        longer than the filter rounded up to a whole number of blocks. After
+        this many samples of silent input, the state is all zero.
+        """
+        return (len(self.filter_blocks_fd) + 1) * self.block_size
+
+    def filter_block(self, in_block_td, out=None):
         """Filter a time domain block of samples.
 
         Parameters:
             in_block_td (array of (block_size, nchannels) floats): block of
                 time domain input samples
+            out (array of (block_size, nchannels) floats or None): array to
+                write the output samples to, which may be in_block_td; if None,
+                a new array is returned.
 
         Returns:
             array of (block_size, nchannels) floats: block of time domain
@@ -52,17 +129,25 @@ class OverlapSaveConvolver(object):
         self.input_block[self.block_size:] = self.input_block[:self.block_size]
         self.input_block[:self.block_size] = in_block_td
 
-        in_block_fd = np.fft.rfft(self.input_block, axis=0)
+        in_block_fd = self.fft.rfft(self.input_block)
 
-        for filter_block, block in zip(self.filter_blocks_fd, self.blocks_fd):
-            block += filter_block * in_block_fd
+        # multiply by all filter blocks at once, then accumulate into the
+        # state in (at most) two contiguous parts, as it is circular
+        np.multiply(self.filter_blocks_fd, in_block_fd[np.newaxis], out=self._product_fd, casting="same_kind")
+        n_end = len(self.blocks_fd) - self.first_block
+        self.blocks_fd[self.first_block:] += self._product_fd[:n_end]
+        self.blocks_fd[:self.first_block] += self._product_fd[n_end:]
 
-        first_block_td = np.fft.irfft(self.blocks_fd[0], axis=0)
+        first_block_td = self.fft.irfft(self.blocks_fd[self.first_block])
 
-        self.blocks_fd[0][:] = 0.0
-        self.blocks_fd.append(self.blocks_fd.pop(0))
+        self.blocks_fd[self.first_block] = 0.0
+        self.first_block = (self.first_block + 1) % len(self.blocks_fd)
 
-        return first_block_td[:self.block_size]
+        if out is None:
+            return first_block_td[:self.block_size].astype(self.dtype, copy=False)
+        else:
+            out[:] = first_block_td[:self.block_size]
+            return out
 
 
 class VariableBlockSizeAdapter(object):
@@ -75,31 +160,47 @@ class VariableBlockSizeAdapter(object):
         process_func (callable): Callback such that Y=process_func(X) processes
             an (block_size, nchannels) array X, to produce another (block_size,
             nchannels) array Y.
+        dtype (numpy dtype): type of input and output samples.
+        in_place (bool): if True, process_func is instead called as
+            process_func(X, out=X) to process X in place, like
+            OverlapSaveConvolver.filter_block.
     """
 
-    def __init__(self, block_size, nchannels, process_func):
+    def __init__(self, block_size, nchannels, process_func, dtype=np.float64, in_place=False):
         self.process_func = process_func
         self.block_size = block_size
+        self.in_place = in_place
 
         # store block_size samples, input samples followed by output samples:
         # - self.buffer[:self.buffer_input] stores unprocessed input samples
         # - self.buffer[self.buffer_input:] stores processed output samples
-        self.buffer = process_func(np.zeros((block_size, nchannels)))
+        self.buffer = process_func(np.zeros((block_size, nchannels), dtype=dtype))
         self.buffer_input = 0
 
     def delay(self, process_delay):
         return self.block_size + process_delay
 
-    def process(self, input_samples):
+    def history_length(self, process_history):
+        """Get the number of output samples which each input sample can
+        affect, given the history length of process_func (e.g.
+        OverlapSaveConvolver.history_length), counting from the start of the
+        block containing the input sample; the output of each block is
+        buffered for one more block."""
+        return self.block_size + process_history
+
+    def process(self, input_samples, out=None):
         """Process n samples.
 
         Parameters:
             input_samples (array of (n, nchannels) floats): input samples
+            out (array of (n, nchannels) floats or None): array to write the
+                output samples to, which must not overlap input_samples; if
+                None, a new array is allocated.
 
         Returns:
             array of (n, nchannels) floats: output samples
         """
-        output_samples = np.zeros_like(input_samples)
+        output_samples = np.empty_like(input_samples) if out is None else out
 
         # range of input and output samples that are yet to be processed
         n_done, n_input = 0, len(input_samples)
@@ -120,9 +221,119 @@ class VariableBlockSizeAdapter(object):
             # at this point the buffer is a full as it can be of input samples;
             # process these to turn them into output samples if we have enough
             if self.buffer_input == self.block_size:
-                self.buffer[:] = self.process_func(self.buffer)
+                if self.in_place:
+                    self.process_func(self.buffer, out=self.buffer)
+                else:
+                    self.buffer[:] = self.process_func(self.buffer)
                 self.buffer_input = 0
 
         assert n_done == n_input
 
         return output_samples
+
+    def skip_silence(self, n):
+        """Advance through n samples of silent input, without processing them.
+
+        This is equivalent to processing n zero samples, and discarding the
+        (zero) output, but is only valid if the buffer and the state of
+        process_func are all zero, i.e. the input has been silent for long
+        enough that nothing remains of any previous non-zero input.
+        """
+        self.buffer_input = (self.buffer_input + n) % self.block_size
+
+
+class NonUniformPartitionedConvolver(object):
+    """Convolve variable sized blocks of samples with a filter, using small
+    partitions at the start of the filter and larger partitions for the rest.
+
+    This has the same interface as a VariableBlockSizeAdapter wrapping an
+    OverlapSaveConvolver, but the delay is only head_block_size samples, while
+    most of the filter is still processed in blocks of max_block_size samples.
+
+    The filter is split into segments, each of which is processed by an
+    OverlapSaveConvolver with its own block size in a VariableBlockSizeAdapter.
+    The first segment uses head_block_size, and each following segment doubles
+    the block size up to max_block_size, with the last segment taking the rest
+    of the filter. Each segment covers two of its own partitions, so its start
+    in the filter is always late enough to hide the extra delay of its larger
+    block size; this is compensated for by padding the start of the segment
+    filter with zeros.
+
+    Parameters:
+        head_block_size (int): block size of the first partition, which
+            determines the delay.
+        max_block_size (int): maximum block size of the later partitions.
+        nchannels (int): number of channels to process
+        f (array of (n, nchannels) floats): specification of nchannels length n
+            FIR filters to convolve the input channels with.
+        dtype (numpy dtype): type of input and output samples and of the
+            filter state.
+        fft_backend: FFT backend to use for all segments; see
+            OverlapSaveConvolver.
+
+    Attributes:
+        history_length (int): number of output samples which each input
+            sample can affect, i.e. the longest history length of the
+            segments; see VariableBlockSizeAdapter.history_length.
+    """
+
+    def __init__(self, head_block_size, max_block_size, nchannels, f, dtype=np.float64, fft_backend=None):
+        assert 0 < head_block_size <= max_block_size
+        self.head_block_size = head_block_size
+        self.dtype = np.dtype(dtype)
+
+        self.segments = []
+        self.history_length = 0
+        start, block_size = 0, head_block_size
+        while start < len(f) or not self.segments:
+            end = len(f) if block_size == max_block_size else min(len(f), start + 2 * block_size)
+
+            # the adapter delays by block_size, but this segment must be
+            # delayed by start + head_block_size in total
+            n_zeros = start + head_block_size - block_size
+            assert n_zeros >= 0
+            segment_f = np.concatenate((np.zeros((n_zeros, nchannels), dtype=f.dtype), f[start:end]))
+
+            convolver = OverlapSaveConvolver(block_size, nchannels, segment_f, dtype=dtype, fft_backend=fft_backend)
+            segment = VariableBlockSizeAdapter(
+                block_size, nchannels, convolver.filter_block, dtype=dtype, in_place=True)
+            self.segments.append(segment)
+            self.history_length = max(self.history_length, segment.history_length(convolver.history_length))
+
+            start, block_size = end, min(block_size * 2, max_block_size)
+
+        # temporary for the output of each segment after the first
+        self._segment_out = np.zeros((0, nchannels), dtype=self.dtype)
+
+    def delay(self, process_delay):
+        return self.head_block_size + process_delay
+
+    def process(self, input_samples, out=None):
+        """Process n samples.
+
+        Parameters:
+            input_samples (array of (n, nchannels) floats): input samples
+            out (array of (n, nchannels) floats or None): array to write the
+                output samples to, which must not overlap input_samples; if
+                None, a new array is allocated.
+
+        Returns:
+            array of (n, nchannels) floats: output samples
+        """
+        output_samples = self.segments[0].process(input_samples, out=out)
+
+        if len(self.segments) > 1:
+            if len(self._segment_out) < len(input_samples):
+                self._segment_out = np.empty((len(input_samples), self._segment_out.shape[1]), dtype=self.dtype)
+            segment_out = self._segment_out[:len(input_samples)]
+
+            for segment in self.segments[1:]:
+                output_samples += segment.process(input_samples, out=segment_out)
+
+        return output_samples
+
+    def skip_silence(self, n):
+        """Advance through n samples of silent input, without processing them;
+        see VariableBlockSizeAdapter.skip_silence."""
+        for segment in self.segments:
+            segment.skip_silence(n)
@@ -4,47 +4,97 @@ import numpy as np
 class Delay(object):
     """Multi-channel delay line.
 
+    Samples are stored in a circular buffer holding the maximum delay plus one
+    block, so the cost of processing a block only depends on the number of
+    samples in the block, not on the delay.
+
     Parameters:
         nchannels (int): number of channels to process
-        delay (int): number of samples to delay by
+        delay (int or array of nchannels ints): number of samples to delay
+            by, either for all channels or for each channel
+        dtype (numpy dtype): type of samples to store
     """
 
-    def __init__(self, nchannels, delay):
-        assert delay >= 0
-        self.delaymem = np.zeros((delay, nchannels))
+    def __init__(self, nchannels, delay, dtype=np.float64):
+        delays = np.broadcast_to(np.asarray(delay, dtype=int), (nchannels,))
+        assert np.all(delays >= 0)
+
         self.delay = delay
+        self.max_delay = int(np.max(delays)) if nchannels else 0
+
+        # groups of (delay, channel indices or slice) for channels with the
+        # same delay, so that channels are read from the buffer together
+        unique_delays = np.unique(delays)
+        if len(unique_delays) <= 1:
+            self._channel_groups = [(self.max_delay, slice(None))]
+        else:
+            self._channel_groups = [(int(d), np.flatnonzero(delays == d)) for d in unique_delays]
+
+        self.buf = np.zeros((self.max_delay, nchannels), dtype=dtype)
+        # index in buf that the next input sample is written to; the sample
+        # delayed by d is stored at (self.write_pos - d) % len(self.buf)
+        self.write_pos = 0
+
+    def _ring_slices(self, start, n):
+        """Get pairs of slices of self.buf and of a block of n samples, such
+        that the block is stored in the buffer starting at index start."""
+        capacity = len(self.buf)
+        buf_start = start % capacity
+        first_len = min(n, capacity - buf_start)
+
+        slices = [(slice(buf_start, buf_start + first_len), slice(0, first_len))]
+        if first_len < n:
+            slices.append((slice(0, n - first_len), slice(first_len, n)))
+        return slices
+
+    def _grow(self, capacity):
+        """Re-allocate the buffer to hold capacity samples, keeping the last
+        max_delay samples written."""
+        old_samples = np.empty((self.max_delay, self.buf.shape[1]), dtype=self.buf.dtype)
+        for buf_slice, samples_slice in self._ring_slices(self.write_pos - self.max_delay, self.max_delay):
+            old_samples[samples_slice] = self.buf[buf_slice]
 
-    def process(self, input_samples):
+        self.buf = np.zeros((capacity, self.buf.shape[1]), dtype=self.buf.dtype)
+        self.buf[:self.max_delay] = old_samples
+        self.write_pos = self.max_delay
+
+    def process(self, input_samples, out=None):
         """Push n samples through the delay line.
 
         Parameters:
             input_samples (array of nsamples by nchannels): input samples
+            out (array of nsamples by nchannels or None): array to write the
+                output samples to, which may be input_samples for in-place
+                processing; if None, a new array is allocated.
 
         Returns:
             array of nsamples by nchannels: output samples, delayed by delay
                 samples.
         """
-        output = np.zeros_like(input_samples)
-
-        # transfer samples from the delay memory followed by the input, to the
-        # output followed by the new delay memory, such that concat(src) before
-        # the transfer has the same value as concat(dst) after
-        src = [self.delaymem, input_samples]
-        dst = [output, self.delaymem]
-
-        # copy the common part of src[0] and dst[0]
-        start_len = min(len(src[0]), len(dst[0]))
-        if start_len: dst[0][:start_len] = src[0][:start_len]
-
-        # copy the part where src[0] overlaps dst[1] or src[1] overlaps dst[0]
-        overlap = len(src[0]) - len(dst[0])
-        if overlap > 0:  # src[0] longer
-            dst[1][:overlap] = src[0][-overlap:]
-        elif overlap < 0:  # dst[0] longer
-            dst[0][overlap:] = src[1][:-overlap]
-
-        # copy the common part of src[1] and dst[1]
-        end_len = min(len(src[1]), len(dst[1]))
-        if end_len: dst[1][-end_len:] = src[1][-end_len:]
+        output = np.empty_like(input_samples) if out is None else out
+        n = len(input_samples)
+
+        if self.max_delay == 0:
+            if output is not input_samples:
+                output[:] = input_samples
+            return output
+
+        if n == 0:
+            return output
+
+        if len(self.buf) < self.max_delay + n:
+            self._grow(self.max_delay + n)
+
+        # write the input first so that it is not overwritten when processing
+        # in place; as the buffer holds at least max_delay + n samples, this
+        # does not overwrite any samples which are still to be read
+        for buf_slice, samples_slice in self._ring_slices(self.write_pos, n):
+            self.buf[buf_slice] = input_samples[samples_slice]
+
+        for delay, channels in self._channel_groups:
+            for buf_slice, samples_slice in self._ring_slices(self.write_pos - delay, n):
+                output[samples_slice, channels] = self.buf[buf_slice, channels]
+
+        self.write_pos = (self.write_pos + n) % len(self.buf)
 
         return output
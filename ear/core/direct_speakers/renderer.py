@@ -1,6 +1,7 @@
 import numpy as np
 from .panner import DirectSpeakersPanner
-from ..renderer_common import BlockProcessingChannel, InterpretTimingMetadata, FixedGains
+from ..renderer_common import (BlockProcessingChannel, InterpretTimingMetadata, FixedGains,
+                               mix_block_processing_channels, ticks_to_samples)
 from ..track_processor import TrackProcessor
 
 
@@ -25,10 +26,10 @@ class InterpretDirectSpeakersMetadata(InterpretTimingMetadata):
         Yields:
             One ProcessingBlock object that apply gains for a single input channel.
         """
-        start_time, end_time = self.block_start_end(block)
+        ticks_per_second, start_time, end_time, _extra = self.block_start_end_ticks(block)
 
-        start_sample = sample_rate * start_time
-        end_sample = sample_rate * end_time
+        start_sample = ticks_to_samples(start_time, ticks_per_second, sample_rate)
+        end_sample = ticks_to_samples(end_time, ticks_per_second, sample_rate)
 
         gains = self.calc_gains(block)
 
@@ -40,9 +41,10 @@ class DirectSpeakersRenderer(object):
     options = DirectSpeakersPanner.options
 
     @options.with_defaults
-    def __init__(self, layout, **options):
+    def __init__(self, layout, dtype=np.float64, **options):
         self._panner = DirectSpeakersPanner(layout, **options)
         self._nchannels = len(layout.channels)
+        self._dtype = dtype
 
         # tuples of a track spec processor and a BlockProcessingChannel to
         # apply to the samples it produces.
@@ -65,7 +67,7 @@ class DirectSpeakersRenderer(object):
                                                InterpretDirectSpeakersMetadata(self._panner.handle)))
                                           for item in rendering_items]
 
-    def render(self, sample_rate, start_sample, input_samples):
+    def render(self, sample_rate, start_sample, input_samples, out=None):
         """Process n input samples to produce n output samples.
 
         Args:
@@ -74,15 +76,23 @@ class DirectSpeakersRenderer(object):
             input_samples (ndarray of (k, k) float): Multi-channel input sample
                 block; there must be at least as many channels as referenced in the
                 rendering items.
+            out (ndarray of (n, l) float or None): Array to write the output
+                samples to; if None, a new array is allocated.
 
         Returns:
             (ndarray of (n, l) float): l channels of output samples
                 corresponding to the l loudspeakers in layout.
         """
-        output_samples = np.zeros((len(input_samples), self._nchannels))
-
-        for track_spec_processor, block_processing in self.block_processing_channels:
-            track_samples = track_spec_processor.process(sample_rate, input_samples)
-            block_processing.process(sample_rate, start_sample, track_samples, output_samples)
+        if out is None:
+            output_samples = np.zeros((len(input_samples), self._nchannels), dtype=self._dtype)
+        else:
+            output_samples = out
+            output_samples.fill(0.0)
+
+        mix_block_processing_channels(
+            sample_rate, start_sample,
+            [(block_processing, track_spec_processor.process(sample_rate, input_samples))
+             for track_spec_processor, block_processing in self.block_processing_channels],
+            output_samples)
 
         return output_samples
@@ -1,14 +1,41 @@
 from attr import attrib, attrs, Factory
 from attr.validators import instance_of, optional
+from collections import namedtuple
 from fractions import Fraction
+from six.moves import queue
 from ..common import list_of, default_screen
 from ..fileio.adm.elements import (AudioProgramme, AudioContent, AudioObject, AudioPackFormat,
                                    AudioChannelFormat, AudioBlockFormatObjects, AudioBlockFormatDirectSpeakers,
                                    MatrixCoefficient, Frequency)
 
+try:
+    # moved in py3.3
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
 
 class MetadataSource(object):
-    """A source of metadata for some input channels."""
+    """A source of metadata for some input channels.
+
+    Attributes:
+        hold_on_underrun (bool): If True, metadata underruns are counted
+            and the last processing is held rather than raising an exception;
+            see renderer_common.BlockProcessingChannel.
+    """
+
+    hold_on_underrun = False
+
+    def is_finished(self):
+        """Is it known that no more blocks will be returned?
+
+        This is used for sources with hold_on_underrun, to tell the end of the
+        metadata apart from an underrun.
+
+        Returns:
+            bool
+        """
+        return False
 
     def get_next_block(self):
         """Get the next metadata block, if one is available.
@@ -18,6 +45,21 @@ class MetadataSource(object):
         """
         raise NotImplementedError()
 
+    def get_next_blocks(self, max_blocks):
+        """Get up to max_blocks metadata blocks, stopping early if no more
+        blocks are available.
+
+        Returns:
+            list of TypeMetadata
+        """
+        blocks = []
+        while len(blocks) < max_blocks:
+            block = self.get_next_block()
+            if block is None:
+                break
+            blocks.append(block)
+        return blocks
+
 
 class MetadataSourceIter(MetadataSource):
     """Metadata source that iterates through a list of TypeMetadata objects.
@@ -33,6 +75,48 @@ class MetadataSourceIter(MetadataSource):
         return next(self.type_metadatas_iter, None)
 
 
+class MetadataSourceQueue(MetadataSource):
+    """Metadata source for live rendering, which may be filled by another
+    thread while rendering.
+
+    Blocks which have been put are returned by get_next_block in order; if no
+    blocks are available, None is returned and the renderer treats this as an
+    underrun, holding the last processing until more blocks are put. Once
+    there is no more metadata, close should be called; once all blocks have
+    been returned after this, the end of the metadata is no longer an
+    underrun. Late blocks are tolerated whether or not the source is closed.
+
+    Args:
+        maxsize (int): Maximum number of blocks to store, or 0 for no limit;
+            if the queue is full, put waits until there is space.
+    """
+
+    def __init__(self, maxsize=0):
+        self._queue = queue.Queue(maxsize)
+        self._closed = False
+
+    def put(self, type_metadata, block=True, timeout=None):
+        """Add a metadata block; see queue.Queue.put for block and timeout."""
+        assert not self._closed, "put called after close"
+        self._queue.put(type_metadata, block, timeout)
+
+    def close(self):
+        """Signal that there are no more metadata blocks."""
+        self._closed = True
+
+    hold_on_underrun = True
+
+    def is_finished(self):
+        # if closed, no more blocks can be put, so the queue can only drain
+        return self._closed and self._queue.empty()
+
+    def get_next_block(self):
+        try:
+            return self._queue.get_nowait()
+        except queue.Empty:
+            return None
+
+
 @attrs(slots=True)
 class TypeMetadata(object):
     """Base class for *TypeMetadata classes; these should represent all the
@@ -176,6 +260,87 @@ class ObjectTypeMetadata(TypeMetadata):
     extra_data = attrib(validator=instance_of(ExtraData), default=Factory(ExtraData))
 
 
+# the parts of an ObjectTypeMetadata needed to determine the timing of a block;
+# block_format is a BlockFormatTiming
+ObjectTimingMetadata = namedtuple("ObjectTimingMetadata", ["block_format", "extra_data"])
+
+
+class ObjectTypeMetadataRows(Sequence):
+    """A range of blocks stored in an ObjectsBlockFormatColumns, which can be
+    used in place of a list of ObjectTypeMetadata.
+
+    Accessing an item creates an ObjectTypeMetadata for that block; the
+    renderer instead passes the whole range to GainCalc.render_columns, and
+    uses timing to get the timing of each block.
+
+    Attributes:
+        columns (ObjectsBlockFormatColumns): Block formats.
+        start (int): Index of the first block.
+        stop (int): Index after the last block.
+        extra_data (ExtraData): Extra parameters from outside block format.
+    """
+
+    def __init__(self, columns, start, stop, extra_data):
+        self.columns = columns
+        self.start = start
+        self.stop = stop
+        self.extra_data = extra_data
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("block index out of range")
+
+        return ObjectTypeMetadata(block_format=self.columns[self.start + idx], extra_data=self.extra_data)
+
+    def timing(self, idx):
+        """Get the timing parameters of a block.
+
+        Returns:
+            ObjectTimingMetadata: timing parameters of the block at index idx
+        """
+        return ObjectTimingMetadata(block_format=self.columns.timing(self.start + idx), extra_data=self.extra_data)
+
+
+class MetadataSourceColumns(MetadataSource):
+    """Metadata source for the blocks of an Objects audioChannelFormat stored
+    in an ObjectsBlockFormatColumns.
+
+    get_next_block returns an ObjectTypeMetadata for each block, while
+    get_next_blocks returns ObjectTypeMetadataRows, so that the renderer can
+    process the blocks without creating a block format for each one.
+
+    Args:
+        columns (ObjectsBlockFormatColumns): Block formats.
+        extra_data (ExtraData): Extra parameters from outside block format.
+    """
+
+    def __init__(self, columns, extra_data=None):
+        self.columns = columns
+        self.extra_data = extra_data if extra_data is not None else ExtraData()
+        self._next = 0
+
+    def get_next_block(self):
+        if self._next >= len(self.columns):
+            return None
+
+        block = ObjectTypeMetadata(block_format=self.columns[self._next], extra_data=self.extra_data)
+        self._next += 1
+        return block
+
+    def get_next_blocks(self, max_blocks):
+        start = self._next
+        self._next = min(start + max_blocks, len(self.columns))
+        return ObjectTypeMetadataRows(self.columns, start, self._next, self.extra_data)
+
+
 @attrs(slots=True)
 class ObjectRenderingItem(RenderingItem):
     """RenderingItem for typeDefinition="Objects"
@@ -5,8 +5,9 @@ import warnings
 class PeakMonitor(object):
     """Monitor the peak level of each channel in a multichannel stream.
 
-    Call process(samples) on each block of samples, then print_warnings() to
-    warn about overloaded channels.
+    Call process(samples) on each block of samples (or process_peak(peak_abs)
+    with peak levels measured elsewhere), then print_warnings() to warn about
+    overloaded channels.
 
     Parameters:
         nchannels (int): number of channels to monitor
@@ -24,6 +25,16 @@ class PeakMonitor(object):
         max_in_block = np.max(np.abs(samples), axis=0, initial=0.0)
         self.peak_abs_linear = np.maximum(self.peak_abs_linear, max_in_block)
 
+    def process_peak(self, peak_abs):
+        """Process the peak absolute level of each channel, measured
+        elsewhere.
+
+        Parameters:
+            peak_abs (ndarray of (nchannels,)): peak absolute sample value of
+                each channel
+        """
+        self.peak_abs_linear = np.maximum(self.peak_abs_linear, peak_abs)
+
     def has_overloaded(self):
         return np.any(self.peak_abs_linear > 1)
 
@@ -0,0 +1,166 @@
+from collections import OrderedDict
+from attr import astuple
+from ...fileio.adm.elements import ObjectPolarPosition, ScreenEdgeLock
+
+
+def _attrs_key(obj):
+    """Hashable key for a (possibly nested) attrs object, including its type."""
+    return (type(obj).__name__,) + astuple(obj, recurse=True)
+
+
+def _block_key(position_type, position, screen_edge_lock, cartesian, width, height, depth, gain, diffuse,
+               channel_lock, divergence, screenRef, zone_exclusion, reference_screen):
+    """Build the key for object_meta_key from the parameters of a block."""
+    position_key = (position_type,) + tuple(position) + (screen_edge_lock.horizontal, screen_edge_lock.vertical)
+
+    channel_lock_key = (channel_lock.maxDistance,) if channel_lock is not None else None
+
+    divergence_key = ((divergence.value, divergence.azimuthRange, divergence.positionRange)
+                      if divergence is not None else None)
+
+    zones_key = tuple(_attrs_key(zone) for zone in zone_exclusion)
+
+    # the reference screen is only used for screen-related objects
+    screen_key = _attrs_key(reference_screen) if screenRef else None
+
+    return (position_key,
+            cartesian,
+            width,
+            height,
+            depth,
+            gain,
+            diffuse,
+            channel_lock_key,
+            divergence_key,
+            screenRef,
+            zones_key,
+            screen_key)
+
+
+def object_meta_key(object_meta):
+    """Get a hashable key representing all parameters of an ObjectTypeMetadata
+    which affect the output of GainCalc.render.
+
+    Timing parameters and other attributes which do not affect the gains are
+    not included, so that blocks with the same parameters at different times
+    map to the same key.
+
+    Parameters:
+        object_meta (ObjectTypeMetadata): block to get the key for
+
+    Returns:
+        tuple: key which compares equal for blocks that produce the same gains
+    """
+    block_format = object_meta.block_format
+
+    position = block_format.position
+    if isinstance(position, ObjectPolarPosition):
+        position_type, position_values = "polar", (position.azimuth, position.elevation, position.distance)
+    else:
+        position_type, position_values = "cartesian", (position.X, position.Y, position.Z)
+
+    return _block_key(position_type, position_values, position.screenEdgeLock,
+                      block_format.cartesian,
+                      block_format.width,
+                      block_format.height,
+                      block_format.depth,
+                      block_format.gain,
+                      block_format.diffuse,
+                      block_format.channelLock,
+                      block_format.objectDivergence,
+                      block_format.screenRef,
+                      block_format.zoneExclusion,
+                      object_meta.extra_data.reference_screen)
+
+
+def object_meta_keys_columns(columns, extra_data, start, stop):
+    """Get object_meta_key for a range of blocks stored in an
+    ObjectsBlockFormatColumns, without creating their block formats.
+
+    Parameters:
+        columns (ObjectsBlockFormatColumns): blocks to get keys for
+        extra_data (ExtraData): extra data for all blocks
+        start (int): index of the first block
+        stop (int): index after the last block
+
+    Returns:
+        list of tuple: key for each block, equal to the object_meta_key of
+        the equivalent ObjectTypeMetadata
+    """
+    rows = slice(start, stop)
+    default_screen_edge_lock = ScreenEdgeLock()
+
+    return [_block_key("cartesian" if position_cartesian else "polar", position,
+                       columns.screen_edge_lock.get(i, default_screen_edge_lock),
+                       cartesian, width, height, depth, gain, diffuse,
+                       columns.channel_lock.get(i),
+                       columns.object_divergence.get(i),
+                       screenRef,
+                       columns.zone_exclusion.get(i, ()),
+                       extra_data.reference_screen)
+            for i, position_cartesian, position, cartesian, width, height, depth, gain, diffuse, screenRef
+            in zip(range(start, stop),
+                   columns.position_cartesian[rows].tolist(),
+                   columns.position[rows].tolist(),
+                   columns.cartesian[rows].tolist(),
+                   columns.width[rows].tolist(),
+                   columns.height[rows].tolist(),
+                   columns.depth[rows].tolist(),
+                   columns.gain[rows].tolist(),
+                   columns.diffuse[rows].tolist(),
+                   columns.screenRef[rows].tolist())]
+
+
+class GainCache(object):
+    """Size-bounded least-recently-used cache of gains for object metadata.
+
+    Parameters:
+        max_size (int): maximum number of gain vectors to store
+
+    Attributes:
+        hits (int): number of lookups which found a stored value
+        misses (int): number of lookups which did not find a stored value
+    """
+
+    def __init__(self, max_size):
+        assert max_size > 0
+        self.max_size = max_size
+        self._entries = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def lookup(self, key):
+        """Find the gains stored for key.
+
+        Returns:
+            array or None: stored gains, or None if nothing is stored for key
+        """
+        try:
+            gains = self._entries.pop(key)
+        except KeyError:
+            self.misses += 1
+            return None
+
+        # re-insert to mark as most recently used
+        self._entries[key] = gains
+        self.hits += 1
+        return gains
+
+    def store(self, key, gains):
+        """Store gains for key, discarding the least recently used entry if
+        the cache is full.
+
+        The stored array is made read-only, as it may be shared between many
+        blocks.
+        """
+        gains.flags.writeable = False
+
+        self._entries.pop(key, None)
+        self._entries[key] = gains
+
+        if len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
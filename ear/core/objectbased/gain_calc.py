@@ -1,6 +1,7 @@
 from collections import namedtuple
 import numpy as np
 import warnings
+from six import iteritems
 from . import allo_extent, extent
 from .. import point_source
 from ...options import SubOptions, OptionsHandler
@@ -10,6 +11,7 @@ from .. import allocentric
 from ...fileio.adm.elements import CartesianZone, PolarZone, ObjectCartesianPosition, ObjectPolarPosition
 from ..screen_scale import ScreenScaleHandler
 from ..screen_edge_lock import ScreenEdgeLockHandler
+from ..metadata_input import ObjectTypeMetadata
 
 
 def coord_trans(position):
@@ -410,3 +412,197 @@ class GainCalc(object):
         gains_full[~self.is_lfe] = gains
 
         return direct_diffuse_split(gains_full, block_format.diffuse)
+
+    def _is_simple_point_source(self, object_meta):
+        """Can the gains for object_meta be calculated by _render_point_sources?
+
+        This is true for polar blocks that would not be modified by any of the
+        stages in render before point source panning; the distance is checked
+        separately, as it may still cause the extent panner to be used.
+        """
+        block_format = object_meta.block_format
+        return (not block_format.cartesian and
+                isinstance(block_format.position, ObjectPolarPosition) and
+                not (block_format.screenRef and self.screen_scale_handler.reproduction_screen is not None) and
+                not self.screen_edge_lock_handler.should_modify_position(block_format.position.screenEdgeLock) and
+                block_format.channelLock is None and
+                (block_format.objectDivergence is None or block_format.objectDivergence.value == 0.0) and
+                block_format.width == 0.0 and block_format.height == 0.0 and block_format.depth == 0.0 and
+                not block_format.zoneExclusion)
+
+    def _render_point_sources(self, positions):
+        """Vectorised equivalent of the panning stages of render for polar
+        blocks accepted by _is_simple_point_source.
+
+        Parameters:
+            positions (array of (n, 3)): Cartesian source positions.
+
+        Returns:
+            - array of n bools: rows which could be handled; others must be
+              passed through render, as they need the extent panner or could
+              not be handled by the point source panner.
+            - array of (m, k): gains for the handled rows, for the k non-LFE
+              channels, before gain and diffuse are applied.
+        """
+        distances = np.linalg.norm(positions, axis=1)
+
+        # with zero extent, the extent panner still spreads objects which are
+        # closer than the loudspeakers; see PolarExtentHandler.handle and
+        # PolarExtentPanner.calc_pv_spread
+        extent_panner = self.polar_extent_panner.polar_extent_panner
+        mod_extent = PolarExtentHandler.extent_mod(0.0, distances)
+        ammount_spread = np.interp(mod_extent, [0, extent_panner.fade_width], [0, 1])
+        handled = ammount_spread <= 1e-10
+
+        pvs = self.point_source_panner.handle_many(positions[handled])
+        found = ~np.isnan(pvs[:, 0])
+        handled[handled] = found
+
+        # with no spread, divergence or excluded zones, the remaining stages of
+        # render leave the (non-negative) point source gains unchanged, apart
+        # from rounding
+        return handled, pvs[found]
+
+    def render_many(self, object_metas):
+        """Calculate gains for many blocks at once.
+
+        This is equivalent to calling render for each block, but common cases
+        (polar point sources) are processed as arrays, avoiding the per-block
+        overhead of render.
+
+        Parameters:
+            object_metas (list of ObjectTypeMetadata): blocks to render
+
+        Returns:
+            DirectDiffuseGains: direct and diffuse gains, each an array of
+            shape (n, l) for n blocks and l loudspeakers.
+        """
+        n = len(object_metas)
+        nchannels = len(self.is_lfe)
+
+        direct = np.zeros((n, nchannels))
+        diffuse = np.zeros((n, nchannels))
+
+        simple = np.array([self._is_simple_point_source(object_meta) for object_meta in object_metas],
+                          dtype=bool).reshape(n)
+        simple_idx = np.flatnonzero(simple)
+
+        if len(simple_idx):
+            simple_bfs = [object_metas[i].block_format for i in simple_idx]
+            polar_positions = np.array([(bf.position.azimuth, bf.position.elevation, bf.position.distance)
+                                        for bf in simple_bfs])
+            gain = np.array([bf.gain for bf in simple_bfs])
+            diffuse_param = np.array([bf.diffuse for bf in simple_bfs])
+
+            handled = self._render_simple_point_sources(polar_positions, gain, diffuse_param,
+                                                        direct, diffuse, simple_idx)
+            simple[simple_idx[~handled]] = False
+
+        for i in np.flatnonzero(~simple):
+            direct[i], diffuse[i] = self.render(object_metas[i])
+
+        return DirectDiffuseGains(direct=direct, diffuse=diffuse)
+
+    def render_columns(self, columns, extra_data, start=0, stop=None, indices=None):
+        """Calculate gains for a range of blocks stored in an
+        ObjectsBlockFormatColumns.
+
+        This is equivalent to render_many, but the parameters of simple point
+        sources are taken directly from the column arrays, so block format
+        objects are only created for blocks which need the full render.
+
+        Parameters:
+            columns (ObjectsBlockFormatColumns): blocks to render
+            extra_data (ExtraData): extra data for all blocks
+            start (int): index of the first block to render
+            stop (int or None): index after the last block to render, or None
+                for all remaining blocks
+            indices (array of int or None): indices of distinct blocks to
+                render, used instead of start and stop if not None
+
+        Returns:
+            DirectDiffuseGains: direct and diffuse gains, each an array of
+            shape (n, l) for n blocks and l loudspeakers.
+        """
+        if indices is None:
+            start, stop, _step = slice(start, stop).indices(len(columns))
+            indices = np.arange(start, max(start, stop))
+        else:
+            indices = np.asarray(indices, dtype=int)
+        n = len(indices)
+        nchannels = len(self.is_lfe)
+
+        direct = np.zeros((n, nchannels))
+        diffuse = np.zeros((n, nchannels))
+
+        # equivalent to _is_simple_point_source; rare parameters are stored in
+        # dictionaries, so only those entries need to be checked
+        simple = (~columns.cartesian[indices] & ~columns.position_cartesian[indices] &
+                  (columns.width[indices] == 0.0) & (columns.height[indices] == 0.0) &
+                  (columns.depth[indices] == 0.0))
+        if self.screen_scale_handler.reproduction_screen is not None:
+            simple &= ~columns.screenRef[indices]
+
+        # row for each block index
+        rows = dict(zip(indices.tolist(), range(n)))
+
+        for i, screen_edge_lock in iteritems(columns.screen_edge_lock):
+            if i in rows and self.screen_edge_lock_handler.should_modify_position(screen_edge_lock):
+                simple[rows[i]] = False
+        for i in columns.channel_lock:
+            if i in rows:
+                simple[rows[i]] = False
+        for i, divergence in iteritems(columns.object_divergence):
+            if i in rows and divergence.value != 0.0:
+                simple[rows[i]] = False
+        for i in columns.zone_exclusion:
+            if i in rows:
+                simple[rows[i]] = False
+
+        simple_idx = np.flatnonzero(simple)
+
+        if len(simple_idx):
+            handled = self._render_simple_point_sources(columns.position[indices[simple_idx]],
+                                                        columns.gain[indices[simple_idx]],
+                                                        columns.diffuse[indices[simple_idx]],
+                                                        direct, diffuse, simple_idx)
+            simple[simple_idx[~handled]] = False
+
+        for i in np.flatnonzero(~simple):
+            object_meta = ObjectTypeMetadata(block_format=columns[indices[i]], extra_data=extra_data)
+            direct[i], diffuse[i] = self.render(object_meta)
+
+        return DirectDiffuseGains(direct=direct, diffuse=diffuse)
+
+    def _render_simple_point_sources(self, polar_positions, gain, diffuse_param, direct, diffuse, idx):
+        """Calculate gains for blocks accepted by _is_simple_point_source.
+
+        Parameters:
+            polar_positions (array of (n, 3)): azimuth, elevation and distance
+                of each block
+            gain (array of n floats): gain parameter of each block
+            diffuse_param (array of n floats): diffuse parameter of each block
+            direct (array of (m, l)): direct gains to write to
+            diffuse (array of (m, l)): diffuse gains to write to
+            idx (array of n ints): rows in direct and diffuse for each block
+
+        Returns:
+            array of n bools: blocks which could be handled; others must be
+            passed through render.
+        """
+        nchannels = len(self.is_lfe)
+        positions = cart(polar_positions[:, 0], polar_positions[:, 1], polar_positions[:, 2])
+
+        handled, gains = self._render_point_sources(positions)
+
+        gains = np.nan_to_num(gains)
+        gains *= gain[handled, np.newaxis]
+
+        gains_full = np.zeros((len(gains), nchannels))
+        gains_full[:, ~self.is_lfe] = gains
+
+        split = direct_diffuse_split(gains_full, diffuse_param[handled, np.newaxis])
+        direct[idx[handled]] = split.direct
+        diffuse[idx[handled]] = split.diffuse
+
+        return handled
@@ -1,13 +1,18 @@
 import numpy as np
 import math
+from collections import OrderedDict
 from fractions import Fraction
-from ..convolver import OverlapSaveConvolver, VariableBlockSizeAdapter
+from ..convolver import (OverlapSaveConvolver, VariableBlockSizeAdapter, NonUniformPartitionedConvolver,
+                         default_fft_backend)
 from ..delay import Delay
 from ...options import Option, SubOptions, OptionsHandler
 from .gain_calc import GainCalc
+from .gain_cache import GainCache, object_meta_key, object_meta_keys_columns
 from . import decorrelate
-from ..renderer_common import BlockProcessingChannel, InterpretTimingMetadata, InterpGains, FixedGains
+from ..renderer_common import (BlockProcessingChannel, InterpretTimingMetadata, InterpGains, FixedGains,
+                               ScratchBuffer, mix_block_processing_channels, ticks_to_samples)
 from ..track_processor import TrackProcessor
+from ..metadata_input import ObjectTypeMetadataRows, ObjectTimingMetadata
 
 
 class InterpretObjectMetadata(InterpretTimingMetadata):
@@ -15,24 +20,48 @@ class InterpretObjectMetadata(InterpretTimingMetadata):
 
     Args:
         calc_gains (callable): Called with ObjectTypeMetadata to calculate per-channel gains.
+        calc_gains_many (callable or None): Called with a list of
+            ObjectTypeMetadata to calculate per-channel gains for each, as an
+            array with one row per block. If this is None, calc_gains is used
+            for each block in interpret_many.
+        calc_gains_rows (callable or None): Called with an
+            ObjectTypeMetadataRows to calculate per-channel gains for each
+            block, as an array with one row per block. If this is None,
+            ObjectTypeMetadataRows are treated like any other list of blocks.
     """
 
-    def __init__(self, calc_gains):
+    def __init__(self, calc_gains, calc_gains_many=None, calc_gains_rows=None):
         super(InterpretObjectMetadata, self).__init__()
         self.calc_gains = calc_gains
+        self.calc_gains_many = calc_gains_many
+        self.calc_gains_rows = calc_gains_rows
 
+        # end of the last block as (ticks, ticks per second), with None ticks
+        # if it has no end
         self.last_block_end = None
         self.last_block_gains = None
 
     @classmethod
-    def interp_length(cls, block_format, duration):
+    def interp_length(cls, block_format):
+        """Get the interpolation length specified by the jumpPosition of a
+        block format, or None if the interpolation should last for the whole
+        block."""
         if block_format.jumpPosition.flag:
             if block_format.jumpPosition.interpolationLength is not None:
                 return block_format.jumpPosition.interpolationLength
             else:
                 return Fraction(0)
         else:
-            return duration
+            return None
+
+    @classmethod
+    def interp_length_ticks(cls, timing):
+        """Get the interpolation length of a BlockFormatTiming in ticks,
+        equivalent to interp_length."""
+        if timing.jump_position:
+            return timing.interpolation_length if timing.interpolation_length is not None else 0
+        else:
+            return None
 
     def __call__(self, sample_rate, block):
         """Yield ProcessingBlock that apply the processing for a given ObjectTypeMetadata.
@@ -44,38 +73,206 @@ class InterpretObjectMetadata(InterpretTimingMetadata):
         Yields:
             One or two ProcessingBlock objects that apply gains for a single input channel.
         """
-        start_time, end_time = self.block_start_end(block)
-        interp_time = self.interp_length(block.block_format, end_time - start_time)
-        target_time = start_time + interp_time
+        return self._interpret(sample_rate, block, self.calc_gains(block))
+
+    def interpret_many(self, sample_rate, blocks):
+        """Yield ProcessingBlock that apply the processing for a sequence of
+        ObjectTypeMetadata, calculating the gains for all blocks at once.
+
+        Args:
+            sample_rate (int): Sample rate to operate in.
+            blocks (list of ObjectTypeMetadata or ObjectTypeMetadataRows):
+                Metadata to interpret, in order.
+
+        Yields:
+            ProcessingBlock objects for all blocks, in order.
+        """
+        if isinstance(blocks, ObjectTypeMetadataRows) and self.calc_gains_rows is not None:
+            all_gains = self.calc_gains_rows(blocks)
+            # only the timing is needed from here on, so avoid creating the
+            # block formats
+            blocks = [blocks.timing(i) for i in range(len(blocks))]
+        elif self.calc_gains_many is not None:
+            all_gains = self.calc_gains_many(blocks)
+        else:
+            all_gains = [self.calc_gains(block) for block in blocks]
+
+        for block, gains in zip(blocks, all_gains):
+            for processing_block in self._interpret(sample_rate, block, gains):
+                yield processing_block
+
+    def _interpret(self, sample_rate, block, interp_to):
+        # times are in integer ticks, with None for no end
+        if isinstance(block, ObjectTimingMetadata):
+            # already in ticks; see ObjectsBlockFormatColumns.timing
+            ticks_per_second, start_time, end_time, [interp_time] = self.block_start_end_ticks(
+                block, extra_times=[self.interp_length_ticks(block.block_format)],
+                time_base=block.block_format.time_base)
+        else:
+            ticks_per_second, start_time, end_time, [interp_time] = self.block_start_end_ticks(
+                block, extra_times=[self.interp_length(block.block_format)])
+        if interp_time is None:
+            target_time = end_time
+        else:
+            target_time = start_time + interp_time
 
-        if target_time > end_time:
-            raise Exception("specified interpolation length is longer than block {0.id}".format(block.block_format))
+            if end_time is not None and target_time > end_time:
+                raise Exception("specified interpolation length is longer than block {0.id}".format(block.block_format))
 
         # if this block starts immediately after a previous block, interpolate
         # from it, otherwise, don't do any interpolation.
-        if self.last_block_end is not None and start_time == self.last_block_end:
+        if (self.last_block_end is not None and self.last_block_end[0] is not None and
+                start_time * self.last_block_end[1] == self.last_block_end[0] * ticks_per_second):
             interp_from = self.last_block_gains
         else:
             target_time = start_time
             interp_from = None
 
-        interp_to = self.calc_gains(block)
+        start_sample = ticks_to_samples(start_time, ticks_per_second, sample_rate)
+        end_sample = ticks_to_samples(end_time, ticks_per_second, sample_rate)
+        target_sample = ticks_to_samples(target_time, ticks_per_second, sample_rate)
 
-        start_sample = start_time * sample_rate
-        end_sample = end_time * sample_rate
-        target_sample = target_time * sample_rate
-
-        if start_sample != target_sample:
+        if start_time != target_time:
             assert not math.isinf(target_sample)
             yield InterpGains(start_sample, target_sample, interp_from, interp_to)
-        if target_sample != end_sample:
+        if target_time != end_time:
             assert not math.isinf(target_sample)
             yield FixedGains(target_sample, end_sample, interp_to)
 
-        self.last_block_end = end_time
+        self.last_block_end = (end_time, ticks_per_second)
         self.last_block_gains = interp_to
 
 
+class ObjectMixer(object):
+    """Apply the gains for some Objects rendering items, mixing them into
+    direct and diffuse signals.
+
+    ObjectRenderer uses one of these for all of its rendering items, while
+    core.renderer.Renderer uses one per partition (see
+    ObjectRenderer.make_mixer), so that the gains for each partition can be
+    applied in parallel before the summed signals are delayed and decorrelated
+    once by ObjectRenderer.process_mixed.
+
+    Args:
+        layout (.layout.Layout): loudspeaker layout to render to
+        gain_calc_opts (dict): options for GainCalc
+        gain_cache_size (int): see ObjectRenderer
+        gain_batch_size (int): see ObjectRenderer
+    """
+
+    def __init__(self, layout, gain_calc_opts, gain_cache_size, gain_batch_size):
+        self._gain_calc = GainCalc(layout, **gain_calc_opts)
+        self._gain_batch_size = gain_batch_size
+
+        # cache of gains from _calc_gains, or None if disabled; this has hits
+        # and misses attributes which may be useful for diagnostics
+        self.gain_cache = GainCache(gain_cache_size) if gain_cache_size > 0 else None
+
+        # tuples of a track spec processor and a BlockProcessingChannel to
+        # apply to the samples it produces.
+        self.block_processing_channels = []
+
+    def _calc_gains_uncached(self, block):
+        gains = self._gain_calc.render(block)
+        return np.concatenate((gains.direct, gains.diffuse))
+
+    def _calc_gains_many_uncached(self, blocks):
+        gains = self._gain_calc.render_many(blocks)
+        return np.concatenate((gains.direct, gains.diffuse), axis=1)
+
+    def _calc_gains_rows_uncached(self, rows, indices):
+        gains = self._gain_calc.render_columns(rows.columns, rows.extra_data, indices=indices)
+        return np.concatenate((gains.direct, gains.diffuse), axis=1)
+
+    def _calc_gains(self, block):
+        if self.gain_cache is None:
+            return self._calc_gains_uncached(block)
+
+        key = object_meta_key(block)
+        gains = self.gain_cache.lookup(key)
+        if gains is None:
+            gains = self._calc_gains_uncached(block)
+            self.gain_cache.store(key, gains)
+        return gains
+
+    def _calc_gains_many(self, blocks):
+        if self.gain_cache is None:
+            return self._calc_gains_many_uncached(blocks)
+
+        keys = [object_meta_key(block) for block in blocks]
+        return self._lookup_gains_many(keys, blocks, self._calc_gains_many_uncached)
+
+    def _calc_gains_rows(self, rows):
+        indices = range(rows.start, rows.stop)
+        if self.gain_cache is None:
+            return self._calc_gains_rows_uncached(rows, indices)
+
+        keys = object_meta_keys_columns(rows.columns, rows.extra_data, rows.start, rows.stop)
+        return self._lookup_gains_many(keys, indices, lambda indices: self._calc_gains_rows_uncached(rows, indices))
+
+    def _lookup_gains_many(self, keys, blocks, calc_gains_many):
+        """Get the gains for blocks with the given cache keys, calling
+        calc_gains_many with a list of the blocks whose gains are not
+        cached."""
+        all_gains = [self.gain_cache.lookup(key) for key in keys]
+
+        # calculate each distinct missing key once
+        missing = OrderedDict()
+        for block, key, gains in zip(blocks, keys, all_gains):
+            if gains is None:
+                missing.setdefault(key, block)
+
+        if missing:
+            missing_gains = calc_gains_many(list(missing.values()))
+            calculated = dict(zip(missing.keys(), missing_gains))
+
+            for key, gains in zip(missing.keys(), missing_gains):
+                self.gain_cache.store(key, gains)
+
+            all_gains = [calculated[key] if gains is None else gains
+                         for key, gains in zip(keys, all_gains)]
+
+        return all_gains
+
+    def set_rendering_items(self, rendering_items):
+        """Set the rendering items to process.
+
+        Note:
+            Since this resets the internal state, this should normally be called
+            once before rendering is started. Dynamic modification of the
+            rendering items could be implemented though another API.
+
+        Args:
+            rendering_items (list of ObjectRenderingItem): Items to process.
+        """
+        self.block_processing_channels = [(TrackProcessor(item.track_spec),
+                                           BlockProcessingChannel(item.metadata_source,
+                                                                  InterpretObjectMetadata(self._calc_gains,
+                                                                                          self._calc_gains_many,
+                                                                                          self._calc_gains_rows),
+                                                                  max_blocks=self._gain_batch_size))
+                                          for item in rendering_items]
+
+    def mix(self, sample_rate, start_sample, input_samples, out):
+        """Add the direct and diffuse signals for n input samples to out.
+
+        Args:
+            sample_rate (int): Sample rate.
+            start_sample (int): Index of the first sample in input_samples.
+            input_samples (ndarray of (n, k) float): Multi-channel input sample
+                block; there must be at least as many channels as referenced in
+                the rendering items.
+            out (ndarray of (n, 2*l) float): Array to add the direct signals
+                (in the first l channels) and diffuse signals (in the last l
+                channels) to, for the l loudspeakers in the layout.
+        """
+        mix_block_processing_channels(
+            sample_rate, start_sample,
+            [(block_processing, track_spec_processor.process(sample_rate, input_samples))
+             for track_spec_processor, block_processing in self.block_processing_channels],
+            out)
+
+
 class ObjectRenderer(object):
 
     options = OptionsHandler(
@@ -83,6 +280,34 @@ class ObjectRenderer(object):
             default=512,
             description="block size for decorrelator convolution",
         ),
+        head_block_size=Option(
+            default=None,
+            description="block size for the first part of the decorrelation filters, which sets the latency "
+                        "of the renderer; if smaller than block_size, a non-uniform partitioned convolution "
+                        "is used, with block sizes doubling up to block_size, so block_size must be a power "
+                        "of two multiple of head_block_size",
+        ),
+        gain_cache_size=Option(
+            default=1024,
+            description="maximum number of distinct sets of block format parameters to cache gains for; "
+                        "0 disables the cache",
+        ),
+        gain_batch_size=Option(
+            default=1,
+            description="maximum number of metadata blocks to calculate gains for at once; "
+                        "values above 1 use the vectorised gain calculator, which calculates gains for blocks "
+                        "stored in ObjectsBlockFormatColumns without creating block format objects",
+        ),
+        diffuse_gating=Option(
+            default=True,
+            description="skip the decorrelators while the diffuse signal and their state are silent; "
+                        "this does not change the output",
+        ),
+        fft_workers=Option(
+            default=1,
+            description="number of threads used for each FFT in the decorrelators; "
+                        "values above 1 require scipy.fft",
+        ),
         gain_calc_opts=SubOptions(
             handler=GainCalc.options,
             description="options for gain calculator",
@@ -94,29 +319,78 @@ class ObjectRenderer(object):
     )
 
     @options.with_defaults
-    def __init__(self, layout, gain_calc_opts, decorrelator_opts, block_size):
-        self._gain_calc = GainCalc(layout, **gain_calc_opts)
+    def __init__(self, layout, gain_calc_opts, decorrelator_opts, block_size, head_block_size, gain_cache_size,
+                 gain_batch_size, diffuse_gating, fft_workers, dtype=np.float64):
+        self._layout = layout
+        self._gain_calc_opts = gain_calc_opts
+        self._gain_cache_size = gain_cache_size
+        self._gain_batch_size = gain_batch_size
+        self.block_size = block_size
         self._nchannels = len(layout.channels)
+        self._dtype = dtype
+        self._diffuse_gating = diffuse_gating
 
-        # tuples of a track spec processor and a BlockProcessingChannel to
-        # apply to the samples it produces.
-        self.block_processing_channels = []
+        # mixer for the rendering items passed to set_rendering_items
+        self.mixer = self.make_mixer()
 
         decorrlation_filters = decorrelate.design_decorrelators(layout, **decorrelator_opts)
         decorrelator_delay = (decorrlation_filters.shape[0] - 1) // 2
 
-        decorrelators = OverlapSaveConvolver(
-            block_size, self._nchannels, decorrlation_filters)
-        self.decorrelators_vbs = VariableBlockSizeAdapter(
-            block_size, self._nchannels, decorrelators.filter_block)
+        fft_backend = default_fft_backend(fft_workers)
+        if head_block_size is None or head_block_size >= block_size:
+            decorrelators = OverlapSaveConvolver(
+                block_size, self._nchannels, decorrlation_filters, dtype=dtype, fft_backend=fft_backend)
+            self.decorrelators_vbs = VariableBlockSizeAdapter(
+                block_size, self._nchannels, decorrelators.filter_block, dtype=dtype, in_place=True)
+            decorrelator_history = self.decorrelators_vbs.history_length(decorrelators.history_length)
+        else:
+            # all partition block sizes must divide block_size, so that the
+            # partitions have the same phase after Renderer.skip_to
+            ratio, remainder = divmod(block_size, head_block_size)
+            if remainder or ratio & (ratio - 1):
+                raise ValueError("block_size ({block_size}) must be a power of two multiple of "
+                                 "head_block_size ({head_block_size})".format(
+                                     block_size=block_size, head_block_size=head_block_size))
+            self.decorrelators_vbs = NonUniformPartitionedConvolver(
+                head_block_size, block_size, self._nchannels, decorrlation_filters, dtype=dtype,
+                fft_backend=fft_backend)
+            decorrelator_history = self.decorrelators_vbs.history_length
 
         self.overall_delay = self.decorrelators_vbs.delay(decorrelator_delay)
 
-        self.delays = Delay(self._nchannels, self.overall_delay)
+        # each input sample can affect the next decorrelator_history samples
+        # from the decorrelators, and the direct signal only at the same time,
+        # so with the overall delay compensated for, this is the number of
+        # past input samples which can affect each output sample
+        self.decorrelator_history = decorrelator_history
+        self.history_length = decorrelator_history - self.overall_delay
 
-    def _calc_gains(self, block):
-        gains = self._gain_calc.render(block)
-        return np.concatenate((gains.direct, gains.diffuse))
+        # the decorrelators are skipped while their input is silent, as long
+        # as it has been silent for long enough that their state is all zero
+        # (which takes decorrelator_history samples); this is the number of
+        # silent samples since the last non-zero diffuse sample
+        self._diffuse_silent_samples = decorrelator_history
+
+        self.delays = Delay(self._nchannels, self.overall_delay, dtype=dtype)
+
+        # temporary direct and diffuse signals before delay and decorrelation,
+        # and the output of the decorrelators
+        self._interpolated = ScratchBuffer(self._nchannels * 2, dtype=dtype)
+        self._diffuse_out = ScratchBuffer(self._nchannels, dtype=dtype)
+
+    def make_mixer(self):
+        """Make a new ObjectMixer with the same gain calculation options as
+        this renderer, whose output can be passed to process_mixed."""
+        return ObjectMixer(self._layout, self._gain_calc_opts, self._gain_cache_size, self._gain_batch_size)
+
+    @property
+    def gain_cache(self):
+        """GainCache of the mixer, or None if disabled."""
+        return self.mixer.gain_cache
+
+    @property
+    def block_processing_channels(self):
+        return self.mixer.block_processing_channels
 
     def set_rendering_items(self, rendering_items):
         """Set the rendering items to process.
@@ -129,12 +403,9 @@ class ObjectRenderer(object):
         Args:
             rendering_items (list of ObjectRenderingItem): Items to process.
         """
-        self.block_processing_channels = [(TrackProcessor(item.track_spec),
-                                           BlockProcessingChannel(item.metadata_source,
-                                                                  InterpretObjectMetadata(self._calc_gains)))
-                                          for item in rendering_items]
+        self.mixer.set_rendering_items(rendering_items)
 
-    def render(self, sample_rate, start_sample, input_samples):
+    def render(self, sample_rate, start_sample, input_samples, out=None):
         """Process n input samples to produce n output samples.
 
         Args:
@@ -143,17 +414,46 @@ class ObjectRenderer(object):
             input_samples (ndarray of (k, k) float): Multi-channel input sample
                 block; there must be at least as many channels as referenced in the
                 rendering items.
+            out (ndarray of (n, l) float or None): Array to write the output
+                samples to; if None, a new array is allocated.
 
         Returns:
             (ndarray of (n, l) float): l channels of output samples
                 corresponding to the l loudspeakers in layout.
         """
-        interpolated = np.zeros((len(input_samples), self._nchannels * 2))
+        interpolated = self._interpolated.get(len(input_samples))
+        interpolated.fill(0.0)
+
+        self.mixer.mix(sample_rate, start_sample, input_samples, interpolated)
+
+        return self.process_mixed(interpolated, out=out)
+
+    def process_mixed(self, mixed, out=None):
+        """Delay and decorrelate the direct and diffuse signals produced by
+        ObjectMixer.mix for n samples, producing n output samples.
+
+        Args:
+            mixed (ndarray of (n, 2*l) float): direct and diffuse signals; see
+                ObjectMixer.mix. The diffuse signals may be modified.
+            out (ndarray of (n, l) float or None): Array to write the output
+                samples to; if None, a new array is allocated.
 
-        for track_spec_processor, block_processing in self.block_processing_channels:
-            track_samples = track_spec_processor.process(sample_rate, input_samples)
-            block_processing.process(sample_rate, start_sample, track_samples, interpolated)
+        Returns:
+            (ndarray of (n, l) float): l channels of output samples
+                corresponding to the l loudspeakers in layout.
+        """
+        output_samples = self.delays.process(mixed[:, :self._nchannels], out=out)
+
+        diffuse = mixed[:, self._nchannels:]
+        if diffuse.any():
+            self._diffuse_silent_samples = 0
+        elif self._diffuse_gating and self._diffuse_silent_samples >= self.decorrelator_history:
+            # silent input and state, so the output would be silent too
+            self.decorrelators_vbs.skip_silence(len(mixed))
+            self._diffuse_silent_samples += len(mixed)
+            return output_samples
+        else:
+            self._diffuse_silent_samples += len(mixed)
 
-        direct_out = self.delays.process(interpolated[:, :self._nchannels])
-        diffuse_out = self.decorrelators_vbs.process(interpolated[:, self._nchannels:])
-        return direct_out + diffuse_out
+        output_samples += self.decorrelators_vbs.process(diffuse, out=self._diffuse_out.get(len(mixed)))
+        return output_samples
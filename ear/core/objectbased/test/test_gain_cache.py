@@ -0,0 +1,90 @@
+from fractions import Fraction
+import numpy as np
+import pytest
+from ..gain_cache import GainCache, object_meta_key, object_meta_keys_columns
+from ...metadata_input import ObjectTypeMetadata, ExtraData
+from ....common import PolarPosition, PolarScreen
+from ....fileio.adm.elements import (AudioBlockFormatObjects, ChannelLock, ObjectDivergence, ObjectsBlockFormatColumns,
+                                     PolarZone, ScreenEdgeLock)
+
+
+def make_otm(**kwargs):
+    kwargs.setdefault("position", dict(azimuth=0.0, elevation=0.0))
+    extra_data = kwargs.pop("extra_data", ExtraData())
+    return ObjectTypeMetadata(block_format=AudioBlockFormatObjects(**kwargs), extra_data=extra_data)
+
+
+def test_key_ignores_timing():
+    a = make_otm(rtime=Fraction(0), duration=Fraction(1))
+    b = make_otm(rtime=Fraction(1), duration=Fraction(1))
+    assert object_meta_key(a) == object_meta_key(b)
+    assert hash(object_meta_key(a)) == hash(object_meta_key(b))
+
+
+@pytest.mark.parametrize("kwargs", [
+    dict(position=dict(azimuth=10.0, elevation=0.0)),
+    dict(position=dict(X=0.0, Y=1.0, Z=0.0), cartesian=True),
+    dict(width=10.0),
+    dict(height=10.0),
+    dict(depth=0.5),
+    dict(gain=0.5),
+    dict(diffuse=0.5),
+    dict(channelLock=ChannelLock()),
+    dict(screenRef=True),
+])
+def test_key_includes_parameters(kwargs):
+    assert object_meta_key(make_otm()) != object_meta_key(make_otm(**kwargs))
+
+
+def test_key_reference_screen():
+    screen = PolarScreen(aspectRatio=1.5, centrePosition=PolarPosition(10.0, 0.0, 1.0), widthAzimuth=30.0)
+
+    # only used if screenRef is set
+    assert (object_meta_key(make_otm()) ==
+            object_meta_key(make_otm(extra_data=ExtraData(reference_screen=screen))))
+    assert (object_meta_key(make_otm(screenRef=True)) !=
+            object_meta_key(make_otm(screenRef=True, extra_data=ExtraData(reference_screen=screen))))
+
+
+def test_keys_columns():
+    screen = PolarScreen(aspectRatio=1.5, centrePosition=PolarPosition(10.0, 0.0, 1.0), widthAzimuth=30.0)
+    extra_data = ExtraData(reference_screen=screen)
+    block_formats = [make_otm(**kwargs).block_format for kwargs in [
+        dict(),
+        dict(position=dict(azimuth=10.0, elevation=5.0, distance=0.5, screenEdgeLock=ScreenEdgeLock(horizontal="left"))),
+        dict(position=dict(X=0.0, Y=1.0, Z=0.0), cartesian=True),
+        dict(width=10.0, height=5.0, depth=0.5, gain=0.5, diffuse=0.5),
+        dict(channelLock=ChannelLock(maxDistance=0.5)),
+        dict(objectDivergence=ObjectDivergence(value=0.5, azimuthRange=30.0)),
+        dict(screenRef=True),
+        dict(zoneExclusion=[PolarZone(minElevation=0.0, maxElevation=0.0, minAzimuth=0.0, maxAzimuth=30.0)]),
+    ]]
+    columns = ObjectsBlockFormatColumns(block_formats)
+
+    keys = object_meta_keys_columns(columns, extra_data, 1, len(block_formats))
+    assert keys == [object_meta_key(ObjectTypeMetadata(block_format=block_format, extra_data=extra_data))
+                    for block_format in block_formats[1:]]
+    assert len(set(keys)) == len(keys)
+
+
+def test_gain_cache_lru():
+    cache = GainCache(2)
+
+    assert cache.lookup("a") is None
+    cache.store("a", np.array([1.0]))
+    cache.store("b", np.array([2.0]))
+    assert cache.lookup("a")[0] == 1.0
+
+    # b is least recently used
+    cache.store("c", np.array([3.0]))
+    assert len(cache) == 2
+    assert cache.lookup("b") is None
+    assert cache.lookup("a")[0] == 1.0
+    assert cache.lookup("c")[0] == 3.0
+
+    assert cache.hits == 3
+    assert cache.misses == 2
+
+    # stored values are shared, so must not be modified
+    with pytest.raises(ValueError):
+        cache.lookup("a")[0] = 0.0
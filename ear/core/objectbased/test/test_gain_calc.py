@@ -532,3 +532,79 @@ def test_zone_exclusion():
           "T+000")
     check([PolarZone(minAzimuth=90.0, maxAzimuth=90.0, minElevation=90.0, maxElevation=90.0)],
           "T+000")
+
+
+def test_render_many(layout, gain_calc):
+    from .test_gain_calc_changes import generate_random_ObjectTypeMetadatas
+
+    object_metas = list(generate_random_ObjectTypeMetadatas())[:200]
+
+    # simple point sources which are handled by the vectorised path
+    for azimuth in np.linspace(-180, 180, 37):
+        for el in np.linspace(-90, 90, 7):
+            for distance in [0.5, 1.0, 1.5]:
+                block_format = AudioBlockFormatObjects(position=dict(azimuth=azimuth, elevation=el,
+                                                                     distance=distance),
+                                                       gain=0.5, diffuse=0.25)
+                object_metas.append(ObjectTypeMetadata(block_format=block_format))
+
+    gains = gain_calc.render_many(object_metas)
+
+    assert gains.direct.shape == gains.diffuse.shape == (len(object_metas), len(layout.channels))
+
+    for object_meta, direct, diffuse in zip(object_metas, gains.direct, gains.diffuse):
+        expected = gain_calc.render(object_meta)
+        npt.assert_allclose(direct, expected.direct, atol=1e-10)
+        npt.assert_allclose(diffuse, expected.diffuse, atol=1e-10)
+
+
+def test_render_columns(layout, gain_calc):
+    from .test_gain_calc_changes import generate_random_ObjectTypeMetadatas
+    from ....fileio.adm.elements import ObjectsBlockFormatColumns
+
+    block_formats = [object_meta.block_format
+                     for object_meta in list(generate_random_ObjectTypeMetadatas())[:200]]
+    for azimuth in np.linspace(-180, 180, 37):
+        for distance in [0.5, 1.0, 1.5]:
+            block_formats.append(AudioBlockFormatObjects(position=dict(azimuth=azimuth, elevation=0.0,
+                                                                       distance=distance),
+                                                         gain=0.5, diffuse=0.25))
+
+    columns = ObjectsBlockFormatColumns(block_formats)
+    extra_data = ExtraData()
+
+    for start, stop in [(0, None), (50, 250)]:
+        gains = gain_calc.render_columns(columns, extra_data, start, stop)
+        expected = gain_calc.render_many([ObjectTypeMetadata(block_format=block_format, extra_data=extra_data)
+                                          for block_format in block_formats[start:stop]])
+
+        npt.assert_allclose(gains.direct, expected.direct, atol=1e-10)
+        npt.assert_allclose(gains.diffuse, expected.diffuse, atol=1e-10)
+
+    # arbitrary blocks, including both simple and non-simple blocks
+    indices = np.random.RandomState(0).permutation(len(block_formats))[:100]
+    gains = gain_calc.render_columns(columns, extra_data, indices=indices)
+    expected = gain_calc.render_many([ObjectTypeMetadata(block_format=block_formats[i], extra_data=extra_data)
+                                      for i in indices])
+    npt.assert_allclose(gains.direct, expected.direct, atol=1e-10)
+    npt.assert_allclose(gains.diffuse, expected.diffuse, atol=1e-10)
+
+
+def test_point_source_table():
+    from ...direct_speakers.panner import DirectSpeakersPanner
+    from ...scenebased.design import HOADecoderDesign
+
+    layout = bs2051.get_layout("4+5+0")
+    opts = dict(use_table=True, table_resolution=2.0)
+
+    gain_calc = GainCalc(layout, point_source_opts=opts)
+    psp = gain_calc.point_source_panner
+    assert isinstance(psp, point_source.PointSourcePannerTable)
+
+    # the table is shared with other components using the same layout
+    assert DirectSpeakersPanner(layout, point_source_opts=opts).psp is psp
+    assert HOADecoderDesign(layout.without_lfe, point_source_opts=opts).psp is psp
+
+    block_format = AudioBlockFormatObjects(position=dict(azimuth=30.0, elevation=0.0, distance=1.0))
+    gains = gain_calc.render(ObjectTypeMetadata(block_format=block_format)).direct
+    npt.assert_allclose(gains, np.array(layout.channel_names) == "M+030", atol=1e-10)
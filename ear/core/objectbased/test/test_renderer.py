@@ -1,8 +1,12 @@
 from fractions import Fraction
 import numpy as np
-from ..renderer import InterpretObjectMetadata, FixedGains, InterpGains
-from ...metadata_input import ObjectTypeMetadata
-from ....fileio.adm.elements import AudioBlockFormatObjects, JumpPosition
+import numpy.testing as npt
+import pytest
+from ..renderer import InterpretObjectMetadata, FixedGains, InterpGains, ObjectRenderer
+from ... import bs2051
+from ...metadata_input import (ObjectTypeMetadata, MetadataSourceIter, MetadataSourceColumns, ObjectRenderingItem,
+                               DirectTrackSpec)
+from ....fileio.adm.elements import AudioBlockFormatObjects, JumpPosition, ObjectsBlockFormatColumns
 
 
 def test_interpret_object_metadata():
@@ -43,3 +47,164 @@ def test_interpret_object_metadata():
     # gap between blocks -> fixed for whole block (same as first)
     assert (bf_to_states(rtime=Fraction(6), duration=Fraction(1), gain=0.6) ==
             [FixedGains(start_sample=6*sr, end_sample=7*sr, gains=[0.6])])
+
+
+def render_blocks(layout, block_formats, input_samples, chunk_size, sr=48000, **options):
+    """Render a single object with the given block formats (a list or an
+    ObjectsBlockFormatColumns), processing input_samples in chunks of
+    chunk_size samples.
+
+    Returns:
+        (ObjectRenderer, ndarray): the renderer and its output samples
+    """
+    if isinstance(block_formats, ObjectsBlockFormatColumns):
+        metadata_source = MetadataSourceColumns(block_formats)
+    else:
+        metadata_source = MetadataSourceIter([ObjectTypeMetadata(block_format=bf) for bf in block_formats])
+
+    renderer = ObjectRenderer(layout, **options)
+    renderer.set_rendering_items([
+        ObjectRenderingItem(track_spec=DirectTrackSpec(0), metadata_source=metadata_source)])
+    output = np.concatenate([renderer.render(sr, start, input_samples[start:start + chunk_size])
+                             for start in range(0, len(input_samples), chunk_size)])
+    return renderer, output
+
+
+def test_gain_batch_size():
+    layout = bs2051.get_layout("4+5+0")
+    sr = 48000
+    block_dur = Fraction(1, 100)
+
+    block_formats = [AudioBlockFormatObjects(rtime=i * block_dur, duration=block_dur,
+                                             position=dict(azimuth=(i * 7.0) % 360 - 180,
+                                                           elevation=(i * 3.0) % 90,
+                                                           distance=1.0 if i % 3 else 0.5),
+                                             width=10.0 if i % 5 == 0 else 0.0,
+                                             jumpPosition=JumpPosition(flag=i % 4 == 0),
+                                             diffuse=0.2)
+                     for i in range(50)]
+    input_samples = np.random.normal(size=(int(sr * block_dur * 50), 1))
+
+    def render(**options):
+        return render_blocks(layout, block_formats, input_samples, 1000, sr=sr, **options)[1]
+
+    npt.assert_allclose(render(gain_batch_size=16), render(), atol=1e-10)
+
+
+def test_block_format_columns():
+    layout = bs2051.get_layout("4+5+0")
+    sr = 48000
+    block_dur = Fraction(1, 100)
+
+    # every 5th block has an extent, so needs a block format to be created
+    block_formats = [AudioBlockFormatObjects(rtime=i * block_dur, duration=block_dur,
+                                             position=dict(azimuth=(i * 7.0) % 360 - 180, elevation=0.0),
+                                             width=10.0 if i % 5 == 0 else 0.0,
+                                             jumpPosition=JumpPosition(flag=i % 4 == 0,
+                                                                       interpolationLength=block_dur / 2),
+                                             diffuse=0.2)
+                     for i in range(50)]
+    input_samples = np.random.normal(size=(int(sr * block_dur * 50), 1))
+
+    class CountingColumns(ObjectsBlockFormatColumns):
+        accessed = 0
+
+        def __getitem__(self, idx):
+            CountingColumns.accessed += 1
+            return super(CountingColumns, self).__getitem__(idx)
+
+    _renderer, expected = render_blocks(layout, block_formats, input_samples, 1000, sr=sr)
+
+    # without batching, blocks are created as usual
+    _renderer, output = render_blocks(layout, CountingColumns(block_formats), input_samples, 1000, sr=sr)
+    npt.assert_array_equal(output, expected)
+    assert CountingColumns.accessed == 50
+
+    CountingColumns.accessed = 0
+    _renderer, output = render_blocks(layout, CountingColumns(block_formats), input_samples, 1000, sr=sr,
+                                      gain_batch_size=16)
+    npt.assert_allclose(output, expected, atol=1e-10)
+    assert CountingColumns.accessed == 10
+
+
+def test_gain_cache():
+    layout = bs2051.get_layout("4+5+0")
+    sr = 48000
+    block_dur = Fraction(1, 100)
+
+    # positions repeat every 10 blocks
+    block_formats = [AudioBlockFormatObjects(rtime=i * block_dur, duration=block_dur,
+                                             position=dict(azimuth=(i % 10) * 20.0 - 90.0, elevation=0.0),
+                                             diffuse=0.2)
+                     for i in range(50)]
+    input_samples = np.random.normal(size=(int(sr * block_dur * 50), 1))
+
+    def render(**options):
+        return render_blocks(layout, block_formats, input_samples, 1000, sr=sr, **options)
+
+    uncached_renderer, uncached = render(gain_cache_size=0)
+    assert uncached_renderer.gain_cache is None
+
+    for options in [dict(), dict(gain_cache_size=4)]:
+        renderer, output = render(**options)
+        npt.assert_array_equal(output, uncached)
+        assert renderer.gain_cache.hits + renderer.gain_cache.misses == 50
+
+    # batched gain calculation is not bit-exact, but should use the cache
+    renderer, output = render(gain_batch_size=16)
+    npt.assert_allclose(output, uncached, atol=1e-10)
+    assert renderer.gain_cache.hits + renderer.gain_cache.misses == 50
+
+    renderer, output = render()
+    assert renderer.gain_cache.misses == 10
+    assert renderer.gain_cache.hits == 40
+
+    # blocks stored in columns are cached too; all blocks in the first batch
+    # miss, but their distinct keys are only calculated once
+    renderer, output = render_blocks(layout, ObjectsBlockFormatColumns(block_formats), input_samples, 1000, sr=sr,
+                                     gain_batch_size=16)
+    npt.assert_allclose(output, uncached, atol=1e-10)
+    assert renderer.gain_cache.misses == 16
+    assert renderer.gain_cache.hits == 34
+    assert len(renderer.gain_cache) == 10
+
+
+def test_head_block_size():
+    layout = bs2051.get_layout("4+5+0")
+
+    block_formats = [AudioBlockFormatObjects(position=dict(azimuth=30.0, elevation=0.0), diffuse=0.5)]
+    input_samples = np.random.normal(size=(10000, 1))
+
+    renderer, output = render_blocks(layout, block_formats, input_samples, 700)
+    renderer_low_latency, output_low_latency = render_blocks(layout, block_formats, input_samples, 700,
+                                                             head_block_size=32)
+
+    delay_diff = renderer.overall_delay - renderer_low_latency.overall_delay
+    assert delay_diff == 512 - 32
+
+    npt.assert_allclose(output[delay_diff:], output_low_latency[:-delay_diff], atol=1e-10)
+
+    for head_block_size in [24, 100]:
+        with pytest.raises(ValueError, match="power of two multiple of head_block_size"):
+            ObjectRenderer(layout, head_block_size=head_block_size)
+
+
+@pytest.mark.parametrize("head_block_size", [None, 32])
+def test_diffuse_gating(head_block_size):
+    layout = bs2051.get_layout("4+5+0")
+    sr = 48000
+    block_dur = Fraction(1, 10)
+
+    # diffuse for only a few blocks, with long enough gaps for the
+    # decorrelators to be skipped
+    diffuse = [0.0, 0.0, 0.5, 0.0, 0.0, 0.0, 1.0, 0.0]
+    block_formats = [AudioBlockFormatObjects(rtime=i * block_dur, duration=block_dur,
+                                             position=dict(azimuth=30.0, elevation=0.0), diffuse=d)
+                     for i, d in enumerate(diffuse)]
+    input_samples = np.random.normal(size=(int(sr * block_dur * len(diffuse)), 1))
+
+    def render(gated):
+        return render_blocks(layout, block_formats, input_samples, 700, sr=sr,
+                             head_block_size=head_block_size, diffuse_gating=gated)[1]
+
+    npt.assert_array_equal(render(gated=True), render(gated=False))
@@ -1,13 +1,55 @@
 import numpy as np
 import scipy.spatial
+from collections import OrderedDict
 from attr import attrs, attrib, evolve
 from .util import as_array, has_shape
-from .geom import ngon_vertex_order, PolarPosition
+from .geom import ngon_vertex_order, PolarPosition, cart, azimuth, elevation
 from .layout import Channel
-from ..options import OptionsHandler
+from ..options import OptionsHandler, Option
 from . import bs2051
 
 
+def _quadratic_roots_many(coeffs):
+    """Find the roots of many polynomials of order at most 2, giving the same
+    results as np.roots.
+
+    Args:
+        coeffs (array of (n, 3) doubles): polynomial coefficients, highest
+            power first, as for np.roots.
+
+    Returns:
+        array of (n, 2) complex: roots of each polynomial, in the same order as
+            np.roots, padded with NaN where there are fewer than two roots.
+    """
+    coeffs = np.asarray(coeffs, dtype=float)
+    c2, c1, c0 = coeffs.T
+    roots = np.full((len(coeffs), 2), np.nan, dtype=complex)
+
+    # np.roots strips leading zeros, then removes trailing zeros and adds a
+    # zero root for each
+    quadratic = (c2 != 0) & (c0 != 0)
+    if np.any(quadratic):
+        companion = np.zeros((np.count_nonzero(quadratic), 2, 2))
+        companion[:, 0, 0] = -c1[quadratic] / c2[quadratic]
+        companion[:, 0, 1] = -c0[quadratic] / c2[quadratic]
+        companion[:, 1, 0] = 1.0
+        roots[quadratic] = np.linalg.eigvals(companion)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        linear_zero = (c2 != 0) & (c0 == 0) & (c1 != 0)
+        roots[linear_zero, 0] = -c1[linear_zero] / c2[linear_zero]
+        roots[linear_zero, 1] = 0.0
+
+        roots[(c2 != 0) & (c0 == 0) & (c1 == 0)] = 0.0
+
+        linear = (c2 == 0) & (c1 != 0) & (c0 != 0)
+        roots[linear, 0] = -c0[linear] / c1[linear]
+
+        roots[(c2 == 0) & (c1 != 0) & (c0 == 0), 0] = 0.0
+
+    return roots
+
+
 class RegionHandler(object):
     """An interface for objects that can calculate gains for some positions,
     e.g. a triangle of loudspeakers.
@@ -50,6 +92,26 @@ class RegionHandler(object):
             out[self.output_channels] = pv
             return out
 
+    def handle_many(self, positions):
+        """Try to calculate gains for many positions at once.
+
+        The default implementation calls handle for each position; sub-classes
+        may override this with a vectorised implementation.
+
+        Args:
+            positions (array of (n, 3) doubles): Cartesian source positions.
+
+        Returns:
+            - array of n bools: True for positions which this region handles.
+            - array of (m, len(output_channels)) doubles: gains for the m
+              positions which this region handles, in the same order as
+              positions.
+        """
+        pvs = [self.handle(position) for position in positions]
+        handled = np.array([pv is not None for pv in pvs], dtype=bool)
+        handled_pvs = np.array([pv for pv in pvs if pv is not None]).reshape(-1, len(self.output_channels))
+        return handled, handled_pvs
+
 
 @attrs(slots=True)
 class Triplet(RegionHandler):
@@ -87,6 +149,18 @@ class Triplet(RegionHandler):
 
             return pv
 
+    def handle_many(self, positions):
+        pvs = np.dot(positions, self._basis)
+
+        epsilon = -1e-11
+        handled = np.all(pvs >= epsilon, axis=1)
+
+        pvs = pvs[handled]
+        pvs /= np.linalg.norm(pvs, axis=1, keepdims=True)
+        pvs.clip(0, 1, out=pvs)  # make sure all values are positive
+
+        return handled, pvs
+
 
 @attrs(slots=True)
 class VirtualNgon(RegionHandler):
@@ -147,6 +221,30 @@ class VirtualNgon(RegionHandler):
 
                 return pv
 
+    def handle_many(self, positions):
+        n = len(self.centre_downmix)
+        pvs = np.zeros((len(positions), n + 1))
+        handled = np.zeros(len(positions), dtype=bool)
+
+        for region in self.regions:
+            todo = np.flatnonzero(~handled)
+            if not len(todo):
+                break
+
+            region_handled, region_pvs = region.handle_many(positions[todo])
+            region_idx = todo[region_handled]
+
+            pvs[region_idx[:, np.newaxis], region.output_channels] = region_pvs
+            handled[region_idx] = True
+
+        # downmix the last channel containing the virtual centre speaker into
+        # the real speakers, and renormalise
+        pvs = pvs[handled]
+        pvs = pvs[:, :-1] + pvs[:, -1:] * self.centre_downmix
+        pvs /= np.linalg.norm(pvs, axis=1, keepdims=True)
+
+        return handled, pvs
+
 
 @attrs(slots=True)
 class QuadRegion(RegionHandler):
@@ -157,6 +255,8 @@ class QuadRegion(RegionHandler):
     order = attrib(default=None)
     pan_x = attrib(default=None)
     pan_y = attrib(default=None)
+    pan_x_many = attrib(default=None)
+    pan_y_many = attrib(default=None)
 
     @classmethod
     def pan_axis(cls, spk_positions):
@@ -179,10 +279,41 @@ class QuadRegion(RegionHandler):
 
         return handle
 
+    @classmethod
+    def pan_axis_many(cls, spk_positions):
+        """Vectorised version of pan_axis; the returned function takes an (n, 3)
+        array of positions and returns an array of n pan values, which are NaN
+        where the function returned by pan_axis would return None."""
+        a, b, c, d = spk_positions
+
+        poly = np.array([
+            np.cross(b-a, c-d),
+            np.cross(a, c-d) + np.cross(b-a, d),
+            np.cross(a, d),
+        ])
+
+        def handle_many(positions):
+            roots = _quadratic_roots_many(np.dot(positions, poly.T))
+
+            epsillon = 1e-10
+            valid = ((np.abs(np.imag(roots)) < epsillon) &
+                     (-epsillon < np.real(roots)) & (np.real(roots) < 1 + epsillon))
+
+            # use the first valid root, as in pan_axis
+            first_valid = np.argmax(valid, axis=1)
+            idx = np.arange(len(positions))
+            return np.where(valid[idx, first_valid],
+                            np.clip(np.real(roots[idx, first_valid]), 0, 1),
+                            np.nan)
+
+        return handle_many
+
     def __attrs_post_init__(self):
         self.order = ngon_vertex_order(self.positions)
         self.pan_x = self.pan_axis(self.positions[self.order])
         self.pan_y = self.pan_axis(self.positions[self.order][[1, 2, 3, 0]])
+        self.pan_x_many = self.pan_axis_many(self.positions[self.order])
+        self.pan_y_many = self.pan_axis_many(self.positions[self.order][[1, 2, 3, 0]])
 
     def handle(self, position):
         x = self.pan_x(position)
@@ -206,6 +337,26 @@ class QuadRegion(RegionHandler):
 
         return pvs
 
+    def handle_many(self, positions):
+        x = self.pan_x_many(positions)[:, np.newaxis]
+        y = self.pan_y_many(positions)[:, np.newaxis]
+
+        pvs = np.zeros((len(positions), 4))
+        pvs[:, self.order] = np.concatenate([
+            (1-x) * (1-y),
+            x * (1-y),
+            x * y,
+            (1-x) * y,
+        ], axis=1)
+
+        with np.errstate(invalid="ignore"):
+            handled = np.einsum("ij,ij->i", pvs.dot(self.positions), positions) > 0
+
+        pvs = pvs[handled]
+        pvs /= np.linalg.norm(pvs, axis=1, keepdims=True)
+
+        return handled, pvs
+
 
 @attrs(slots=True)
 class StereoPanDownmix(RegionHandler):
@@ -255,6 +406,23 @@ class StereoPanDownmix(RegionHandler):
 
         return pv_dmix
 
+    def handle_many(self, positions):
+        downmix = np.array([
+            [1.0000, 0.0000, np.sqrt(3) / 3, np.sqrt(0.5), 0.0000],
+            [0.0000, 1.0000, np.sqrt(3) / 3, 0.0000, np.sqrt(0.5)],
+        ])
+
+        pvs = self.psp.handle_many(positions)
+        pvs_dmix = np.dot(pvs, downmix.T)
+        pvs_dmix /= np.linalg.norm(pvs_dmix, axis=1, keepdims=True)
+
+        front = np.max(pvs[:, [0, 1, 2]], axis=1)
+        back = np.max(pvs[:, [3, 4]], axis=1)
+
+        pvs_dmix *= (0.5 ** (0.5 * back / (front + back)))[:, np.newaxis]
+
+        return np.ones(len(positions), dtype=bool), pvs_dmix
+
 
 @attrs(slots=True)
 class PointSourcePanner(object):
@@ -292,6 +460,38 @@ class PointSourcePanner(object):
             if pv is not None:
                 return pv
 
+    def handle_many(self, positions):
+        """Calculate gains for many positions; equivalent to calling handle for
+        each position, but with the regions evaluated on arrays of positions.
+
+        Args:
+            positions (array of (n, 3) doubles): Cartesian source positions.
+
+        Returns:
+            Array of (n, self.num_channels) doubles; rows for positions which
+            no region could handle (for which handle would return None) are
+            NaN.
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+
+        pvs = np.zeros((len(positions), self.num_channels))
+        handled = np.zeros(len(positions), dtype=bool)
+
+        for region in self.regions:
+            todo = np.flatnonzero(~handled)
+            if not len(todo):
+                break
+
+            region_handled, region_pvs = region.handle_many(positions[todo])
+            region_idx = todo[region_handled]
+
+            pvs[region_idx[:, np.newaxis], region.output_channels] = region_pvs
+            handled[region_idx] = True
+
+        pvs[~handled] = np.nan
+
+        return pvs
+
 
 @attrs(slots=True)
 class PointSourcePannerDownmix(object):
@@ -315,6 +515,107 @@ class PointSourcePannerDownmix(object):
             pv /= np.linalg.norm(pv)
             return pv
 
+    def handle_many(self, positions):
+        """Vectorised version of handle; see PointSourcePanner.handle_many."""
+        pvs = self.psp.handle_many(positions)
+        handled = ~np.isnan(pvs[:, 0])
+
+        out = np.full((len(pvs), self.num_channels), np.nan)
+        out_handled = np.dot(pvs[handled], self.downmix.T)
+        out_handled /= np.linalg.norm(out_handled, axis=1, keepdims=True)
+        out[handled] = out_handled
+
+        return out
+
+
+class PointSourcePannerTable(object):
+    """Approximation of a point source panner using a table of gains sampled
+    on a regular azimuth/elevation grid.
+
+    Gains for a position are found by bilinear interpolation between the four
+    surrounding grid points, followed by power normalisation. At loudspeaker
+    positions and grid points the gains are the same as those from the
+    original panner. Elsewhere, the error is bounded by the variation of the
+    original gains within a grid cell; for a resolution of 1 degree the
+    maximum absolute error in any gain for the BS.2051 layouts is below 0.04.
+
+    Args:
+        psp (PointSourcePanner or PointSourcePannerDownmix): Panner to
+            approximate.
+        speaker_positions (array of (m, 3) doubles): Cartesian loudspeaker
+            positions, at which exact gains are returned.
+        resolution (float): Maximum grid spacing in degrees.
+
+    Attributes:
+        psp (PointSourcePanner or PointSourcePannerDownmix): Original panner.
+        num_channels (int): Number of output channels.
+    """
+
+    def __init__(self, psp, speaker_positions, resolution):
+        self.psp = psp
+        self.num_channels = psp.num_channels
+
+        n_az = int(np.ceil(360.0 / resolution))
+        n_el = int(np.ceil(180.0 / resolution))
+        self._az_step = 360.0 / n_az
+        self._el_step = 180.0 / n_el
+
+        # grid includes both -180 and 180 degrees azimuth to avoid wrapping
+        azimuths = -180.0 + self._az_step * np.arange(n_az + 1)
+        elevations = -90.0 + self._el_step * np.arange(n_el + 1)
+        grid_positions = cart(azimuths[np.newaxis, :], elevations[:, np.newaxis], 1.0)
+
+        self._table = psp.handle_many(grid_positions.reshape(-1, 3)).reshape(
+            n_el + 1, n_az + 1, self.num_channels)
+        assert not np.any(np.isnan(self._table)), "panner could not handle all grid positions"
+        # not all panners are power-normalised, so the norm is interpolated too
+        self._table_norms = np.linalg.norm(self._table, axis=2)
+
+        speaker_positions = np.asarray(speaker_positions, dtype=float).reshape(-1, 3)
+        self._speaker_directions = speaker_positions / np.linalg.norm(speaker_positions, axis=1, keepdims=True)
+        self._speaker_gains = np.array([psp.handle(position) for position in speaker_positions])
+
+    def handle(self, position):
+        """Calculate gains for position; see PointSourcePanner.handle."""
+        return self.handle_many(np.asarray(position)[np.newaxis])[0]
+
+    def handle_many(self, positions):
+        """Calculate gains for many positions; see PointSourcePanner.handle_many.
+
+        Returns:
+            Array of (n, self.num_channels) doubles.
+        """
+        positions = np.asarray(positions, dtype=float).reshape(-1, 3)
+        az = azimuth(positions)
+        el = elevation(positions)
+
+        n_el, n_az = self._table.shape[0] - 1, self._table.shape[1] - 1
+
+        az_f = (az + 180.0) / self._az_step
+        az_i = np.clip(np.floor(az_f).astype(int), 0, n_az - 1)
+        az_t = (az_f - az_i)[:, np.newaxis]
+
+        el_f = (el + 90.0) / self._el_step
+        el_i = np.clip(np.floor(el_f).astype(int), 0, n_el - 1)
+        el_t = (el_f - el_i)[:, np.newaxis]
+
+        def interp(table):
+            return ((1.0 - el_t) * ((1.0 - az_t) * table[el_i, az_i] + az_t * table[el_i, az_i + 1]) +
+                    el_t * ((1.0 - az_t) * table[el_i + 1, az_i] + az_t * table[el_i + 1, az_i + 1]))
+
+        pvs = interp(self._table)
+        norms = interp(self._table_norms[:, :, np.newaxis])
+        pvs *= norms / np.linalg.norm(pvs, axis=1, keepdims=True)
+
+        # use the exact gains for positions at loudspeakers
+        directions = cart(az, el, 1.0)
+        cos_angles = np.dot(directions, self._speaker_directions.T)
+        nearest = np.argmax(cos_angles, axis=1)
+        at_speaker = cos_angles[np.arange(len(positions)), nearest] > 1.0 - 1e-12
+        pvs[at_speaker] = self._speaker_gains[nearest[at_speaker]]
+
+        return pvs
+
 
 def _configure_stereo(layout):
     """Configure a point source panner assuming an 0+2+0 layout."""
@@ -709,14 +1010,68 @@ def configure_allocentric(layout):
     return AllocentricPanner(positions)
 
 
-configure_options = OptionsHandler()
+configure_options = OptionsHandler(
+    use_table=Option(
+        default=False,
+        description="approximate the point source panner using a precomputed table of gains; "
+                    "this is faster but not exact except at loudspeaker positions",
+    ),
+    table_resolution=Option(
+        default=1.0,
+        description="grid spacing of the table in degrees, if use_table is set",
+    ),
+)
+
+
+def _layout_key(layout):
+    """Hashable key for the parts of a layout used by configure."""
+    return (layout.name,
+            tuple((channel.name, channel.is_lfe,
+                   channel.polar_position.azimuth, channel.polar_position.elevation,
+                   channel.polar_position.distance,
+                   channel.polar_nominal_position.azimuth, channel.polar_nominal_position.elevation,
+                   channel.polar_nominal_position.distance)
+                  for channel in layout.channels))
+
 
+# tables are slow to build and large, so are shared between calls to configure
+# with the same layout; the most recently used few are kept
+_table_cache = OrderedDict()
+_table_cache_size = 4
 
-def configure(layout):
+
+def _configure_table(layout, resolution):
+    key = (_layout_key(layout), resolution)
+
+    try:
+        table = _table_cache.pop(key)
+    except KeyError:
+        table = PointSourcePannerTable(_configure_exact(layout), layout.positions, resolution)
+
+    _table_cache[key] = table
+    if len(_table_cache) > _table_cache_size:
+        _table_cache.popitem(last=False)
+
+    return table
+
+
+def _configure_exact(layout):
+    if layout.name == "0+2+0":
+        return _configure_stereo(layout)
+    else:
+        return _configure_full(layout)
+
+
+@configure_options.with_defaults
+def configure(layout, use_table, table_resolution):
     """Configure a point source panner given a loudspeaker layout.
 
     Args:
         layout (.layout.Layout): Loudspeaker layout.
+        use_table (bool): Return a PointSourcePannerTable approximating the
+            panner; the table is shared between calls with the same layout and
+            resolution.
+        table_resolution (float): Grid spacing of the table in degrees.
 
     Returns:
         PointSourcePanner: point source panner configured to output channels in
@@ -727,7 +1082,7 @@ def configure(layout):
 
     _check_screen_speakers(layout)
 
-    if layout.name == "0+2+0":
-        return _configure_stereo(layout)
+    if use_table:
+        return _configure_table(layout, table_resolution)
     else:
-        return _configure_full(layout)
+        return _configure_exact(layout)
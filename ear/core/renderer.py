@@ -1,16 +1,93 @@
 import numpy as np
+from multiprocessing.pool import ThreadPool
 from .objectbased.renderer import ObjectRenderer
 from .direct_speakers.renderer import DirectSpeakersRenderer
 from .scenebased.renderer import HOARenderer
-from ..options import SubOptions, OptionsHandler
+from ..options import Option, SubOptions, OptionsHandler
 from .metadata_input import ObjectRenderingItem, DirectSpeakersRenderingItem, HOARenderingItem
 from .block_aligner import BlockAligner
+from .renderer_common import ScratchBuffer
+from .track_processor import max_delay
+
+
+class _RendererPartition(object):
+    """Gain application for all types, for one partition of the rendering
+    items.
+
+    The Objects items are only mixed into direct and diffuse signals here;
+    these are summed over all partitions before being delayed and
+    decorrelated once by the Objects renderer.
+    """
+
+    def __init__(self, layout, object_mixer, direct_speakers_opts, hoa_renderer_opts, dtype):
+        self.object_mixer = object_mixer
+        self.direct_speakers_renderer = DirectSpeakersRenderer(layout, dtype=dtype, **direct_speakers_opts)
+        self.hoa_renderer = HOARenderer(layout, dtype=dtype, **hoa_renderer_opts)
+
+        # output buffers for each type, reused between blocks
+        n_channels = len(layout.channels)
+        self._outputs = [ScratchBuffer(n_channels * 2, dtype=dtype),
+                         ScratchBuffer(n_channels, dtype=dtype),
+                         ScratchBuffer(n_channels, dtype=dtype)]
+
+    def set_rendering_items(self, object_items, direct_speakers_items, hoa_items):
+        self.object_mixer.set_rendering_items(object_items)
+        self.direct_speakers_renderer.set_rendering_items(direct_speakers_items)
+        self.hoa_renderer.set_rendering_items(hoa_items)
+
+    def skip(self, sample_rate, start_sample, num_samples):
+        """Advance the metadata for all items through some samples without
+        rendering them."""
+        for renderer in [self.object_mixer, self.direct_speakers_renderer, self.hoa_renderer]:
+            for track_spec_processor, block_processing in renderer.block_processing_channels:
+                block_processing.skip(sample_rate, start_sample, num_samples)
+
+    def render(self, sample_rate, start_sample, samples):
+        """Render samples with each renderer, returning a tuple of the object
+        direct and diffuse signals (see ObjectMixer.mix), and the direct
+        speakers and HOA outputs; these are only valid until the next call."""
+        object_mixed, direct_speakers_out, hoa_out = [output.get(len(samples)) for output in self._outputs]
+        object_mixed.fill(0.0)
+        self.object_mixer.mix(sample_rate, start_sample, samples, object_mixed)
+        return (object_mixed,
+                self.direct_speakers_renderer.render(sample_rate, start_sample, samples, out=direct_speakers_out),
+                self.hoa_renderer.render(sample_rate, start_sample, samples, out=hoa_out))
+
+
+def _split_items(items, num_partitions):
+    """Split items into num_partitions contiguous lists with sizes differing by
+    at most one."""
+    size, extra = divmod(len(items), num_partitions)
+
+    partitions = []
+    start = 0
+    for i in range(num_partitions):
+        end = start + size + (1 if i < extra else 0)
+        partitions.append(items[start:end])
+        start = end
+
+    return partitions
 
 
 class Renderer(object):
     """Renderer that supports all the available object types (currently only
     objects).
 
+    The rendering items of each type can be split into partitions whose gains
+    are calculated and applied separately, optionally in parallel using a pool
+    of threads. The outputs of the partitions are always summed in the same
+    order, so the output depends on the number of partitions but not on the
+    number of threads. The summed Objects signals are then decorrelated and
+    delayed once, so this processing is not repeated for each partition.
+
+    With the dtype option set to float32, audio samples are processed as
+    float32 throughout, while gains and filters are designed in float64 and
+    converted when they are applied. Compared to float64 processing, each
+    output sample has an error of the order of the float32 epsilon (about
+    6e-8) relative to the sum of the magnitudes of the signals mixed into it;
+    for the integration test files the maximum absolute error is below 2**-24,
+    half of a 24-bit LSB.
+
     Parameters:
         layout (.layout.Layout): loudspeaker layout to render to
     """
@@ -28,64 +105,275 @@ class Renderer(object):
             handler=HOARenderer.options,
             description="options for HOA renderer",
         ),
+        num_partitions=Option(
+            default=1,
+            description="number of partitions to split the rendering items of each type into; "
+                        "must be at least 1",
+        ),
+        num_threads=Option(
+            default=1,
+            description="number of threads used to render partitions in parallel; "
+                        "this does not affect the output",
+        ),
+        dtype=Option(
+            default="float64",
+            description="floating point type used for audio processing: float64 or float32; "
+                        "gains are always calculated using float64",
+        ),
     )
 
     @options.with_defaults
-    def __init__(self, layout, object_renderer_opts={}, direct_speakers_opts={}, hoa_renderer_opts={}):
-        self.block_aligner = BlockAligner(len(layout.channels))
+    def __init__(self, layout, object_renderer_opts={}, direct_speakers_opts={}, hoa_renderer_opts={},
+                 num_partitions=1, num_threads=1, dtype="float64"):
+        self.dtype = np.dtype(dtype)
+        assert self.dtype in (np.float32, np.float64), "dtype must be float32 or float64"
+
+        self._n_channels = len(layout.channels)
+        self._track_specs = []
+
+        if num_partitions < 1:
+            raise ValueError("num_partitions ({num_partitions}) must be at least 1".format(
+                num_partitions=num_partitions))
+
+        self.object_renderer = ObjectRenderer(layout, dtype=self.dtype, **object_renderer_opts)
+        self._object_out = ScratchBuffer(self._n_channels, dtype=self.dtype)
+
+        # the first partition uses the mixer of the object renderer, so that
+        # it is not left unused
+        self._partitions = [_RendererPartition(layout,
+                                               self.object_renderer.mixer if i == 0
+                                               else self.object_renderer.make_mixer(),
+                                               direct_speakers_opts, hoa_renderer_opts, self.dtype)
+                            for i in range(num_partitions)]
+        self._object_delay = self.object_renderer.overall_delay
 
-        self._object_renderer = ObjectRenderer(layout, **object_renderer_opts)
-        self._direct_speakers_renderer = DirectSpeakersRenderer(layout, **direct_speakers_opts)
-        self._hoa_renderer = HOARenderer(layout, **hoa_renderer_opts)
+        self.block_aligner = self._make_block_aligner(0)
+
+        self._pool = ThreadPool(min(num_threads, num_partitions)) if num_threads > 1 and num_partitions > 1 else None
 
         self.start_sample = 0
 
+    def _make_block_aligner(self, start_sample):
+        # the aligner must hold the object renderer delay plus one block;
+        # the block size is not known here, so it grows on the first block
+        return BlockAligner(self._n_channels, start=start_sample, dtype=self.dtype, capacity=self._object_delay)
+
     def set_rendering_items(self, rendering_items):
-        self._object_renderer.set_rendering_items([item for item in rendering_items
-                                                   if isinstance(item, ObjectRenderingItem)])
+        num_partitions = len(self._partitions)
+
+        object_items = _split_items([item for item in rendering_items
+                                     if isinstance(item, ObjectRenderingItem)],
+                                    num_partitions)
+
+        direct_speakers_items = _split_items([item for item in rendering_items
+                                              if isinstance(item, DirectSpeakersRenderingItem)],
+                                             num_partitions)
 
-        self._direct_speakers_renderer.set_rendering_items([item for item in rendering_items
-                                                            if isinstance(item, DirectSpeakersRenderingItem)])
+        hoa_items = _split_items([item for item in rendering_items
+                                  if isinstance(item, HOARenderingItem)],
+                                 num_partitions)
 
-        self._hoa_renderer.set_rendering_items([item for item in rendering_items
-                                                if isinstance(item, HOARenderingItem)])
+        for partition, items in zip(self._partitions, zip(object_items, direct_speakers_items, hoa_items)):
+            partition.set_rendering_items(*items)
+
+        self._track_specs = []
+        for item in rendering_items:
+            if isinstance(item, HOARenderingItem):
+                self._track_specs.extend(item.track_specs)
+            elif isinstance(item, (ObjectRenderingItem, DirectSpeakersRenderingItem)):
+                self._track_specs.append(item.track_spec)
 
         # XXX: check for unsupported types?
 
-    def render(self, sample_rate, samples):
+    def history_length(self, sample_rate):
+        """Get the number of past input samples which can affect each output
+        sample with the current rendering items.
+
+        After skip_to, the output is the same as if the skipped samples had
+        been rendered once at least this many input samples have been
+        rendered.
+
+        Args:
+            sample_rate (int): Sample rate.
+
+        Returns:
+            int: number of samples
+        """
+        track_delay = max([max_delay(track_spec, sample_rate) for track_spec in self._track_specs] + [0])
+        return track_delay + self.object_renderer.history_length
+
+    @property
+    def skip_to_alignment(self):
+        """The start_sample passed to skip_to must be a multiple of this."""
+        return self.object_renderer.block_size
+
+    def skip_to(self, sample_rate, start_sample):
+        """Start rendering at start_sample rather than 0.
+
+        This must be called after set_rendering_items and before render. The
+        metadata before start_sample is still processed, so any interpolation
+        in progress at start_sample is the same as if the skipped samples had
+        been rendered, but the audio processing state (e.g. in delays and
+        decorrelation filters) starts off silent; see history_length.
+
+        For the output to be identical to rendering from the start, the
+        samples after start_sample must be passed to render in the same blocks
+        as they would have been, and start_sample must be a multiple of the
+        object renderer block_size (skip_to_alignment), so that the
+        decorrelation filters are processed in the same blocks. This is
+        sufficient when head_block_size is used, as block_size must be a power
+        of two multiple of it, so the smaller partitions of the decorrelation
+        filters have the same phase.
+
+        After this, the first sample returned by render is output sample
+        start_sample.
+
+        Args:
+            sample_rate (int): Sample rate.
+            start_sample (int): Index of the first sample to be rendered.
+        """
+        assert self.start_sample == 0, "skip_to must be called before render"
+        assert start_sample % self.skip_to_alignment == 0, \
+            "start_sample must be a multiple of the object renderer block_size"
+
+        for partition in self._partitions:
+            partition.skip(sample_rate, 0, start_sample)
+
+        self.start_sample = start_sample
+        self.block_aligner = self._make_block_aligner(start_sample)
+
+    def render(self, sample_rate, samples, out=None):
         """Render n samples.
 
         Args:
             sample_rate (int): Sample Rate.
             samples (ndarray of (n, k) floats): k channels of input audio.
+            out (ndarray of (m, l) floats or None): Array to write the output
+                samples to, with m >= n; if this is provided the returned array
+                is a view of the start of it, otherwise a new array is
+                allocated.
 
         Note:
             This may return fewer output samples than input samples in order to
             compensate for processing delay; the first sample returned is
-            always output sample 0. Call `get_tail` after all input audio has
-            been passed to `render` to get the missing samples.
+            always output sample 0 (or the sample passed to skip_to). Call
+            `get_tail` after all input audio has been passed to `render` to
+            get the missing samples.
 
         Returns:
             ndarray of (m, l): m samples and l channels of output audio.
         """
-        self.block_aligner.add(
-            self.start_sample - self._object_renderer.overall_delay,
-            self._object_renderer.render(sample_rate, self.start_sample, samples))
+        def render_partition(partition):
+            return partition.render(sample_rate, self.start_sample, samples)
+
+        if self._pool is not None:
+            partition_outputs = self._pool.map(render_partition, self._partitions)
+        else:
+            partition_outputs = [render_partition(partition) for partition in self._partitions]
 
-        self.block_aligner.add(
-            self.start_sample,
-            self._direct_speakers_renderer.render(sample_rate, self.start_sample, samples))
+        # sum the outputs for each type in partition order
+        object_mixed, direct_speakers_out, hoa_out = partition_outputs[0]
+        for partition_object_mixed, partition_direct_speakers_out, partition_hoa_out in partition_outputs[1:]:
+            object_mixed += partition_object_mixed
+            direct_speakers_out += partition_direct_speakers_out
+            hoa_out += partition_hoa_out
 
-        self.block_aligner.add(
-            self.start_sample,
-            self._hoa_renderer.render(sample_rate, self.start_sample, samples))
+        object_out = self.object_renderer.process_mixed(object_mixed, out=self._object_out.get(len(samples)))
+
+        self.block_aligner.add(self.start_sample - self._object_delay, object_out)
+        self.block_aligner.add(self.start_sample, direct_speakers_out)
+        self.block_aligner.add(self.start_sample, hoa_out)
 
         self.start_sample += len(samples)
 
-        return self.block_aligner.get()
+        return self.block_aligner.get(out=out)
+
+    def get_tail(self, sample_rate, n_channels, out=None):
+        """Get an additional block of samples that completes the output.
+
+        If out is provided, it must have at least tail_length samples; see
+        render.
+        """
+        total_delay = self._object_delay
+
+        return self.render(sample_rate, np.zeros((total_delay, n_channels), dtype=self.dtype), out=out)
+
+    @property
+    def tail_length(self):
+        """Number of samples returned by get_tail."""
+        return self._object_delay
 
-    def get_tail(self, sample_rate, n_channels):
-        """Get an additional block of samples that completes the output."""
-        total_delay = self._object_renderer.overall_delay
+    def close(self):
+        """Stop any threads used for rendering; call this once rendering is
+        finished."""
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
 
-        return self.render(sample_rate, np.zeros((total_delay, n_channels)))
+
+class StreamingRenderer(Renderer):
+    """Renderer for live use, which processes fixed-size blocks of samples
+    with a fixed latency.
+
+    Unlike Renderer.render, process always returns as many samples as it is
+    given: rather than compensating for the delay in the Objects renderer, all
+    outputs are delayed by latency samples.
+
+    The rendering items are fixed once set, but their metadata can be
+    delivered while rendering by using metadata_input.MetadataSourceQueue
+    sources. If metadata for some samples is not available in time, the last
+    gains are held, and the underrun is counted in underruns. Memory use does
+    not grow while rendering, so this can run indefinitely.
+
+    Parameters:
+        layout (.layout.Layout): loudspeaker layout to render to
+        sample_rate (int): sample rate
+        block_size (int): number of samples in each block passed to process
+        options: Renderer options
+    """
+
+    def __init__(self, layout, sample_rate, block_size, **options):
+        super(StreamingRenderer, self).__init__(layout, **options)
+        self.sample_rate = sample_rate
+        self.block_size = block_size
+
+    def _make_block_aligner(self, start_sample):
+        # start the output latency samples early, so that the first block
+        # from the Objects renderer completes a full output block; the other
+        # outputs are silent before start_sample
+        return BlockAligner(self._n_channels, start=start_sample - self._object_delay, dtype=self.dtype,
+                            capacity=self._object_delay)
+
+    @property
+    def latency(self):
+        """Number of samples that the output is delayed by."""
+        return self._object_delay
+
+    @property
+    def underruns(self):
+        """Total number of metadata underruns for all rendering items."""
+        return sum(block_processing.underruns
+                   for partition in self._partitions
+                   for renderer in [partition.object_mixer,
+                                    partition.direct_speakers_renderer,
+                                    partition.hoa_renderer]
+                   for track_spec_processor, block_processing in renderer.block_processing_channels)
+
+    def process(self, samples, out=None):
+        """Render one block of samples.
+
+        Args:
+            samples (ndarray of (block_size, k) floats): k channels of input
+                audio.
+            out (ndarray of (block_size, l) floats or None): Array to write the
+                output samples to; if None, a new array is allocated.
+
+        Returns:
+            ndarray of (block_size, l): l channels of output audio, delayed by
+            latency samples.
+        """
+        assert len(samples) == self.block_size, "blocks must have block_size samples"
+        output = self.render(self.sample_rate, samples, out=out)
+        assert len(output) == self.block_size
+        return output
@@ -1,14 +1,23 @@
+from __future__ import division
 import numpy as np
 import math
 from fractions import Fraction
 from attr import attrs, attrib
 from collections import deque
+import scipy.sparse
 import warnings
 
+try:
+    from math import gcd
+except ImportError:
+    from fractions import gcd
+
 
 def ceil(x):
     """Ceiling function compatible with Fraction on both python 2 and 3 that
     also passes through inf."""
+    if isinstance(x, Fraction):
+        return -(-x.numerator // x.denominator)
     if math.isinf(x):
         return x
     y = math.trunc(x)
@@ -17,6 +26,51 @@ def ceil(x):
     return y
 
 
+def common_ticks(*times):
+    """Convert some times to integer numbers of ticks at a common rate.
+
+    Args:
+        times (Fraction, int or None): times in seconds; None is passed
+            through.
+
+    Returns:
+        tuple:
+            ticks per second (int): the lowest common multiple of the
+                denominators of times
+            ticks (list of int or None): times in ticks
+    """
+    ticks_per_second = 1
+    for time in times:
+        if time is not None and ticks_per_second % time.denominator:
+            ticks_per_second *= time.denominator // gcd(ticks_per_second, time.denominator)
+
+    return ticks_per_second, [None if time is None else time.numerator * (ticks_per_second // time.denominator)
+                              for time in times]
+
+
+def ticks_to_samples(ticks, ticks_per_second, sample_rate):
+    """Convert a time in ticks to a (possibly fractional) sample number.
+
+    This is exactly equal to ticks * sample_rate / ticks_per_second, but is an
+    int rather than a Fraction if the time is a whole number of samples.
+
+    Args:
+        ticks (int or None): time in ticks, or None for no time, which is
+            converted to inf
+        ticks_per_second (int): number of ticks per second
+        sample_rate (int): sample rate
+
+    Returns:
+        int, Fraction or inf: sample number
+    """
+    if ticks is None:
+        return np.inf
+    numerator = ticks * sample_rate
+    if numerator % ticks_per_second == 0:
+        return numerator // ticks_per_second
+    return Fraction(numerator, ticks_per_second)
+
+
 @attrs(slots=True, frozen=True)
 class ProcessingBlock(object):
     """Time-bounded audio processing.
@@ -70,6 +124,63 @@ class ProcessingBlock(object):
         return (slice(overlap_start_sample - self.first_sample, overlap_end_sample - self.first_sample),
                 slice(overlap_start_sample - start_sample, overlap_end_sample - start_sample))
 
+    def held(self, start_sample, end_sample):
+        """Get a block which continues the processing at the end of this block
+        between start_sample and end_sample; this is used to hold the last
+        gains when metadata is not available in time.
+
+        Returns:
+            ProcessingBlock or None: processing block, or None if no processing
+            should be applied.
+        """
+        return None
+
+
+# gain vectors with at most this fraction of non-zero gains are applied to only
+# the non-zero channels, and mixes with at most this fraction of non-zero gains
+# use a sparse gain matrix
+SPARSE_MAX_DENSITY = 0.25
+
+
+def sparse_gains(gains):
+    """Get a compact representation of a gain vector if it is sparse enough.
+
+    Args:
+        gains (array-like of n floats): Gains for each output channel.
+
+    Returns:
+        tuple or None: if at most SPARSE_MAX_DENSITY of the gains are
+        non-zero, a tuple of the indices of the non-zero channels and the
+        gains for those channels, otherwise None.
+    """
+    gains = np.asarray(gains)
+    channels = np.flatnonzero(gains)
+    if len(channels) <= SPARSE_MAX_DENSITY * len(gains):
+        return channels, gains[channels]
+    else:
+        return None
+
+
+def _apply_gains(ovl_samples, input_column, gains, gains_sparse, output_samples):
+    """Sum input_column multiplied by gains into output_samples, touching only
+    the non-zero channels if gains_sparse (from sparse_gains) is not None."""
+    if gains_sparse is not None:
+        channels, values = gains_sparse
+        if len(channels):
+            output_samples[ovl_samples, channels] += input_column[:, np.newaxis] * values[np.newaxis]
+    else:
+        output_samples[ovl_samples] += input_column[:, np.newaxis] * gains[np.newaxis]
+
+
+def _gains_term(ovl_samples, input_column, gains, gains_sparse):
+    """Make a term for matrix_terms, using the sparse representation of the
+    gains if available."""
+    if gains_sparse is not None:
+        channels, values = gains_sparse
+        return (ovl_samples, input_column[:, np.newaxis], values[np.newaxis], channels)
+    else:
+        return (ovl_samples, input_column[:, np.newaxis], gains[np.newaxis], None)
+
 
 @attrs(slots=True, frozen=True)
 class FixedGains(ProcessingBlock):
@@ -77,10 +188,37 @@ class FixedGains(ProcessingBlock):
 
     gains = attrib()
 
+    # result of sparse_gains(gains)
+    _gains_sparse = attrib(init=False, cmp=False)
+
+    @_gains_sparse.default
+    def init_gains_sparse(self):
+        return sparse_gains(self.gains)
+
     def process(self, start_sample, input_samples, output_samples):
         ovl_state, ovl_samples = self.overlap(start_sample, len(input_samples))
 
-        output_samples[ovl_samples] += input_samples[ovl_samples, np.newaxis] * self.gains[np.newaxis]
+        _apply_gains(ovl_samples, input_samples[ovl_samples], self.gains, self._gains_sparse, output_samples)
+
+    def matrix_terms(self, start_sample, input_samples, num_outputs):
+        """Express this processing as matrix products; see mix_block_processing_channels.
+
+        Returns:
+            list of tuples:
+                - slice: samples in the block of samples that the term applies to
+                - ndarray of (m, c) float: c columns of weighted input samples
+                - ndarray of (c, k) float: gains from each column to k output
+                    channels
+                - array of k ints or None: the output channel numbers that the
+                    gains apply to, or None if k == num_outputs and the gains
+                    apply to all output channels
+        """
+        ovl_state, ovl_samples = self.overlap(start_sample, len(input_samples))
+
+        return [_gains_term(ovl_samples, input_samples[ovl_samples], self.gains, self._gains_sparse)]
+
+    def held(self, start_sample, end_sample):
+        return FixedGains(start_sample, end_sample, self.gains)
 
 
 @attrs(slots=True, frozen=True)
@@ -99,6 +237,10 @@ class InterpGains(ProcessingBlock):
     # end_sample, sampled for each sample in range first_sample:last_sample
     _interp_p = attrib(init=False, cmp=False)
 
+    # results of sparse_gains for gains_start and gains_end
+    _gains_start_sparse = attrib(init=False, cmp=False)
+    _gains_end_sparse = attrib(init=False, cmp=False)
+
     @_interp_p.default
     def init_interp_p(self):
         # number of samples actually in the ramp
@@ -107,22 +249,56 @@ class InterpGains(ProcessingBlock):
         # avoid divide by 0 if there are no samples to apply to
         if n == 0: return np.array([])
 
-        # value at first_sample and last_sample
+        # value at first_sample and last_sample; if start_sample and
+        # end_sample are ints, this is a correctly rounded true division, the
+        # same as for Fractions
         start = float((self.first_sample - self.start_sample) / (self.end_sample - self.start_sample))
         end = float((self.last_sample - self.start_sample) / (self.end_sample - self.start_sample))
 
         return start + np.arange(n) * ((end - start) / n)
 
+    @_gains_start_sparse.default
+    def init_gains_start_sparse(self):
+        return sparse_gains(self.gains_start) if self.gains_start is not None else None
+
+    @_gains_end_sparse.default
+    def init_gains_end_sparse(self):
+        return sparse_gains(self.gains_end) if self.gains_end is not None else None
+
     def process(self, start_sample, input_samples, output_samples):
         ovl_state, ovl_samples = self.overlap(start_sample, len(input_samples))
 
         if self.gains_start is not None:
             input_fade_down = input_samples[ovl_samples] * (1.0 - self._interp_p[ovl_state])
-            output_samples[ovl_samples] += input_fade_down[:, np.newaxis] * self.gains_start[np.newaxis]
+            _apply_gains(ovl_samples, input_fade_down, self.gains_start, self._gains_start_sparse, output_samples)
+
+        if self.gains_end is not None:
+            input_fade_up = input_samples[ovl_samples] * self._interp_p[ovl_state]
+            _apply_gains(ovl_samples, input_fade_up, self.gains_end, self._gains_end_sparse, output_samples)
+
+    def matrix_terms(self, start_sample, input_samples, num_outputs):
+        """Express this processing as matrix products; the ramp is applied to
+        the input samples, giving one column for the start gains and one for
+        the end gains. See FixedGains.matrix_terms."""
+        ovl_state, ovl_samples = self.overlap(start_sample, len(input_samples))
+
+        terms = []
+
+        if self.gains_start is not None:
+            input_fade_down = input_samples[ovl_samples] * (1.0 - self._interp_p[ovl_state])
+            terms.append(_gains_term(ovl_samples, input_fade_down, self.gains_start, self._gains_start_sparse))
 
         if self.gains_end is not None:
             input_fade_up = input_samples[ovl_samples] * self._interp_p[ovl_state]
-            output_samples[ovl_samples] += input_fade_up[:, np.newaxis] * self.gains_end[np.newaxis]
+            terms.append(_gains_term(ovl_samples, input_fade_up, self.gains_end, self._gains_end_sparse))
+
+        return terms
+
+    def held(self, start_sample, end_sample):
+        if self.gains_end is not None:
+            return FixedGains(start_sample, end_sample, self.gains_end)
+        else:
+            return None
 
 
 class BlockProcessingChannel(object):
@@ -135,16 +311,36 @@ class BlockProcessingChannel(object):
         interpret_metadata (callable): Take a block from the metadata source
             (e.g. an ObjectTypeMetadata) and produce some corresponding
             ProcessingBlock objects to apply to the audio stream.
+        max_blocks (int): Maximum number of blocks to pull from the metadata
+            source at once. If this is more than 1, interpret_metadata must
+            have an interpret_many method, which is called with a list of
+            blocks.
+
+    If metadata_source.hold_on_underrun is true, metadata underruns (when no
+    metadata is available for some samples, or metadata arrives after the
+    samples it applies to) do not raise an exception. Instead, the processing
+    at the end of the last block is held (see ProcessingBlock.held) until more
+    metadata is available, late blocks are only applied to the remaining
+    samples, and each underrun is counted in the underruns attribute.
     """
 
-    def __init__(self, metadata_source, interpret_metadata):
+    def __init__(self, metadata_source, interpret_metadata, max_blocks=1):
         self.metadata_source = metadata_source
         self.interpret_metadata = interpret_metadata
+        self.max_blocks = max_blocks
 
         # queue of ProcessingBlock to apply to the audio stream; the first item
         # is the currently active one
         self.processing_queue = deque()
 
+        # the last block removed from processing_queue, used to hold the
+        # processing on underrun
+        self._last_block = None
+        # are we currently holding the processing from _last_block?
+        self._holding = False
+        # number of metadata underruns
+        self.underruns = 0
+
     def _refil_processing_queue(self, sample_rate, start_sample=None):
         """If processing_queue is empty, try to fill it up by pulling from the
         metadata source and interpreting the result.
@@ -155,14 +351,32 @@ class BlockProcessingChannel(object):
                 about to process, to check that metadata has not appeared too late.
         """
         while not len(self.processing_queue):
-            block = self.metadata_source.get_next_block()
+            if self.max_blocks > 1:
+                blocks = self.metadata_source.get_next_blocks(self.max_blocks)
 
-            if block is None:
-                return
+                if not blocks:
+                    return
+
+                new_states = self.interpret_metadata.interpret_many(sample_rate, blocks)
+            else:
+                block = self.metadata_source.get_next_block()
+
+                if block is None:
+                    return
+
+                new_states = self.interpret_metadata(sample_rate, block)
 
-            for new_state in self.interpret_metadata(sample_rate, block):
+            for new_state in new_states:
                 if start_sample is not None and new_state.first_sample < start_sample:
-                    raise Exception("metadata underrun: metadata arrived after the samples that it would apply to")
+                    if not self.metadata_source.hold_on_underrun:
+                        raise Exception("metadata underrun: metadata arrived after the samples that it would apply to")
+
+                    if not self._holding:
+                        self.underruns += 1
+                    if new_state.last_sample <= start_sample:
+                        continue
+
+                self._holding = False
                 self.processing_queue.append(new_state)
 
     def process(self, sample_rate, start_sample, input_samples, output_samples):
@@ -179,24 +393,188 @@ class BlockProcessingChannel(object):
             shape accepted by the processing blocks used, but the samples must
             be along the first axis.
         """
+        for processing_block in self.active_blocks(sample_rate, start_sample, len(input_samples)):
+            processing_block.process(start_sample, input_samples, output_samples)
+
+    def skip(self, sample_rate, start_sample, num_samples):
+        """Advance through some samples without processing them.
+
+        The metadata for these samples is still interpreted, so that any
+        processing which continues past the skipped samples (e.g. an
+        interpolation) is the same as if they had been processed.
+
+        Args:
+            sample_rate (int): Sample rate.
+            start_sample (int): Sample number of first sample.
+            num_samples (int): Number of samples.
+        """
+        for processing_block in self.active_blocks(sample_rate, start_sample, num_samples):
+            pass
 
-        end_sample = start_sample + len(input_samples)
+    def active_blocks(self, sample_rate, start_sample, num_samples):
+        """Get the processing blocks which apply to some samples.
+
+        Note:
+            Blocks which end within the samples are removed from the queue, so
+            this must be called once for each block of samples, in order.
+
+        Args:
+            sample_rate (int): Sample rate.
+            start_sample (int): Sample number of first sample.
+            num_samples (int): Number of samples.
+
+        Yields:
+            ProcessingBlock: blocks to apply to the samples, in order.
+        """
+        end_sample = start_sample + num_samples
         self._refil_processing_queue(sample_rate, start_sample)
 
         while len(self.processing_queue):
-            self.processing_queue[0].process(start_sample, input_samples, output_samples)
+            yield self.processing_queue[0]
 
             if self.processing_queue[0].last_sample < end_sample:
                 # processing ends before end of sample block; go to next processing block and apply that too
-                self.processing_queue.popleft()
+                self._last_block = self.processing_queue.popleft()
                 self._refil_processing_queue(sample_rate)
             elif self.processing_queue[0].last_sample == end_sample:
                 # processing ends at end of sample block; we've done with this processing block and this sample block
-                self.processing_queue.popleft()
-                break
+                self._last_block = self.processing_queue.popleft()
+                return
             else:
                 # processing ends after end of sample block; we're done with this sample block
-                break
+                return
+
+        # no metadata is available for the rest of the sample block; this is
+        # only an underrun if more metadata may arrive
+        if (self.metadata_source.hold_on_underrun and self._last_block is not None and
+                not self.metadata_source.is_finished()):
+            if not self._holding:
+                self.underruns += 1
+                self._holding = True
+
+            held_block = self._last_block.held(max(start_sample, self._last_block.last_sample), end_sample)
+            if held_block is not None:
+                yield held_block
+
+
+def mix_block_processing_channels(sample_rate, start_sample, channels, output_samples):
+    """Apply the processing from many BlockProcessingChannel objects, summing
+    into output_samples.
+
+    This is equivalent to calling BlockProcessingChannel.process for each
+    channel, but rather than each processing block being applied separately,
+    they are expressed as weighted columns of input samples and corresponding
+    gain matrices (see FixedGains.matrix_terms), which are applied with a
+    single matrix product. This is much faster with many channels, at the cost
+    of a different floating point summation order.
+
+    If at most SPARSE_MAX_DENSITY of the overall gains are non-zero (e.g. when
+    point sources are panned between a few loudspeakers in a large layout),
+    the gains are stored in a sparse matrix so that only the non-zero gains
+    are applied; otherwise a dense matrix is used.
+
+    Args:
+        sample_rate (int): Sample rate.
+        start_sample (int): Sample number of first sample.
+        channels (iterable of (BlockProcessingChannel, ndarray) tuples): Each
+            BlockProcessingChannel, and the input samples to process with it.
+        output_samples (ndarray of (n, l) float): Output samples.
+    """
+    num_samples, num_outputs = output_samples.shape
+
+    terms = []
+    num_columns = 0
+    num_gains = 0
+    for block_processing, input_samples in channels:
+        for processing_block in block_processing.active_blocks(sample_rate, start_sample, num_samples):
+            for term in processing_block.matrix_terms(start_sample, input_samples, num_outputs):
+                terms.append(term)
+                num_columns += term[1].shape[1]
+                num_gains += term[2].size
+
+    if not num_columns:
+        return
+
+    # columns are stored in fortran order so that each column is contiguous
+    columns = np.zeros((num_samples, num_columns), dtype=output_samples.dtype, order="F")
+
+    column = 0
+    for ovl_samples, term_columns, term_gains, term_channels in terms:
+        next_column = column + term_columns.shape[1]
+        columns[ovl_samples, column:next_column] = term_columns
+        column = next_column
+
+    # gains are cast to the type of the output samples here
+    if num_gains <= SPARSE_MAX_DENSITY * num_columns * num_outputs:
+        gains = _sparse_gain_matrix(terms, num_columns, num_outputs, output_samples.dtype)
+        output_samples += gains.T.dot(columns.T).T
+    else:
+        gains = _dense_gain_matrix(terms, num_columns, num_outputs, output_samples.dtype)
+        output_samples += np.dot(columns, gains)
+
+
+def _dense_gain_matrix(terms, num_columns, num_outputs, dtype):
+    """Build the gain matrix for mix_block_processing_channels as an ndarray."""
+    gains = np.zeros((num_columns, num_outputs), dtype=dtype)
+
+    column = 0
+    for ovl_samples, term_columns, term_gains, term_channels in terms:
+        next_column = column + term_columns.shape[1]
+        if term_channels is None:
+            gains[column:next_column] = term_gains
+        else:
+            gains[column:next_column, term_channels] = term_gains
+        column = next_column
+
+    return gains
+
+
+def _sparse_gain_matrix(terms, num_columns, num_outputs, dtype):
+    """Build the gain matrix for mix_block_processing_channels as a CSR
+    matrix, with one row per column."""
+    all_channels = np.arange(num_outputs)
+
+    data = []
+    indices = []
+    row_lengths = []
+    for ovl_samples, term_columns, term_gains, term_channels in terms:
+        if term_channels is None:
+            term_channels = all_channels
+        n_rows = term_gains.shape[0]
+
+        data.append(term_gains.ravel())
+        indices.append(np.tile(term_channels, n_rows))
+        row_lengths.append(np.full(n_rows, len(term_channels), dtype=int))
+
+    indptr = np.concatenate(([0], np.cumsum(np.concatenate(row_lengths))))
+
+    return scipy.sparse.csr_matrix((np.concatenate(data).astype(dtype, copy=False),
+                                    np.concatenate(indices),
+                                    indptr),
+                                   shape=(num_columns, num_outputs))
+
+
+class ScratchBuffer(object):
+    """Reusable array for temporary multi-channel sample blocks.
+
+    The array is only reallocated when a block with more samples than any
+    previous block is requested, so that processing blocks of the same size
+    does not allocate.
+
+    Args:
+        nchannels (int): Number of channels.
+        dtype (numpy dtype): Type of samples.
+    """
+
+    def __init__(self, nchannels, dtype=np.float64):
+        self._buf = np.zeros((0, nchannels), dtype=dtype)
+
+    def get(self, num_samples):
+        """Get a view of the buffer with num_samples samples; the contents are
+        undefined, and are only valid until the next call."""
+        if num_samples > len(self._buf):
+            self._buf = np.empty((num_samples, self._buf.shape[1]), dtype=self._buf.dtype)
+        return self._buf[:num_samples]
 
 
 class InterpretTimingMetadata(object):
@@ -205,6 +583,8 @@ class InterpretTimingMetadata(object):
     """
 
     def __init__(self):
+        # end of the last block as (ticks, ticks per second), with None ticks
+        # if it has no end
         self.__last_block_end = None
 
     def block_start_end(self, block, block_time_in_block_format=True):
@@ -225,29 +605,71 @@ class InterpretTimingMetadata(object):
                 block end time (Fraction or inf): Time that the block ends at,
                     or inf if it has no end.
         """
-        # determine object start and end time
-        if block.extra_data.object_start is not None:
-            object_start = block.extra_data.object_start
-        else:
-            object_start = Fraction(0)
+        ticks_per_second, block_start, block_end, _extra = self.block_start_end_ticks(
+            block, block_time_in_block_format)
 
-        if block.extra_data.object_duration is not None:
-            object_end = object_start + block.extra_data.object_duration
-        else:
-            object_end = np.inf
+        return (Fraction(block_start, ticks_per_second),
+                Fraction(block_end, ticks_per_second) if block_end is not None else np.inf)
+
+    def block_start_end_ticks(self, block, block_time_in_block_format=True, extra_times=(), time_base=None):
+        """Get the start and end time of a metadata block as integer ticks.
+
+        This is equivalent to block_start_end, but avoids Fraction arithmetic;
+        use ticks_to_samples to convert the results to sample numbers.
 
+        Args:
+            block (TypeMetadata): Metadata block to determine timing for.
+            block_time_in_block_format (bool): Where do the rtime and duration
+                attributes live for this type?
+            extra_times (list of Fraction or None): Other times to convert to
+                ticks at the same rate.
+            time_base (int or None): If not None, rtime, duration and
+                extra_times are already integer ticks of 1/time_base seconds
+                (or None), e.g. from ObjectsBlockFormatColumns.timing.
+
+        Returns:
+            tuple:
+                ticks per second (int): Number of ticks per second for the
+                    returned times.
+                block start time (int): Time that the block starts at.
+                block end time (int or None): Time that the block ends at,
+                    or None if it has no end.
+                extra times (list of int or None): extra_times in ticks.
+        """
         # pull out the block timing information
         if block_time_in_block_format:
             rtime, duration = block.block_format.rtime, block.block_format.duration
         else:
             rtime, duration = block.rtime, block.duration
 
+        if time_base is None:
+            ticks_per_second, ticks = common_ticks(block.extra_data.object_start, block.extra_data.object_duration,
+                                                   rtime, duration, *extra_times)
+        else:
+            # only the object times need converting; the others are scaled if
+            # these need a finer time base
+            ticks_per_second, object_ticks = common_ticks(Fraction(1, time_base), block.extra_data.object_start,
+                                                          block.extra_data.object_duration)
+            scale = ticks_per_second // time_base
+            ticks = object_ticks[1:] + [None if time is None else time * scale
+                                        for time in [rtime, duration] + list(extra_times)]
+        object_start, object_duration, rtime, duration = ticks[:4]
+
+        # determine object start and end time
+        if object_start is None:
+            object_start = 0
+
+        if object_duration is not None:
+            object_end = object_start + object_duration
+        else:
+            object_end = None
+
         # determine block start and end time
         if rtime is not None and duration is not None:
             block_start = object_start + rtime
             block_end = block_start + duration
 
-            if block_end > object_end:
+            if object_end is not None and block_end > object_end:
                 raise Exception("block {0.id} ends after object".format(block.block_format))
         elif rtime is None and duration is None:
             block_start, block_end = object_start, object_end
@@ -257,11 +679,13 @@ class InterpretTimingMetadata(object):
         # check for overlapping blocks; this will also raise if there is more
         # than one block without timing information or a mixture of blocks with
         # and without
-        if self.__last_block_end is not None and block_start < self.__last_block_end:
-            raise Exception("overlapping blocks {0.id} detected".format(block.block_format))
-        self.__last_block_end = block_end
+        if self.__last_block_end is not None:
+            last_block_end, last_ticks_per_second = self.__last_block_end
+            if last_block_end is None or block_start * last_ticks_per_second < last_block_end * ticks_per_second:
+                raise Exception("overlapping blocks {0.id} detected".format(block.block_format))
+        self.__last_block_end = (block_end, ticks_per_second)
 
-        return block_start, block_end
+        return ticks_per_second, block_start, block_end, ticks[4:]
 
 
 def is_lfe(frequency):
@@ -1,7 +1,8 @@
 import numpy as np
 from attr import attrs, attrib
 from .design import HOADecoderDesign
-from ..renderer_common import BlockProcessingChannel, InterpretTimingMetadata, ProcessingBlock
+from ..renderer_common import (BlockProcessingChannel, InterpretTimingMetadata, ProcessingBlock,
+                               mix_block_processing_channels, ticks_to_samples)
 from ..track_processor import MultiTrackProcessor
 from ...options import OptionsHandler, SubOptions
 
@@ -23,6 +24,18 @@ class FixedMatrix(ProcessingBlock):
 
         output_samples[ovl_samples, self.output_channels] += np.dot(input_samples[ovl_samples], self.matrix.T)
 
+    def matrix_terms(self, start_sample, input_samples, num_outputs):
+        """Express this processing as matrix products; see FixedGains.matrix_terms."""
+        ovl_state, ovl_samples = self.overlap(start_sample, len(input_samples))
+
+        gains = np.zeros((self.matrix.shape[1], num_outputs))
+        gains[:, self.output_channels] = self.matrix.T
+
+        return [(ovl_samples, input_samples[ovl_samples], gains, None)]
+
+    def held(self, start_sample, end_sample):
+        return FixedMatrix(start_sample, end_sample, self.matrix, self.output_channels)
+
 
 class InterpretHOAMetadata(InterpretTimingMetadata):
     """Interpret a sequence of HOATypeMetadata, producing a sequence of ProcessingBlock.
@@ -47,10 +60,10 @@ class InterpretHOAMetadata(InterpretTimingMetadata):
         Yields:
             One ProcessingBlock object that apply gains for a single input channel.
         """
-        start_time, end_time = self.block_start_end(block, block_time_in_block_format=False)
+        ticks_per_second, start_time, end_time, _extra = self.block_start_end_ticks(block, block_time_in_block_format=False)
 
-        start_sample = sample_rate * start_time
-        end_sample = sample_rate * end_time
+        start_sample = ticks_to_samples(start_time, ticks_per_second, sample_rate)
+        end_sample = ticks_to_samples(end_time, ticks_per_second, sample_rate)
 
         decoder = self.design_decoder(block)
 
@@ -65,9 +78,10 @@ class HOARenderer(object):
     )
 
     @options.with_defaults
-    def __init__(self, layout, design_opts):
+    def __init__(self, layout, design_opts, dtype=np.float64):
         self._decoder_design = HOADecoderDesign(layout.without_lfe, **design_opts)
         self._output_channels = ~layout.is_lfe
+        self._dtype = dtype
 
         self.block_processing_channels = []
 
@@ -89,7 +103,7 @@ class HOARenderer(object):
                                                                     self._output_channels)))
                                           for item in rendering_items]
 
-    def render(self, sample_rate, start_sample, input_samples):
+    def render(self, sample_rate, start_sample, input_samples, out=None):
         """Process n input samples to produce n output samples.
 
         Args:
@@ -98,15 +112,23 @@ class HOARenderer(object):
             input_samples (ndarray of (k, k) float): Multi-channel input sample
                 block; there must be at least as many channels as referenced in the
                 rendering items.
+            out (ndarray of (n, l) float or None): Array to write the output
+                samples to; if None, a new array is allocated.
 
         Returns:
             (ndarray of (n, l) float): l channels of output samples
                 corresponding to the l loudspeakers in layout.
         """
-        output_samples = np.zeros((len(input_samples), len(self._output_channels)))
-
-        for track_spec_processor, block_processing in self.block_processing_channels:
-            track_samples = track_spec_processor.process(sample_rate, input_samples)
-            block_processing.process(sample_rate, start_sample, track_samples, output_samples)
+        if out is None:
+            output_samples = np.zeros((len(input_samples), len(self._output_channels)), dtype=self._dtype)
+        else:
+            output_samples = out
+            output_samples.fill(0.0)
+
+        mix_block_processing_channels(
+            sample_rate, start_sample,
+            [(block_processing, track_spec_processor.process(sample_rate, input_samples))
+             for track_spec_processor, block_processing in self.block_processing_channels],
+            output_samples)
 
         return output_samples
@@ -8,14 +8,14 @@ from ...fileio.adm.xml import default_screen
 from ...fileio.adm.exceptions import AdmError, AdmFormatRefError
 from ...fileio.adm.elements import (AudioProgramme, AudioContent, AudioObject,
                                     AudioPackFormat, AudioChannelFormat,
-                                    Frequency, TypeDefinition,
+                                    Frequency, TypeDefinition, ObjectsBlockFormatColumns,
                                     )
 from .pack_allocation import allocate_packs, AllocationPack, AllocationChannel, AllocationTrack
 from .utils import in_by_id, object_paths_from, pack_format_paths_from
 from .validate import (validate_structure, validate_selected_audioTrackUID,
                        possible_reference_errors,
                        )
-from ..metadata_input import (ExtraData, ADMPath, MetadataSourceIter,
+from ..metadata_input import (ExtraData, ADMPath, MetadataSourceIter, MetadataSourceColumns,
                               ObjectTypeMetadata, ObjectRenderingItem,
                               DirectSpeakersTypeMetadata, DirectSpeakersRenderingItem,
                               HOATypeMetadata, HOARenderingItem, ImportanceData,
@@ -631,9 +631,16 @@ def _get_RenderingItems_Objects(state):
         importance = _get_importance(state)
         adm_path = _get_adm_path(state)
 
-        metadata_source = MetadataSourceIter([ObjectTypeMetadata(block_format=block_format,
-                                                                 extra_data=extra_data)
-                                              for block_format in state.audioChannelFormat.audioBlockFormats])
+        block_formats = state.audioChannelFormat.audioBlockFormats
+        if isinstance(block_formats, ObjectsBlockFormatColumns):
+            # allows the renderer to calculate gains straight from the columns
+            metadata_source = MetadataSourceColumns(block_formats, extra_data)
+        else:
+            # a generator, so that blocks stored as LazyBlockFormats are only
+            # parsed as they are rendered
+            metadata_source = MetadataSourceIter(ObjectTypeMetadata(block_format=block_format,
+                                                                    extra_data=extra_data)
+                                                 for block_format in block_formats)
 
         yield ObjectRenderingItem(track_spec=state.track_spec,
                                   metadata_source=metadata_source,
@@ -649,10 +656,12 @@ def _get_RenderingItems_DirectSpeakers(state):
         importance = _get_importance(state)
         adm_path = _get_adm_path(state)
 
-        metadata_source = MetadataSourceIter([DirectSpeakersTypeMetadata(block_format=block_format,
-                                                                         audioPackFormats=state.audioPackFormat_path,
-                                                                         extra_data=extra_data)
-                                              for block_format in state.audioChannelFormat.audioBlockFormats])
+        # a generator, so that blocks stored as LazyBlockFormats are only
+        # parsed as they are rendered
+        metadata_source = MetadataSourceIter(DirectSpeakersTypeMetadata(block_format=block_format,
+                                                                        audioPackFormats=state.audioPackFormat_path,
+                                                                        extra_data=extra_data)
+                                             for block_format in state.audioChannelFormat.audioBlockFormats)
 
         yield DirectSpeakersRenderingItem(track_spec=state.track_spec,
                                           metadata_source=metadata_source,
@@ -276,6 +276,24 @@ def test_Objects_validation_cartesian_mismatch():
             abf=abf)
 
 
+def test_Objects_validation_cartesian_mismatch_lazy():
+    from ....fileio.adm.elements import LazyBlockFormats
+    abf = AudioBlockFormatObjects(id="AB_00031001_00000001", rtime=Fraction(0), duration=Fraction(1),
+                                  cartesian=True, position=ObjectPolarPosition(0.0, 0.0, 1.0))
+    block_formats = LazyBlockFormats(decode=lambda encoded, line: abf)
+    block_formats.append(b"", rtime=abf.rtime, duration=abf.duration)
+
+    builder = ADMBuilder()
+    builder.create_programme(audioProgrammeName="programme")
+    builder.create_content(audioContentName="content")
+    builder.create_item_objects(0, "foo", block_formats=block_formats)
+
+    # lazily parsed blocks are checked when they are parsed
+    [item] = select_rendering_items(builder.adm)
+    with pytest.raises(AdmError, match="mismatch between cartesian element and coordinate type used in"):
+        item.metadata_source.get_next_block()
+
+
 def test_HOA_validation_one_block_format():
     builder = ADMBuilder()
     acf = builder.create_channel(type=TypeDefinition.HOA, audioChannelFormatName="foo", audioBlockFormats=[
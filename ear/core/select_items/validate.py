@@ -1,4 +1,5 @@
-from ...fileio.adm.elements import AudioPackFormat, AudioChannelFormat, TypeDefinition, ObjectCartesianPosition
+from ...fileio.adm.elements import (AudioPackFormat, AudioChannelFormat, TypeDefinition, ObjectCartesianPosition,
+                                    LazyBlockFormats)
 from ...fileio.adm.exceptions import AdmError
 from . import matrix
 from .utils import in_by_id, pack_format_channels, pack_format_packs, pack_format_paths_from
@@ -168,12 +169,25 @@ def _validate_objects_channels(adm):
                     acf=audioChannelFormat,
                 ))
 
-            for audioBlockFormat in audioChannelFormat.audioBlockFormats:
-                if audioBlockFormat.cartesian != isinstance(audioBlockFormat.position,
-                                                            ObjectCartesianPosition):
-                    raise AdmError("mismatch between cartesian element and coordinate type used in {abf.id}".format(
-                        abf=audioBlockFormat,
-                    ))
+            block_formats = audioChannelFormat.audioBlockFormats
+            if isinstance(block_formats, LazyBlockFormats):
+                # check each block when it is parsed, rather than parsing
+                # them all now
+                if _validate_objects_block_format not in block_formats.validators:
+                    block_formats.validators.append(_validate_objects_block_format)
+            else:
+                for audioBlockFormat in block_formats:
+                    _validate_objects_block_format(audioBlockFormat)
+
+
+def _validate_objects_block_format(audioBlockFormat):
+    """Check that an Objects audioBlockFormat has matching 'cartesian' and
+    position attributes."""
+    if audioBlockFormat.cartesian != isinstance(audioBlockFormat.position,
+                                                ObjectCartesianPosition):
+        raise AdmError("mismatch between cartesian element and coordinate type used in {abf.id}".format(
+            abf=audioBlockFormat,
+        ))
 
 
 def _pack_format_paths_channels(audioPackFormat):
@@ -10,13 +10,15 @@ from ..block_aligner import BlockAligner
     [0, 1, 10],
     [0, 1, 13],
 ])
-def test_BlockAligner(delays):
+@pytest.mark.parametrize("use_out", [False, True])
+@pytest.mark.parametrize("capacity", [0, 7, 100])
+def test_BlockAligner(delays, use_out, capacity):
     """Test BlockAligner with one input stream with the given delay for each block in delays"""
     nch = 5
     bs = 10
     ns = 105
 
-    ba = BlockAligner(nch)
+    ba = BlockAligner(nch, capacity=capacity)
 
     all_samples = np.random.rand(len(delays), ns, nch)
     max_delay = max(delays)
@@ -44,7 +46,13 @@ def test_BlockAligner(delays):
         for i, block in enumerate(blocks):
             ba.add(starts[i], block)
             starts[i] += len(block)
-        out_blocks.append(ba.get())
+        if use_out:
+            out_blocks.append(ba.get(out=np.empty((bs + max_delay, nch))).copy())
+        else:
+            out_blocks.append(ba.get())
 
     out_samples = np.concatenate(out_blocks)
     npt.assert_allclose(out_samples, np.sum(all_samples, axis=0))
+
+    # the buffer only needs to hold one block plus the difference in delays
+    assert len(ba.buf) <= max(capacity, 2 * (bs + max_delay))
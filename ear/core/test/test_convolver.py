@@ -1,17 +1,26 @@
 import numpy as np
 import numpy.testing as npt
 import pytest
-from ..convolver import OverlapSaveConvolver, VariableBlockSizeAdapter
+from ..convolver import (OverlapSaveConvolver, VariableBlockSizeAdapter, NonUniformPartitionedConvolver,
+                         NumpyFFTBackend, ScipyFFTBackend, scipy_fft)
 
 
+def fft_backends():
+    yield None
+    yield NumpyFFTBackend()
+    if scipy_fft is not None:
+        yield ScipyFFTBackend(workers=2)
+
+
+@pytest.mark.parametrize("fft_backend", list(fft_backends()))
+@pytest.mark.parametrize("filter_len", [300, 1024, 1500])
 @pytest.mark.parametrize("nchannels", [1, 3])
-def test_convolve(nchannels):
+def test_convolve(nchannels, filter_len, fft_backend):
     bs = 512
-    nchannels = 3
-    f = np.random.rand(1500, nchannels)
+    f = np.random.rand(filter_len, nchannels)
     in_blocks = [np.random.rand(bs, nchannels) for i in range(100)]
 
-    c = OverlapSaveConvolver(bs, nchannels, f)
+    c = OverlapSaveConvolver(bs, nchannels, f, fft_backend=fft_backend)
     out_blocks = [c.filter_block(block) for block in in_blocks]
 
     in_all = np.concatenate(in_blocks)
@@ -24,15 +33,33 @@ def test_convolve(nchannels):
     npt.assert_allclose(out_all_expected, out_all)
 
 
-def test_variable_block_size():
+def test_convolve_out():
+    bs = 512
+    nchannels = 3
+    f = np.random.rand(1500, nchannels)
+    in_blocks = [np.random.rand(bs, nchannels) for i in range(10)]
+
+    c = OverlapSaveConvolver(bs, nchannels, f)
+    c_out = OverlapSaveConvolver(bs, nchannels, f)
+
+    for block in in_blocks:
+        expected = c.filter_block(block)
+        block_copy = block.copy()
+        assert c_out.filter_block(block_copy, out=block_copy) is block_copy
+        npt.assert_array_equal(block_copy, expected)
+
+
+@pytest.mark.parametrize("in_place", [False, True])
+def test_variable_block_size(in_place):
     block_size = 100
     nchannels = 3
 
-    def process(samples):
+    def process(samples, out=None):
         assert samples.shape == (block_size, nchannels)
-        return samples.copy()
+        assert out is None or (in_place and out is samples)
+        return samples.copy() if out is None else out
 
-    adapter = VariableBlockSizeAdapter(block_size, nchannels, process)
+    adapter = VariableBlockSizeAdapter(block_size, nchannels, process, in_place=in_place)
 
     assert adapter.delay(5) == block_size + 5
 
@@ -52,3 +79,82 @@ def test_variable_block_size():
     expected_output = np.concatenate((np.zeros((block_size, nchannels)), all_input[:len(all_input) - block_size]))
 
     npt.assert_allclose(expected_output, all_output)
+
+
+@pytest.mark.parametrize("head_block_size,max_block_size", [(16, 512), (24, 100), (64, 64)])
+@pytest.mark.parametrize("filter_len", [10, 1500])
+def test_non_uniform_partitioned(head_block_size, max_block_size, filter_len):
+    nchannels = 3
+    f = np.random.rand(filter_len, nchannels)
+
+    c = NonUniformPartitionedConvolver(head_block_size, max_block_size, nchannels, f)
+    assert c.delay(5) == head_block_size + 5
+
+    input_blocks = [np.random.rand(input_size, nchannels) for input_size in list(range(100)) + [1000, 7]]
+    output_blocks = [c.process(input_block) for input_block in input_blocks]
+
+    all_input = np.concatenate(input_blocks)
+    all_output = np.concatenate(output_blocks)
+
+    expected_output = np.stack([np.convolve(in_chan, f_chan, mode="full")[:len(all_input) - head_block_size]
+                                for in_chan, f_chan in zip(all_input.T, f.T)],
+                               axis=1)
+    expected_output = np.concatenate((np.zeros((head_block_size, nchannels)), expected_output))
+
+    npt.assert_allclose(expected_output, all_output, atol=1e-9)
+
+
+def test_skip_silence():
+    block_size = 100
+    nchannels = 2
+    f = np.random.rand(250, nchannels)
+
+    def make_adapter():
+        c = OverlapSaveConvolver(block_size, nchannels, f)
+        return VariableBlockSizeAdapter(block_size, nchannels, c.filter_block, in_place=True)
+
+    adapter, adapter_skip = make_adapter(), make_adapter()
+
+    for input_size in [37, 500, 1234, 3, 500]:
+        input_block = np.random.rand(input_size, nchannels)
+        npt.assert_array_equal(adapter.process(input_block), adapter_skip.process(input_block))
+
+        # enough silence to clear the state, after which more silence can be
+        # skipped
+        silence = np.zeros((1000, nchannels))
+        npt.assert_array_equal(adapter.process(silence), adapter_skip.process(silence))
+
+        silence = np.zeros((input_size, nchannels))
+        npt.assert_array_equal(adapter.process(silence), 0.0)
+        adapter_skip.skip_silence(len(silence))
+
+
+def make_uniform_convolver(f):
+    convolver = OverlapSaveConvolver(100, f.shape[1], f)
+    adapter = VariableBlockSizeAdapter(100, f.shape[1], convolver.filter_block, in_place=True)
+    return adapter, adapter.history_length(convolver.history_length)
+
+
+def make_non_uniform_convolver(f):
+    convolver = NonUniformPartitionedConvolver(16, 128, f.shape[1], f)
+    return convolver, convolver.history_length
+
+
+@pytest.mark.parametrize("make_convolver", [make_uniform_convolver, make_non_uniform_convolver])
+@pytest.mark.parametrize("n_input", [1, 250, 299, 300])
+def test_history_length(make_convolver, n_input):
+    nchannels = 2
+    f = np.random.rand(250, nchannels)
+    convolver, history_length = make_convolver(f)
+    delay = convolver.delay(0)
+
+    input_samples = np.zeros((n_input + history_length + 500, nchannels))
+    input_samples[:n_input] = np.random.rand(n_input, nchannels)
+    output = convolver.process(input_samples)
+
+    # the last tap of the filter is applied to the last input sample within
+    # history_length samples, after which the output is exactly zero
+    last = n_input - 1
+    assert delay + len(f) - 1 < history_length
+    assert np.all(output[last + delay + len(f) - 1] != 0.0)
+    npt.assert_array_equal(output[last + history_length:], 0.0)
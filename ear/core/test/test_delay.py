@@ -4,8 +4,9 @@ import pytest
 from ..delay import Delay
 
 
+@pytest.mark.parametrize("use_out", [False, True, "in_place"])
 @pytest.mark.parametrize("delay", [0, 256, 511, 512, 513, 1024])
-def test_delay(delay):
+def test_delay(delay, use_out):
     nchannels = 4
     block_size = 512
     nsamples = block_size * 10
@@ -16,7 +17,14 @@ def test_delay(delay):
 
     out_blocks = []
     for start in range(0, nsamples, block_size):
-        out = d.process(input_samples[start:start+block_size])
+        if use_out == "in_place":
+            out = input_samples[start:start+block_size].copy()
+            assert d.process(out, out=out) is out
+        elif use_out:
+            out = np.empty((block_size, nchannels))
+            assert d.process(input_samples[start:start+block_size], out=out) is out
+        else:
+            out = d.process(input_samples[start:start+block_size])
         out_blocks.append(out)
 
     out = np.concatenate(out_blocks)
@@ -24,3 +32,32 @@ def test_delay(delay):
     expected_out = np.concatenate((np.zeros((delay, nchannels)), input_samples[:len(input_samples)-delay]))
 
     npt.assert_allclose(expected_out, out)
+
+
+@pytest.mark.parametrize("in_place", [False, True])
+def test_delay_per_channel(in_place):
+    delays = [0, 3, 100, 3, 1000]
+    nchannels = len(delays)
+    block_sizes = [10, 512, 1, 0, 2000, 37] * 3
+    nsamples = sum(block_sizes)
+
+    input_samples = np.random.random((nsamples, nchannels))
+
+    d = Delay(nchannels, delays)
+
+    out_blocks = []
+    start = 0
+    for block_size in block_sizes:
+        block = input_samples[start:start+block_size]
+        if in_place:
+            block = block.copy()
+            out_blocks.append(d.process(block, out=block))
+        else:
+            out_blocks.append(d.process(block))
+        start += block_size
+
+    out = np.concatenate(out_blocks)
+
+    for channel, delay in enumerate(delays):
+        expected_out = np.concatenate((np.zeros(delay), input_samples[:nsamples-delay, channel]))
+        npt.assert_allclose(expected_out, out[:, channel])
@@ -30,3 +30,12 @@ def test_peak_monitor():
     with pytest.warns(None) as record:
         mon.warn_overloaded()
     assert len(record) == 1 and str(record[0].message) == "overload in channel 1; peak level was 20.0dBFS"
+
+
+def test_peak_monitor_process_peak():
+    mon = PeakMonitor(2)
+    mon.process_peak(np.array([0.5, 0.9]))
+    assert not mon.has_overloaded()
+    mon.process_peak(np.array([1.5, 0.1]))
+    assert mon.has_overloaded()
+    assert np.all(mon.peak_abs_linear == [1.5, 0.9])
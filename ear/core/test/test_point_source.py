@@ -2,6 +2,7 @@ import numpy as np
 import numpy.testing as npt
 from .. import bs2051
 from ..point_source import Triplet, VirtualNgon, StereoPanDownmix, PointSourcePanner, configure, AllocentricPanner
+from ..point_source import PointSourcePannerTable, _quadratic_roots_many
 from ..geom import cart, azimuth, PolarPosition
 from ..layout import Speaker
 import pytest
@@ -78,6 +79,10 @@ def test_PointSourcePanner():
 
     assert psp.handle(np.array([0, -1, 0])) is None
 
+    pvs = psp.handle_many(np.concatenate((positions, [[0, -1, 0]])))
+    npt.assert_allclose(pvs[:-1], np.eye(len(positions)))
+    assert np.all(np.isnan(pvs[-1]))
+
 
 def test_all_layouts(layout):
     config = configure(layout)
@@ -147,6 +152,49 @@ def test_all_layouts(layout):
     npt.assert_allclose(vv[vv_at_pos], positions[vv_at_pos], atol=1e-10)
 
 
+def test_all_layouts_many(layout):
+    config = configure(layout)
+
+    azimuths, elevations = np.meshgrid(np.linspace(-180, 180, 61),
+                                       np.linspace(-90, 90, 31))
+    positions = cart(azimuths, elevations, 1).reshape(-1, 3)
+
+    pv = np.array([config.handle(position) for position in positions])
+
+    npt.assert_allclose(config.handle_many(positions), pv, atol=1e-10)
+
+
+def test_quadratic_roots_many():
+    coeffs = np.random.normal(size=(100, 3))
+    coeffs[::7, 0] = 0.0
+    coeffs[::5, 2] = 0.0
+    coeffs[::11, 1] = 0.0
+    coeffs[3] = 0.0
+
+    for c, roots in zip(coeffs, _quadratic_roots_many(coeffs)):
+        roots = roots[~np.isnan(roots)]
+        npt.assert_array_equal(roots, np.roots(c))
+
+
+def test_all_layouts_table(layout):
+    config = configure(layout, use_table=True, table_resolution=2.0)
+    assert isinstance(config, PointSourcePannerTable)
+
+    # shared between configure calls with the same layout and resolution
+    assert configure(layout, use_table=True, table_resolution=2.0) is config
+
+    # exact at loudspeaker positions
+    npt.assert_allclose(config.handle_many(layout.positions),
+                        [config.psp.handle(position) for position in layout.positions],
+                        atol=1e-10)
+
+    # close to the exact panner elsewhere
+    positions = np.random.normal(size=(1000, 3))
+    pvs = config.handle_many(positions)
+    npt.assert_allclose(pvs, config.psp.handle_many(positions), atol=0.1)
+    npt.assert_allclose(config.handle(positions[0]), pvs[0])
+
+
 def test_screen_pos_check():
     invalid_screen_speakers = [
         Speaker(channel=0,
@@ -0,0 +1,184 @@
+from fractions import Fraction
+import numpy as np
+import numpy.testing as npt
+import pytest
+from .. import bs2051
+from ..renderer import Renderer, StreamingRenderer, _split_items
+from ..metadata_input import (ObjectTypeMetadata, ObjectRenderingItem, DirectSpeakersTypeMetadata,
+                              DirectSpeakersRenderingItem, MetadataSourceIter, MetadataSourceQueue,
+                              DirectTrackSpec)
+from ...fileio.adm.elements import (AudioBlockFormatObjects, AudioBlockFormatDirectSpeakers,
+                                    DirectSpeakerPolarPosition, BoundCoordinate)
+
+
+def test_split_items():
+    assert _split_items(list(range(5)), 3) == [[0, 1], [2, 3], [4]]
+    assert _split_items(list(range(2)), 3) == [[0], [1], []]
+
+
+def make_rendering_items(n_objects, block_dur, n_blocks):
+    items = []
+    for i in range(n_objects):
+        block_formats = [AudioBlockFormatObjects(rtime=j * block_dur, duration=block_dur,
+                                                 position=dict(azimuth=(i * 37.0 + j * 5.0) % 360 - 180,
+                                                               elevation=0.0),
+                                                 diffuse=0.1 * (i % 3))
+                         for j in range(n_blocks)]
+        items.append(ObjectRenderingItem(track_spec=DirectTrackSpec(i),
+                                         metadata_source=MetadataSourceIter([ObjectTypeMetadata(block_format=bf)
+                                                                             for bf in block_formats])))
+
+    for i, azimuth in enumerate([30.0, -30.0]):
+        block_format = AudioBlockFormatDirectSpeakers(
+            position=DirectSpeakerPolarPosition(
+                bounded_azimuth=BoundCoordinate(azimuth),
+                bounded_elevation=BoundCoordinate(0.0),
+            ))
+        items.append(DirectSpeakersRenderingItem(
+            track_spec=DirectTrackSpec(n_objects + i),
+            metadata_source=MetadataSourceIter([DirectSpeakersTypeMetadata(block_format=block_format)])))
+
+    return items
+
+
+def test_partitions():
+    layout = bs2051.get_layout("4+5+0")
+    sr = 48000
+    n_objects, block_dur, n_blocks = 7, Fraction(1, 50), 10
+    input_samples = np.random.normal(size=(int(sr * block_dur * n_blocks), n_objects + 2))
+
+    def render(**options):
+        renderer = Renderer(layout, **options)
+        renderer.set_rendering_items(make_rendering_items(n_objects, block_dur, n_blocks))
+        try:
+            blocks = [renderer.render(sr, input_samples[start:start + 1000])
+                      for start in range(0, len(input_samples), 1000)]
+            blocks.append(renderer.get_tail(sr, input_samples.shape[1]))
+        finally:
+            renderer.close()
+        return np.concatenate(blocks)
+
+    single = render()
+    assert single.shape == (len(input_samples), len(layout.channels))
+
+    partitioned = render(num_partitions=3)
+    npt.assert_allclose(partitioned, single, atol=1e-10)
+
+    # the number of threads does not affect the output
+    npt.assert_array_equal(render(num_partitions=3, num_threads=3), partitioned)
+    npt.assert_array_equal(render(num_partitions=3, num_threads=2), partitioned)
+
+    with pytest.raises(ValueError, match="num_partitions"):
+        Renderer(layout, num_partitions=0)
+
+
+def test_partitions_share_decorrelators():
+    layout = bs2051.get_layout("4+5+0")
+    renderer = Renderer(layout, num_partitions=3)
+    renderer.set_rendering_items(make_rendering_items(7, Fraction(1, 50), 10))
+
+    # each partition only applies gains, with its own mixer, and the objects
+    # are decorrelated and delayed once
+    mixers = [partition.object_mixer for partition in renderer._partitions]
+    assert len(set(map(id, mixers))) == 3
+    assert mixers[0] is renderer.object_renderer.mixer
+    assert [len(mixer.block_processing_channels) for mixer in mixers] == [3, 2, 2]
+
+
+@pytest.mark.parametrize("head_block_size", [None, 32])
+def test_skip_to(head_block_size):
+    layout = bs2051.get_layout("4+5+0")
+    sr = 48000
+    block_size = 1024
+    n_objects, block_dur, n_blocks = 3, Fraction(1, 50), 20
+    input_samples = np.random.normal(size=(int(sr * block_dur * n_blocks), n_objects + 2))
+
+    def render(start):
+        renderer = Renderer(layout, object_renderer_opts=dict(head_block_size=head_block_size))
+        renderer.set_rendering_items(make_rendering_items(n_objects, block_dur, n_blocks))
+        if start > 0:
+            renderer.skip_to(sr, start)
+        return np.concatenate([renderer.render(sr, input_samples[pos:pos + block_size])
+                               for pos in range(start, len(input_samples), block_size)] +
+                              [renderer.get_tail(sr, input_samples.shape[1])]), renderer
+
+    expected, renderer = render(0)
+
+    # start enough whole blocks early that the output is the same from start
+    start = 10 * block_size
+    history_blocks = -(-renderer.history_length(sr) // block_size)
+    preroll_start = start - history_blocks * block_size
+    assert preroll_start > 0
+
+    output, _ = render(preroll_start)
+    npt.assert_array_equal(output[start - preroll_start:], expected[start:])
+
+    renderer = Renderer(layout, object_renderer_opts=dict(head_block_size=head_block_size))
+    assert renderer.skip_to_alignment == 512
+    with pytest.raises(AssertionError, match="multiple of the object renderer block_size"):
+        renderer.skip_to(sr, 1000)
+
+
+def test_render_out():
+    layout = bs2051.get_layout("4+5+0")
+    sr = 48000
+    n_objects, block_dur, n_blocks = 3, Fraction(1, 50), 5
+    input_samples = np.random.normal(size=(int(sr * block_dur * n_blocks), n_objects + 2))
+
+    def render(use_out):
+        renderer = Renderer(layout)
+        renderer.set_rendering_items(make_rendering_items(n_objects, block_dur, n_blocks))
+        out = np.zeros((max(1000, renderer.tail_length), len(layout.channels)))
+
+        blocks = []
+        for start in range(0, len(input_samples), 1000):
+            block = renderer.render(sr, input_samples[start:start + 1000], out=out if use_out else None)
+            if use_out:
+                assert block.base is out
+            blocks.append(block.copy())
+        blocks.append(renderer.get_tail(sr, input_samples.shape[1], out=out if use_out else None).copy())
+        return np.concatenate(blocks)
+
+    npt.assert_array_equal(render(True), render(False))
+
+
+def test_streaming_renderer():
+    layout = bs2051.get_layout("4+5+0")
+    sr = 48000
+    block_size = 480
+    n_objects, block_dur, n_blocks = 3, Fraction(1, 50), 5
+    input_samples = np.random.normal(size=(int(sr * block_dur * n_blocks), n_objects + 2))
+
+    renderer = Renderer(layout)
+    renderer.set_rendering_items(make_rendering_items(n_objects, block_dur, n_blocks))
+    expected = np.concatenate([renderer.render(sr, input_samples[start:start + block_size])
+                               for start in range(0, len(input_samples), block_size)] +
+                              [renderer.get_tail(sr, input_samples.shape[1])])
+
+    # deliver the metadata through queues, one block at a time
+    items = make_rendering_items(n_objects, block_dur, n_blocks)
+    blocks = [list(item.metadata_source.type_metadatas_iter) for item in items]
+    sources = []
+    for item in items:
+        item.metadata_source = MetadataSourceQueue()
+        sources.append(item.metadata_source)
+
+    streaming = StreamingRenderer(layout, sr, block_size)
+    streaming.set_rendering_items(items)
+
+    output = []
+    for start in range(0, len(input_samples), block_size):
+        for source, item_blocks in zip(sources, blocks):
+            # put the blocks which start before the end of this audio block
+            while item_blocks and (item_blocks[0].block_format.rtime is None or
+                                   item_blocks[0].block_format.rtime * sr < start + block_size):
+                source.put(item_blocks.pop(0))
+            if not item_blocks:
+                source.close()
+        output.append(streaming.process(input_samples[start:start + block_size]))
+    output = np.concatenate(output)
+
+    assert streaming.underruns == 0
+    # the start of the output contains only the start of the decorrelation
+    # filter responses, which is discarded by Renderer
+    npt.assert_allclose(output[streaming.latency:], expected[:len(output) - streaming.latency], atol=1e-10)
@@ -1,7 +1,10 @@
 from fractions import Fraction
 import numpy as np
 import numpy.testing as npt
-from ..renderer_common import FixedGains, InterpGains
+import pytest
+from ..renderer_common import (FixedGains, InterpGains, BlockProcessingChannel, mix_block_processing_channels,
+                               sparse_gains, common_ticks, ticks_to_samples, InterpretTimingMetadata)
+from ..metadata_input import MetadataSourceIter, MetadataSourceQueue
 
 
 def test_FixedGains():
@@ -44,3 +47,216 @@ def test_InterpGains():
     g.process(0, input_samples, output_samples)
 
     npt.assert_allclose(output_samples, expected)
+
+
+def test_sparse_gains():
+    gains = np.zeros(8)
+    gains[[1, 5]] = [0.5, 0.25]
+    channels, values = sparse_gains(gains)
+    npt.assert_equal(channels, [1, 5])
+    npt.assert_equal(values, [0.5, 0.25])
+
+    channels, values = sparse_gains(np.zeros(8))
+    assert len(channels) == len(values) == 0
+
+    assert sparse_gains(np.ones(8)) is None
+
+    # lists are accepted too, e.g. in FixedGains
+    channels, values = sparse_gains([0.0, 0.0, 0.0, 0.0, 1.0])
+    npt.assert_equal(channels, [4])
+    npt.assert_equal(values, [1.0])
+
+    g = FixedGains(0, 10, [0.0, 0.0, 0.0, 0.0, 1.0])
+    output_samples = np.zeros((10, 5))
+    g.process(0, np.ones(10), output_samples)
+    npt.assert_equal(output_samples[:, 4], 1.0)
+
+
+def test_FixedGains_sparse():
+    gains = np.zeros(8)
+    gains[[1, 5]] = [0.5, 0.25]
+    g = FixedGains(start_sample=Fraction(0), end_sample=Fraction(10), gains=gains)
+
+    input_samples = np.random.normal(size=10)
+    output_samples = np.zeros((10, 8))
+    g.process(0, input_samples, output_samples)
+    npt.assert_allclose(output_samples, input_samples[:, np.newaxis] * gains[np.newaxis])
+
+
+@pytest.mark.parametrize("density", [1.0, 0.1])
+def test_mix_block_processing_channels(density):
+    sample_rate = 48000
+    num_outputs = 24
+
+    class InterpretGains(object):
+        """Interpret (start, end, gains_start, gains_end) tuples as FixedGains
+        or InterpGains."""
+
+        def __call__(self, sample_rate, block):
+            start, end, gains_start, gains_end = block
+            if gains_end is None:
+                yield FixedGains(start, end, gains_start)
+            else:
+                yield InterpGains(start, end, gains_start, gains_end)
+
+    def make_channels():
+        random = np.random.RandomState(0)
+        channels = []
+        for i in range(5):
+            boundaries = np.cumsum(random.uniform(10, 300, size=10)) + random.uniform(0, 100)
+            blocks = []
+            for start, end in zip(boundaries[:-1], boundaries[1:]):
+                gains_start = random.normal(size=num_outputs) * (random.rand(num_outputs) < density)
+                gains_end = (random.normal(size=num_outputs) * (random.rand(num_outputs) < density)
+                             if random.rand() < 0.5 else None)
+                blocks.append((Fraction(start), Fraction(end), gains_start, gains_end))
+            channels.append(BlockProcessingChannel(MetadataSourceIter(blocks), InterpretGains()))
+        return channels
+
+    input_samples = np.random.normal(size=(3000, 5))
+
+    expected = np.zeros((len(input_samples), num_outputs))
+    for i, channel in enumerate(make_channels()):
+        for start in range(0, len(input_samples), 256):
+            channel.process(sample_rate, start, input_samples[start:start + 256, i], expected[start:start + 256])
+
+    output = np.zeros((len(input_samples), num_outputs))
+    channels = make_channels()
+    for start in range(0, len(input_samples), 256):
+        mix_block_processing_channels(sample_rate, start,
+                                      [(channel, input_samples[start:start + 256, i])
+                                       for i, channel in enumerate(channels)],
+                                      output[start:start + 256])
+
+    npt.assert_allclose(output, expected, atol=1e-10)
+
+
+def test_BlockProcessingChannel_underrun():
+    sample_rate = 48000
+
+    def interpret_gains(sample_rate, block):
+        start, end, gains_start, gains_end = block
+        yield InterpGains(start, end, gains_start, gains_end)
+
+    source = MetadataSourceQueue()
+    channel = BlockProcessingChannel(source, interpret_gains)
+
+    def process(start, num_samples):
+        output = np.zeros((num_samples, 1))
+        channel.process(sample_rate, start, np.ones(num_samples), output)
+        return output[:, 0]
+
+    source.put((Fraction(0), Fraction(10), np.array([0.0]), np.array([1.0])))
+    npt.assert_allclose(process(0, 10), np.arange(10) / 10.0)
+    assert channel.underruns == 0
+
+    # no metadata, so the end gains are held
+    npt.assert_allclose(process(10, 10), 1.0)
+    npt.assert_allclose(process(20, 10), 1.0)
+    assert channel.underruns == 1
+
+    # late metadata is applied to the remaining samples, in the same underrun;
+    # blocks which are completely in the past are discarded
+    source.put((Fraction(20), Fraction(30), np.array([1.0]), np.array([0.0])))
+    source.put((Fraction(30), Fraction(45), np.array([0.5]), np.array([0.5])))
+    npt.assert_allclose(process(35, 10), 0.5)
+    assert channel.underruns == 1
+
+    # a second underrun
+    npt.assert_allclose(process(45, 10), 0.5)
+    assert channel.underruns == 2
+
+    # late metadata put just before closing is still applied
+    source.put((Fraction(50), Fraction(60), np.array([0.25]), np.array([0.25])))
+    source.close()
+    npt.assert_allclose(process(55, 5), 0.25)
+    assert channel.underruns == 2
+
+    # once closed and drained, the end of the metadata is not an underrun
+    npt.assert_allclose(process(60, 10), 0.0)
+    assert channel.underruns == 2
+
+    # without hold_on_underrun, late metadata raises
+    channel = BlockProcessingChannel(
+        MetadataSourceIter([(Fraction(0), Fraction(10), np.array([1.0]), np.array([1.0]))]), interpret_gains)
+    with pytest.raises(Exception, match="metadata underrun"):
+        channel.process(sample_rate, 5, np.ones(5), np.zeros((5, 1)))
+
+
+def test_ticks():
+    times = [Fraction(1, 3), Fraction(7, 10), None, Fraction(5), Fraction(1, 48000), Fraction(123456789, 100000)]
+    ticks_per_second, ticks = common_ticks(*times)
+    assert ticks_per_second == 1200000
+
+    for time, time_ticks in zip(times, ticks):
+        if time is None:
+            assert time_ticks is None
+            assert ticks_to_samples(time_ticks, ticks_per_second, 48000) == np.inf
+            continue
+
+        assert Fraction(time_ticks, ticks_per_second) == time
+
+        for sample_rate in [44100, 48000]:
+            sample = ticks_to_samples(time_ticks, ticks_per_second, sample_rate)
+            assert sample == time * sample_rate
+            assert isinstance(sample, int) == ((time * sample_rate).denominator == 1)
+
+            # rounding of non-integer samples is unchanged
+            block = FixedGains(sample, np.inf, np.ones(1))
+            assert block.first_sample == FixedGains(time * sample_rate, np.inf, np.ones(1)).first_sample
+
+
+def test_block_start_end():
+    from ..metadata_input import ObjectTypeMetadata, ExtraData
+    from ...fileio.adm.elements import AudioBlockFormatObjects
+
+    def make_block(rtime, duration, object_start=None, object_duration=None):
+        return ObjectTypeMetadata(
+            block_format=AudioBlockFormatObjects(id="AB_00031001_00000001", rtime=rtime, duration=duration,
+                                                 position=dict(azimuth=0.0, elevation=0.0)),
+            extra_data=ExtraData(object_start=object_start, object_duration=object_duration))
+
+    interpret = InterpretTimingMetadata()
+    assert interpret.block_start_end(make_block(Fraction(0), Fraction(1, 3), Fraction(1, 10))) == (
+        Fraction(1, 10), Fraction(13, 30))
+    assert interpret.block_start_end(make_block(Fraction(1, 3), Fraction(1, 7), Fraction(1, 10))) == (
+        Fraction(13, 30), Fraction(13, 30) + Fraction(1, 7))
+
+    with pytest.raises(Exception, match="overlapping blocks"):
+        interpret.block_start_end(make_block(Fraction(1, 3), Fraction(1, 7)))
+
+    interpret = InterpretTimingMetadata()
+    assert interpret.block_start_end(make_block(None, None, Fraction(1, 10))) == (Fraction(1, 10), np.inf)
+    with pytest.raises(Exception, match="overlapping blocks"):
+        interpret.block_start_end(make_block(None, None, Fraction(1, 10)))
+
+    interpret = InterpretTimingMetadata()
+    with pytest.raises(Exception, match="ends after object"):
+        interpret.block_start_end(make_block(Fraction(0), Fraction(2), Fraction(1, 10), Fraction(1)))
+    with pytest.raises(Exception, match="must be used together"):
+        interpret.block_start_end(make_block(Fraction(0), None))
+
+    interpret = InterpretTimingMetadata()
+    ticks_per_second, start, end, [extra] = interpret.block_start_end_ticks(
+        make_block(Fraction(1, 3), Fraction(1, 2)), extra_times=[Fraction(1, 5)])
+    assert ticks_per_second == 30
+    assert (start, end, extra) == (10, 25, 6)
+
+    # times already in ticks, e.g. from ObjectsBlockFormatColumns.timing; the
+    # time base is refined if the object times need it
+    from ..metadata_input import ObjectTimingMetadata
+    from ...fileio.adm.elements.block_format_columns import BlockFormatTiming
+
+    def make_timing(rtime, duration, object_start=None):
+        return ObjectTimingMetadata(
+            block_format=BlockFormatTiming(id="AB_00031001_00000001", time_base=30, rtime=rtime, duration=duration,
+                                           jump_position=False, interpolation_length=None),
+            extra_data=ExtraData(object_start=object_start))
+
+    interpret = InterpretTimingMetadata()
+    assert interpret.block_start_end_ticks(make_timing(10, 15), extra_times=[6], time_base=30) == (
+        30, 10, 25, [6])
+    assert interpret.block_start_end_ticks(make_timing(25, 5, Fraction(1, 7)), extra_times=[None],
+                                           time_base=30) == (210, 205, 240, [None])
+    with pytest.raises(Exception, match="overlapping blocks"):
+        interpret.block_start_end_ticks(make_timing(25, 5), time_base=30)
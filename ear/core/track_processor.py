@@ -100,7 +100,7 @@ class SilentProcessor(TrackProcessorBase):
         pass
 
     def process(self, sample_rate, input_samples):
-        return np.zeros(input_samples.shape[0])
+        return np.zeros(input_samples.shape[0], dtype=input_samples.dtype)
 
 
 # direct
@@ -175,10 +175,10 @@ class MatrixCoefficientProcessor(TrackProcessorBase):
         self.delay = None
         self.sample_rate = None
 
-    def init_delay(self, sample_rate):
+    def init_delay(self, sample_rate, input_dtype=np.float64):
         if self.delay is None:
-            delay_samples = int(math.ceil((sample_rate * self.coefficient.delay) / 1000.0 - 0.5))
-            self.delay = Delay(1, delay_samples)
+            delay_samples = _delay_samples(sample_rate, self.coefficient.delay)
+            self.delay = Delay(1, delay_samples, dtype=input_dtype)
             self.sample_rate = sample_rate
         else:
             assert self.sample_rate == sample_rate
@@ -190,7 +190,38 @@ class MatrixCoefficientProcessor(TrackProcessorBase):
             samples = samples * self.coefficient.gain
 
         if self.coefficient.delay is not None:
-            self.init_delay(sample_rate)
-            samples = self.delay.process(samples[:, np.newaxis])[:, 0]
+            self.init_delay(sample_rate, samples.dtype)
+            # samples is a new array if the gain was applied, so can be
+            # delayed in place
+            samples_2d = samples[:, np.newaxis]
+            out = samples_2d if self.coefficient.gain is not None else None
+            samples = self.delay.process(samples_2d, out=out)[:, 0]
 
         return samples
+
+
+def _delay_samples(sample_rate, delay_ms):
+    """Delay in samples for a matrix coefficient delay in ms."""
+    return int(math.ceil((sample_rate * delay_ms) / 1000.0 - 0.5))
+
+
+def max_delay(track_spec, sample_rate):
+    """Get the maximum number of samples that the processor for a track spec
+    delays its input by; this is the number of past input samples which can
+    affect the output.
+
+    Args:
+        track_spec (TrackSpec): Track spec to check.
+        sample_rate (int): Sample rate.
+
+    Returns:
+        int: maximum delay in samples
+    """
+    if isinstance(track_spec, MatrixCoefficientTrackSpec):
+        delay = track_spec.coefficient.delay
+        own_delay = _delay_samples(sample_rate, delay) if delay is not None else 0
+        return own_delay + max_delay(track_spec.input_track, sample_rate)
+    elif isinstance(track_spec, MixTrackSpec):
+        return max([max_delay(input_track, sample_rate) for input_track in track_spec.input_tracks] + [0])
+    else:
+        return 0
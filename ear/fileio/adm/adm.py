@@ -27,6 +27,42 @@ class ADM(object):
             self._atf,
             self._atu)
 
+        # map from upper-case ID to element, for lookup_element. Element IDs
+        # may be changed after they are added; entries are checked when used,
+        # and the index is re-built if it is out of date or ids_changed has
+        # been called.
+        self._id_index = {}
+        self._index_dirty = False
+
+        # LazyCommonDefinitions or None; see add_lazy_common_definitions
+        self._lazy_common_definitions = None
+
+    def add_lazy_common_definitions(self, common_definitions):
+        """Add common definitions which are only added to this ADM when they
+        are looked up, either directly or while resolving references.
+
+        Parameters:
+            common_definitions (common_definitions.LazyCommonDefinitions):
+                definitions to add
+        """
+        self._lazy_common_definitions = common_definitions
+
+    def _index_element(self, element):
+        if element.id is not None:
+            self._id_index.setdefault(element.id.upper(), element)
+
+    def _rebuild_index(self):
+        self._id_index = {}
+        for element in self.elements:
+            self._index_element(element)
+        self._index_dirty = False
+
+    def ids_changed(self):
+        """Signal that the IDs of elements in this ADM have been assigned or
+        changed since they were added, so that lookup_element finds them by
+        their new IDs."""
+        self._index_dirty = True
+
     @classmethod
     def _without_duplicates(cls, obj_list):
         """Remove objects with duplicate IDs.
@@ -62,8 +98,12 @@ class ADM(object):
                 yield common[0]
 
     def lazy_lookup_references(self):
+        if self._lazy_common_definitions is not None:
+            self._lazy_common_definitions.add_overridden(self)
+
         for obj_list in self._object_lists:
             obj_list[:] = self._without_duplicates(obj_list)
+        self._rebuild_index()
 
         for element in self.elements:
             element.lazy_lookup_references(self)
@@ -74,27 +114,35 @@ class ADM(object):
 
     def addAudioProgramme(self, programme):
         self._ap.append(programme)
+        self._index_element(programme)
 
     def addAudioContent(self, content):
         self._ac.append(content)
+        self._index_element(content)
 
     def addAudioObject(self, audioobject):
         self._ao.append(audioobject)
+        self._index_element(audioobject)
 
     def addAudioPackFormat(self, packformat):
         self._apf.append(packformat)
+        self._index_element(packformat)
 
     def addAudioChannelFormat(self, channelformat):
         self._acf.append(channelformat)
+        self._index_element(channelformat)
 
     def addAudioStreamFormat(self, streamformat):
         self._asf.append(streamformat)
+        self._index_element(streamformat)
 
     def addAudioTrackFormat(self, trackformat):
         self._atf.append(trackformat)
+        self._index_element(trackformat)
 
     def addAudioTrackUID(self, trackUID):
         self._atu.append(trackUID)
+        self._index_element(trackUID)
 
     @property
     def elements(self):
@@ -104,11 +152,31 @@ class ADM(object):
         return self.lookup_element(key)
 
     def lookup_element(self, key):
+        """Get the element with a given ID (ignoring case).
+
+        If element IDs are changed after they are added, ids_changed must be
+        called before looking them up by their new IDs.
+
+        Raises:
+            KeyError: if there is no element with this ID
+        """
         key_upper = key.upper()
-        for element in self.elements:
-            if element.id is not None and element.id.upper() == key_upper:
-                return element
-        raise KeyError('Unknown element requested {0}'.format(key))
+
+        if self._index_dirty:
+            self._rebuild_index()
+
+        element = self._id_index.get(key_upper)
+        if element is not None and (element.id is None or element.id.upper() != key_upper):
+            # this element's ID has changed, so others may have too
+            self._rebuild_index()
+            element = self._id_index.get(key_upper)
+
+        if element is None and self._lazy_common_definitions is not None:
+            element = self._lazy_common_definitions.lookup(self, key_upper)
+
+        if element is None:
+            raise KeyError('Unknown element requested {0}'.format(key))
+        return element
 
     @property
     def audioProgrammes(self):
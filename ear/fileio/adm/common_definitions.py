@@ -1,11 +1,112 @@
+import pickle
+import threading
 import pkg_resources
+from .adm import ADM
 from .xml import parse_adm_elements
 import lxml.etree
 
+_fname = "data/2094_common_definitions.xml"
 
-def load_common_definitions(adm):
-    fname = "data/2094_common_definitions.xml"
-    with pkg_resources.resource_stream(__name__, fname) as stream:
-        element = lxml.etree.parse(stream)
-        parse_adm_elements(adm, element, common_definitions=True)
-        adm.lazy_lookup_references()
+
+def load_common_definitions(adm, lazy=False):
+    """Add the common definitions to adm.
+
+    Args:
+        adm (ADM): ADM structure to add the common definitions to
+        lazy (bool): If True, each element is only added to adm when it is
+            first looked up, either directly or while resolving references.
+            This is much faster when only a few common definitions are used.
+    """
+    if lazy:
+        adm.add_lazy_common_definitions(LazyCommonDefinitions(_get_compiled_common_definitions()))
+    else:
+        with pkg_resources.resource_stream(__name__, _fname) as stream:
+            element = lxml.etree.parse(stream)
+            parse_adm_elements(adm, element, common_definitions=True)
+            adm.lazy_lookup_references()
+
+
+class CompiledCommonDefinitions(object):
+    """The common definitions, parsed once and stored as a compact index.
+
+    Each element is stored pickled, before its references are resolved, so
+    that independent copies can be cheaply made for each ADM that uses it.
+    """
+
+    def __init__(self, stream):
+        adm = ADM()
+        parse_adm_elements(adm, lxml.etree.parse(stream), common_definitions=True)
+
+        self._pickled = {element.id.upper(): pickle.dumps(element, pickle.HIGHEST_PROTOCOL)
+                         for element in adm.elements}
+
+    def __contains__(self, key_upper):
+        return key_upper in self._pickled
+
+    def __len__(self):
+        return len(self._pickled)
+
+    def make_element(self, key_upper):
+        """Make a new copy of an element with unresolved references, or
+        return None if there is no element with the given upper-case ID."""
+        pickled = self._pickled.get(key_upper)
+        return pickle.loads(pickled) if pickled is not None else None
+
+
+_compiled = None
+_compiled_lock = threading.Lock()
+
+
+def _get_compiled_common_definitions():
+    """Get the CompiledCommonDefinitions, creating them on the first call."""
+    global _compiled
+    with _compiled_lock:
+        if _compiled is None:
+            with pkg_resources.resource_stream(__name__, _fname) as stream:
+                _compiled = CompiledCommonDefinitions(stream)
+        return _compiled
+
+
+class LazyCommonDefinitions(object):
+    """Common definitions attached to a single ADM, which are added to it
+    when they are looked up; see ADM.add_lazy_common_definitions.
+
+    Parameters:
+        compiled (CompiledCommonDefinitions): common definitions to add
+    """
+
+    def __init__(self, compiled):
+        self.compiled = compiled
+        # upper-case IDs of the elements which have been added
+        self.added = set()
+
+    def _add(self, adm, key_upper):
+        element = self.compiled.make_element(key_upper)
+        if element is None:
+            return None
+
+        self.added.add(key_upper)
+        getattr(adm, "add" + element.element_type)(element)
+        # this may add more common definitions; the element is already in
+        # adm, so loops of references are not a problem
+        element.lazy_lookup_references(adm)
+        return element
+
+    def lookup(self, adm, key_upper):
+        """Add the element with a given upper-case ID to adm and return it,
+        or return None if there is no such element, or if it has already been
+        added."""
+        if key_upper in self.added:
+            return None
+        return self._add(adm, key_upper)
+
+    def add_overridden(self, adm):
+        """Add common definitions which have the same ID as other elements in
+        adm, so that they are replaced (with a warning) when duplicates are
+        removed, as if all common definitions had been loaded."""
+        for element in list(adm.elements):
+            if element.id is None or element.is_common_definition:
+                continue
+            key_upper = element.id.upper()
+            if key_upper in self.compiled and key_upper not in self.added:
+                self._add(adm, key_upper)
@@ -10,3 +10,5 @@ from .block_formats import (AudioBlockFormatObjects, ChannelLock, ObjectDivergen
 from .geom import (DirectSpeakerPolarPosition, DirectSpeakerCartesianPosition, BoundCoordinate,
                    ObjectPolarPosition, ObjectCartesianPosition, ScreenEdgeLock)
 from .interaction import (AudioObjectInteraction, GainInteractionRange, PositionInteractionRange)
+from .block_format_columns import ObjectsBlockFormatColumns
+from .lazy_block_formats import LazyBlockFormats
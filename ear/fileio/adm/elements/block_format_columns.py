@@ -0,0 +1,221 @@
+from collections import namedtuple
+from fractions import Fraction
+import numpy as np
+from .block_formats import AudioBlockFormatObjects, JumpPosition
+from .geom import ObjectPolarPosition, ObjectCartesianPosition, ScreenEdgeLock
+from .main_elements import TypeDefinition
+
+try:
+    # moved in py3.3
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
+try:
+    from math import gcd
+except ImportError:
+    from fractions import gcd
+
+
+# the parameters of a block which affect its timing, with times in integer
+# ticks of 1/time_base seconds or None; see ObjectsBlockFormatColumns.timing
+BlockFormatTiming = namedtuple("BlockFormatTiming",
+                               ["id", "time_base", "rtime", "duration", "jump_position", "interpolation_length"])
+
+
+def _lcm(a, b):
+    return a * b // gcd(a, b)
+
+
+def _to_ticks(values, time_base):
+    """Convert a list of Fractions or None to an array of integer ticks of
+    1/time_base seconds, and an array which is True where values were not
+    None."""
+    valid = np.array([value is not None for value in values], dtype=bool)
+    ticks = [value.numerator * (time_base // value.denominator) if value is not None else 0
+             for value in values]
+    try:
+        return np.array(ticks, dtype=np.int64), valid
+    except OverflowError:
+        # very fine time bases may not fit in an int64
+        return np.array(ticks, dtype=object), valid
+
+
+def _from_ticks(ticks, valid, time_base):
+    return Fraction(int(ticks), time_base) if valid else None
+
+
+def _ticks_or_none(ticks, valid):
+    return int(ticks) if valid else None
+
+
+class ObjectsBlockFormatColumns(Sequence):
+    """Columnar storage for a sequence of AudioBlockFormatObjects.
+
+    Common parameters are stored in numpy arrays with one entry per block, and
+    rarely-used parameters are stored in dictionaries from block index to
+    value. This uses much less memory than a list of AudioBlockFormatObjects,
+    and allows the parameters for many blocks to be processed as arrays (see
+    GainCalc.render_columns).
+
+    This behaves as a read-only sequence of AudioBlockFormatObjects, which are
+    created when they are accessed; modifying these does not modify the
+    columns.
+
+    Parameters:
+        block_formats (list of AudioBlockFormatObjects): blocks to store
+
+    Attributes:
+        time_base (int): number of ticks per second used for times
+        rtime (array of int): rtime of each block in ticks
+        has_rtime (array of bool): is rtime specified for each block?
+        duration (array of int): duration of each block in ticks
+        has_duration (array of bool): is duration specified for each block?
+        cartesian (array of bool): cartesian flag for each block
+        position_cartesian (array of bool): is each position an
+            ObjectCartesianPosition rather than an ObjectPolarPosition?
+        position (array of (n, 3) float): azimuth, elevation and distance for
+            polar positions, or X, Y and Z for Cartesian positions
+        width, height, depth, gain, diffuse (array of float): parameters for
+            each block
+        screenRef (array of bool): screenRef flag for each block
+        importance (array of int): importance of each block
+        jump_position (array of bool): jumpPosition flag for each block
+        interpolation_length (array of int): jumpPosition interpolationLength
+            in ticks
+        has_interpolation_length (array of bool): is interpolationLength
+            specified for each block?
+        ids (list of str or None): ID of each block
+        screen_edge_lock (dict): non-default position screenEdgeLock values
+        channel_lock (dict): channelLock values which are not None
+        object_divergence (dict): objectDivergence values which are not None
+        zone_exclusion (dict): zoneExclusion values which are not empty
+    """
+
+    def __init__(self, block_formats):
+        self.time_base = 1
+        for bf in block_formats:
+            for value in (bf.rtime, bf.duration, bf.jumpPosition.interpolationLength):
+                if value is not None:
+                    self.time_base = _lcm(self.time_base, value.denominator)
+
+        self.rtime, self.has_rtime = _to_ticks([bf.rtime for bf in block_formats], self.time_base)
+        self.duration, self.has_duration = _to_ticks([bf.duration for bf in block_formats], self.time_base)
+        self.interpolation_length, self.has_interpolation_length = _to_ticks(
+            [bf.jumpPosition.interpolationLength for bf in block_formats], self.time_base)
+
+        self.cartesian = np.array([bf.cartesian for bf in block_formats], dtype=bool)
+        self.position_cartesian = np.array([isinstance(bf.position, ObjectCartesianPosition)
+                                            for bf in block_formats], dtype=bool)
+        self.position = np.array([(bf.position.X, bf.position.Y, bf.position.Z)
+                                  if isinstance(bf.position, ObjectCartesianPosition)
+                                  else (bf.position.azimuth, bf.position.elevation, bf.position.distance)
+                                  for bf in block_formats], dtype=float).reshape(-1, 3)
+
+        for name in ["width", "height", "depth", "gain", "diffuse"]:
+            setattr(self, name, np.array([getattr(bf, name) for bf in block_formats], dtype=float))
+
+        self.screenRef = np.array([bf.screenRef for bf in block_formats], dtype=bool)
+        self.importance = np.array([bf.importance for bf in block_formats], dtype=np.int64)
+        self.jump_position = np.array([bf.jumpPosition.flag for bf in block_formats], dtype=bool)
+
+        self.ids = [bf.id for bf in block_formats]
+
+        self.screen_edge_lock = {i: bf.position.screenEdgeLock for i, bf in enumerate(block_formats)
+                                 if bf.position.screenEdgeLock != ScreenEdgeLock()}
+        self.channel_lock = {i: bf.channelLock for i, bf in enumerate(block_formats)
+                             if bf.channelLock is not None}
+        self.object_divergence = {i: bf.objectDivergence for i, bf in enumerate(block_formats)
+                                  if bf.objectDivergence is not None}
+        self.zone_exclusion = {i: bf.zoneExclusion for i, bf in enumerate(block_formats)
+                               if bf.zoneExclusion}
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _check_index(self, idx):
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("block format index out of range")
+        return idx
+
+    def _jump_position(self, idx):
+        return JumpPosition(
+            flag=bool(self.jump_position[idx]),
+            interpolationLength=_from_ticks(self.interpolation_length[idx],
+                                            self.has_interpolation_length[idx],
+                                            self.time_base))
+
+    def timing(self, idx):
+        """Get the parameters of a block which affect its timing, without
+        creating the whole block format.
+
+        The times are returned in ticks, so that they can be used without
+        converting them to Fractions; see
+        InterpretTimingMetadata.block_start_end_ticks.
+
+        Returns:
+            BlockFormatTiming: id, time_base, rtime, duration, jumpPosition
+            flag and interpolationLength of the block
+        """
+        idx = self._check_index(idx)
+        return BlockFormatTiming(
+            id=self.ids[idx],
+            time_base=self.time_base,
+            rtime=_ticks_or_none(self.rtime[idx], self.has_rtime[idx]),
+            duration=_ticks_or_none(self.duration[idx], self.has_duration[idx]),
+            jump_position=bool(self.jump_position[idx]),
+            interpolation_length=_ticks_or_none(self.interpolation_length[idx],
+                                                self.has_interpolation_length[idx]))
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+
+        idx = self._check_index(idx)
+
+        screen_edge_lock = self.screen_edge_lock.get(idx, ScreenEdgeLock())
+        a, b, c = self.position[idx]
+        if self.position_cartesian[idx]:
+            position = ObjectCartesianPosition(X=a, Y=b, Z=c, screenEdgeLock=screen_edge_lock)
+        else:
+            position = ObjectPolarPosition(azimuth=a, elevation=b, distance=c, screenEdgeLock=screen_edge_lock)
+
+        return AudioBlockFormatObjects(
+            id=self.ids[idx],
+            rtime=_from_ticks(self.rtime[idx], self.has_rtime[idx], self.time_base),
+            duration=_from_ticks(self.duration[idx], self.has_duration[idx], self.time_base),
+            position=position,
+            cartesian=bool(self.cartesian[idx]),
+            width=self.width[idx],
+            height=self.height[idx],
+            depth=self.depth[idx],
+            gain=self.gain[idx],
+            diffuse=self.diffuse[idx],
+            channelLock=self.channel_lock.get(idx),
+            objectDivergence=self.object_divergence.get(idx),
+            jumpPosition=self._jump_position(idx),
+            screenRef=bool(self.screenRef[idx]),
+            importance=int(self.importance[idx]),
+            zoneExclusion=list(self.zone_exclusion.get(idx, [])),
+        )
+
+    def to_block_formats(self):
+        """Get a list of all the block formats."""
+        return self[:]
+
+
+def use_block_format_columns(channel_formats):
+    """Replace the audioBlockFormats of each Objects channel format with an
+    ObjectsBlockFormatColumns.
+
+    This should be done once the block formats will no longer be modified.
+
+    Parameters:
+        channel_formats (list of AudioChannelFormat): channel formats to modify
+    """
+    for channel_format in channel_formats:
+        if (channel_format.type == TypeDefinition.Objects and
+                not isinstance(channel_format.audioBlockFormats, ObjectsBlockFormatColumns)):
+            channel_format.audioBlockFormats = ObjectsBlockFormatColumns(channel_format.audioBlockFormats)
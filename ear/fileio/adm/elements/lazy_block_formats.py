@@ -0,0 +1,122 @@
+from array import array
+from collections import namedtuple
+
+try:
+    # moved in py3.3
+    from collections.abc import Sequence
+except ImportError:
+    from collections import Sequence
+
+
+# a pair of consecutive blocks where the duration of the first (old) does not
+# match the difference between their rtimes (new); index is the index of the
+# first block
+DurationMismatch = namedtuple("DurationMismatch", ["index", "id_a", "id_b", "old", "new"])
+
+
+class LazyBlockFormats(Sequence):
+    """Sequence of block formats which are stored in an encoded form, and
+    decoded each time they are accessed.
+
+    The encoded blocks are stored in a single buffer, so the memory used is
+    proportional to the size of the encoded blocks, without a Python object
+    per block. The ID and timing of each block are given when it is appended,
+    so that the order and durations of the blocks can be checked without
+    decoding them.
+
+    Decoded blocks are independent copies; modifying them does not modify the
+    stored blocks, but their durations and IDs may be overridden with
+    set_duration and set_id.
+
+    Parameters:
+        decode (callable): function taking the encoded block (bytes) and the
+            line that was given to append, returning the block format. This
+            may be set after the blocks have been appended.
+
+    Attributes:
+        validators (list of callables): functions called with each decoded
+            block, which may raise an exception if it is not valid
+        out_of_order (bool): was a block appended with an earlier (rtime,
+            duration) than the previous block?
+        duration_mismatches (list of DurationMismatch): consecutive blocks
+            where the first duration does not match the difference in rtimes
+    """
+
+    def __init__(self, decode=None):
+        self.decode = decode
+        self.validators = []
+        self.out_of_order = False
+        self.duration_mismatches = []
+
+        self._data = bytearray()
+        self._offsets = array('l', [0])
+        self._lines = array('l')
+        self._durations = {}
+        self._ids = {}
+        # (id, rtime, duration) of the last block appended
+        self._last = None
+
+    def append(self, encoded, id=None, rtime=None, duration=None, line=0):
+        """Add an encoded block to the end.
+
+        Parameters:
+            encoded (bytes): encoded block
+            id (str): ID of the block
+            rtime (Fraction or None): rtime of the block
+            duration (Fraction or None): duration of the block
+            line (int): position of the block in the source, passed to decode
+        """
+        if self._last is not None:
+            last_id, last_rtime, last_duration = self._last
+
+            def sort_key(rtime, duration):
+                return (rtime if rtime is not None else 0,
+                        duration if duration is not None else 0)
+
+            if sort_key(last_rtime, last_duration) > sort_key(rtime, duration):
+                self.out_of_order = True
+
+            if None not in (last_rtime, last_duration, rtime, duration) and last_duration != rtime - last_rtime:
+                self.duration_mismatches.append(DurationMismatch(
+                    index=len(self) - 1, id_a=last_id, id_b=id, old=last_duration, new=rtime - last_rtime))
+
+        self._last = (id, rtime, duration)
+
+        self._data += encoded
+        self._offsets.append(len(self._data))
+        self._lines.append(line)
+
+    def set_duration(self, index, duration):
+        """Override the duration of a block, which is applied when it is
+        decoded."""
+        self._durations[index] = duration
+
+    def set_id(self, index, id):
+        """Override the ID of a block, which is applied when it is
+        decoded."""
+        self._ids[index] = id
+
+    def __len__(self):
+        return len(self._lines)
+
+    def __getitem__(self, idx):
+        if isinstance(idx, slice):
+            return [self[i] for i in range(*idx.indices(len(self)))]
+
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("block format index out of range")
+
+        encoded = bytes(self._data[self._offsets[idx]:self._offsets[idx + 1]])
+        block_format = self.decode(encoded, self._lines[idx])
+
+        if idx in self._durations:
+            block_format.duration = self._durations[idx]
+        if idx in self._ids:
+            block_format.id = self._ids[idx]
+
+        for validator in self.validators:
+            validator(block_format)
+
+        return block_format
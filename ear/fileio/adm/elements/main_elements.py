@@ -195,17 +195,31 @@ class AudioChannelFormat(ADMElement):
     frequency = attrib(default=Factory(Frequency), validator=instance_of(Frequency))
 
     def lazy_lookup_references(self, adm):
+        from .lazy_block_formats import LazyBlockFormats
+        # lazily decoded block formats are not used for types with references
+        if isinstance(self.audioBlockFormats, LazyBlockFormats):
+            return
         for block in self.audioBlockFormats:
             block.lazy_lookup_references(adm)
 
     @audioBlockFormats.validator
     def _validate_audioBlockFormats(self, attr, value):
         from . import block_formats  # can't import at top level without making a loop
+        from .block_format_columns import ObjectsBlockFormatColumns
+        from .lazy_block_formats import LazyBlockFormats
+        if isinstance(value, ObjectsBlockFormatColumns) and self.type == TypeDefinition.Objects:
+            return
+        if isinstance(value, LazyBlockFormats):
+            return
         block_type = block_formats.by_type_definition[self.type]
         list_of(block_type)(self, attr, value)
 
     def validate(self):
         super(AudioChannelFormat, self).validate()
+        from .lazy_block_formats import LazyBlockFormats
+        # lazily decoded block formats are validated as they are decoded
+        if isinstance(self.audioBlockFormats, LazyBlockFormats):
+            return
         for block in self.audioBlockFormats:
             block.validate()
 
@@ -1,3 +1,7 @@
+from .elements.block_format_columns import ObjectsBlockFormatColumns
+from .elements.lazy_block_formats import LazyBlockFormats
+
+
 def non_common(elements):
     for element in elements:
         if not element.is_common_definition:
@@ -31,8 +35,16 @@ def generate_ids(adm):
     for id, element in enumerate(non_common(adm.audioChannelFormats), 0x1001):
         element.id = "AC_{type.value:04X}{id:04X}".format(id=id, type=element.type)
 
-        for block_id, block in enumerate(element.audioBlockFormats, 0x1):
-            block.id = "AB_{type.value:04X}{id:04X}_{block_id:08X}".format(id=id, type=element.type, block_id=block_id)
+        block_ids = ["AB_{type.value:04X}{id:04X}_{block_id:08X}".format(id=id, type=element.type, block_id=block_id)
+                     for block_id in range(0x1, len(element.audioBlockFormats) + 0x1)]
+        if isinstance(element.audioBlockFormats, ObjectsBlockFormatColumns):
+            element.audioBlockFormats.ids = block_ids
+        elif isinstance(element.audioBlockFormats, LazyBlockFormats):
+            for index, block_id in enumerate(block_ids):
+                element.audioBlockFormats.set_id(index, block_id)
+        else:
+            for block, block_id in zip(element.audioBlockFormats, block_ids):
+                block.id = block_id
 
     for id, element in enumerate(non_common(adm.audioStreamFormats), 0x1001):
         element.id = "AS_{format.value:04X}{id:04X}".format(id=id, format=element.format)
@@ -43,6 +55,8 @@ def generate_ids(adm):
     for id, element in enumerate(adm.audioTrackUIDs, 0x1):
         element.id = "ATU_{id:08X}".format(id=id)
 
+    adm.ids_changed()
+
     # check for any track uids that have not been allocated
     for element in non_common(adm.audioTrackFormats):
         assert element.id is not None, "cannot create id for audioTrackFormat not linked to any audioStreamFormat"
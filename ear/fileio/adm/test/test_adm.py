@@ -0,0 +1,71 @@
+import pytest
+import warnings
+from ..adm import ADM
+from ..elements import AudioTrackUID, AudioPackFormat, TypeDefinition
+from ..exceptions import AdmIDWarning
+
+
+def test_lookup_element():
+    adm = ADM()
+    atu = AudioTrackUID(id="ATU_0000000a")
+    adm.addAudioTrackUID(atu)
+
+    assert adm.lookup_element("ATU_0000000a") is atu
+    assert adm["atu_0000000A"] is atu
+
+    with pytest.raises(KeyError):
+        adm.lookup_element("ATU_0000000b")
+
+
+def test_lookup_element_changed_id():
+    adm = ADM()
+    atu = AudioTrackUID()
+    adm.addAudioTrackUID(atu)
+
+    # ids can be assigned or changed after the element is added, as long as
+    # this is signalled
+    atu.id = "ATU_00000001"
+    with pytest.raises(KeyError):
+        adm.lookup_element("ATU_00000001")
+    adm.ids_changed()
+    assert adm["ATU_00000001"] is atu
+
+    # looking up an element by an old ID is detected without this
+    atu.id = "ATU_00000002"
+    with pytest.raises(KeyError):
+        adm.lookup_element("ATU_00000001")
+    assert adm["ATU_00000002"] is atu
+
+
+def test_lookup_element_miss_does_not_rebuild(monkeypatch):
+    adm = ADM()
+    for i in range(10):
+        adm.addAudioTrackUID(AudioTrackUID(id="ATU_{:08X}".format(i + 1)))
+
+    def rebuild_index():
+        assert False, "index should not be rebuilt"
+
+    monkeypatch.setattr(adm, "_rebuild_index", rebuild_index)
+    for i in range(10):
+        with pytest.raises(KeyError):
+            adm.lookup_element("ATU_{:08X}".format(i + 100))
+    assert adm["ATU_00000001"].id == "ATU_00000001"
+
+
+def test_lookup_element_duplicates():
+    adm = ADM()
+    common = AudioPackFormat(id="AP_00010001", audioPackFormatName="common", type=TypeDefinition.DirectSpeakers,
+                             is_common_definition=True)
+    adm.addAudioPackFormat(common)
+    override = AudioPackFormat(id="AP_00010001", audioPackFormatName="override", type=TypeDefinition.DirectSpeakers)
+    adm.addAudioPackFormat(override)
+
+    # before duplicates are removed, the first is found
+    assert adm["AP_00010001"] is common
+
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", AdmIDWarning)
+        adm.lazy_lookup_references()
+
+    assert adm.audioPackFormats == [override]
+    assert adm["AP_00010001"] is override
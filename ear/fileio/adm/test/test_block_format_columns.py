@@ -0,0 +1,92 @@
+from fractions import Fraction
+import pytest
+from ..elements import (AudioBlockFormatObjects, AudioChannelFormat, ChannelLock, JumpPosition,
+                        ObjectCartesianPosition, ObjectDivergence, ObjectsBlockFormatColumns, PolarZone,
+                        ScreenEdgeLock,
+                        TypeDefinition)
+from ..elements.block_format_columns import use_block_format_columns
+
+
+@pytest.fixture
+def block_formats():
+    block_formats = [
+        AudioBlockFormatObjects(id="AB_00031001_{:08X}".format(i + 1),
+                                rtime=Fraction(i, 10), duration=Fraction(1, 10),
+                                position=dict(azimuth=float(i), elevation=10.0, distance=0.5),
+                                gain=0.5, importance=i % 10)
+        for i in range(20)
+    ]
+
+    block_formats[1].position = ObjectCartesianPosition(X=0.5, Y=0.25, Z=-1.0,
+                                                        screenEdgeLock=ScreenEdgeLock(horizontal="left"))
+    block_formats[1].cartesian = True
+    block_formats[2].channelLock = ChannelLock(maxDistance=0.5)
+    block_formats[3].objectDivergence = ObjectDivergence(value=0.5, azimuthRange=30.0)
+    block_formats[4].zoneExclusion = [PolarZone(minElevation=0.0, maxElevation=0.0,
+                                                minAzimuth=-30.0, maxAzimuth=30.0)]
+    block_formats[5].jumpPosition = JumpPosition(flag=True, interpolationLength=Fraction(1, 3))
+    block_formats[6].width, block_formats[6].height, block_formats[6].depth = 10.0, 20.0, 0.5
+    block_formats[7].diffuse = 0.75
+    block_formats[8].screenRef = True
+    block_formats[9].rtime = block_formats[9].duration = None
+
+    return block_formats
+
+
+def test_round_trip(block_formats):
+    columns = ObjectsBlockFormatColumns(block_formats)
+
+    assert len(columns) == len(block_formats)
+    assert columns.time_base == 30
+    assert list(columns) == block_formats
+    assert columns[-1] == block_formats[-1]
+    assert columns[2:5] == block_formats[2:5]
+    assert columns.to_block_formats() == block_formats
+
+    with pytest.raises(IndexError):
+        columns[len(block_formats)]
+
+    assert set(columns.channel_lock) == {2}
+    assert set(columns.screen_edge_lock) == {1}
+
+
+def test_timing(block_formats):
+    columns = ObjectsBlockFormatColumns(block_formats)
+
+    for i, block_format in enumerate(block_formats):
+        timing = columns.timing(i)
+        assert timing.id == block_format.id
+        assert timing.time_base == columns.time_base
+
+        def from_ticks(ticks):
+            return Fraction(ticks, timing.time_base) if ticks is not None else None
+
+        assert from_ticks(timing.rtime) == block_format.rtime
+        assert from_ticks(timing.duration) == block_format.duration
+        assert timing.jump_position == block_format.jumpPosition.flag
+        assert from_ticks(timing.interpolation_length) == block_format.jumpPosition.interpolationLength
+
+    assert columns.timing(-1).id == block_formats[-1].id
+    with pytest.raises(IndexError):
+        columns.timing(len(block_formats))
+
+
+def test_empty():
+    columns = ObjectsBlockFormatColumns([])
+    assert len(columns) == 0
+    assert columns.position.shape == (0, 3)
+    assert list(columns) == []
+
+
+def test_channel_format(block_formats):
+    acf = AudioChannelFormat(id="AC_00031001", audioChannelFormatName="acf",
+                             type=TypeDefinition.Objects,
+                             audioBlockFormats=ObjectsBlockFormatColumns(block_formats))
+    acf.validate()
+
+    acf = AudioChannelFormat(id="AC_00031001", audioChannelFormatName="acf",
+                             type=TypeDefinition.Objects,
+                             audioBlockFormats=block_formats)
+    use_block_format_columns([acf])
+    assert isinstance(acf.audioBlockFormats, ObjectsBlockFormatColumns)
+    assert list(acf.audioBlockFormats) == block_formats
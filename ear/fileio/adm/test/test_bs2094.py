@@ -1,5 +1,8 @@
+import pytest
 from ..adm import ADM
 from ..common_definitions import load_common_definitions
+from ..elements import AudioPackFormat, TypeDefinition
+from ..exceptions import AdmIDWarning
 
 
 def test_load_common_definitions():
@@ -11,3 +14,54 @@ def test_load_common_definitions():
     assert len(adm.audioTrackFormats) == 300
     assert len(adm.audioStreamFormats) == 300
     assert len(list(adm.elements)) == (300 + 43 + 300 + 300)
+
+
+def test_lazy_common_definitions():
+    adm = ADM()
+    load_common_definitions(adm, lazy=True)
+    assert not list(adm.elements)
+
+    # elements referenced by a pack are added with it
+    apf = adm["AP_00010002"]
+    assert apf.is_common_definition
+    assert [acf.id for acf in apf.audioChannelFormats] == ["AC_00010001", "AC_00010002"]
+    assert sorted(element.id for element in adm.elements) == ["AC_00010001", "AC_00010002", "AP_00010002"]
+
+    # references in both directions between track and stream formats
+    atf = adm["at_00010001_01"]
+    assert atf.audioStreamFormat is adm["AS_00010001"]
+    assert atf.audioStreamFormat.audioChannelFormat is adm["AC_00010001"]
+    assert len(adm.audioChannelFormats) == 2
+
+    with pytest.raises(KeyError):
+        adm.lookup_element("AP_0001ffff")
+
+    # each ADM has its own copy
+    adm_2 = ADM()
+    load_common_definitions(adm_2, lazy=True)
+    assert adm_2["AP_00010002"] is not apf
+
+
+def test_lazy_common_definitions_match():
+    adm = ADM()
+    load_common_definitions(adm)
+
+    adm_lazy = ADM()
+    load_common_definitions(adm_lazy, lazy=True)
+
+    for element in adm.elements:
+        assert repr(adm_lazy[element.id]) == repr(element)
+    assert len(list(adm_lazy.elements)) == len(list(adm.elements))
+
+
+def test_lazy_common_definitions_override():
+    adm = ADM()
+    load_common_definitions(adm, lazy=True)
+
+    apf = AudioPackFormat(id="AP_00010002", audioPackFormatName="override", type=TypeDefinition.DirectSpeakers)
+    adm.addAudioPackFormat(apf)
+
+    with pytest.warns(AdmIDWarning):
+        adm.lazy_lookup_references()
+    assert adm.audioPackFormats == [apf]
+    assert adm["AP_00010002"] is apf
@@ -0,0 +1,25 @@
+from fractions import Fraction
+import pytest
+from ..time_format import parse_time, parse_time_ticks, unparse_time
+
+
+def test_parse_time():
+    assert parse_time("00:00:00.00000") == 0
+    assert parse_time("01:02:03.50000") == Fraction(3723) + Fraction(1, 2)
+    assert parse_time("1:2:3.") == 3723
+    assert parse_time("00:00:00.123456789123") == Fraction(123456789123, 10**12)
+
+    for time_string in ["00:00:01", "00:00:01.5 ", "a:00:00.0", "000:00:00.0", "00:00:00.0.0"]:
+        with pytest.raises(ValueError, match="Cannot parse time"):
+            parse_time(time_string)
+
+
+def test_parse_time_ticks():
+    assert parse_time_ticks("01:02:03.50000") == (372350000000 // 1000, 100000)
+    assert parse_time_ticks("00:00:01.") == (1, 1)
+    assert parse_time_ticks("00:00:00.000000001") == (1, 10**9)
+
+
+def test_round_trip():
+    for time in [Fraction(0), Fraction(1, 100), Fraction(3723, 2), Fraction(123456, 100000)]:
+        assert parse_time(unparse_time(time)) == time
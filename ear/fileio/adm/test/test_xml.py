@@ -1,10 +1,14 @@
+from io import BytesIO
 import lxml.etree
+import pkg_resources
 from lxml.builder import ElementMaker
 from fractions import Fraction
 import pytest
 import re
 from copy import deepcopy
-from ..xml import parse_string, adm_to_xml, ParseError
+from ..xml import parse_string, adm_to_xml, ParseError, load_axml_doc, iterparse_adm_elements
+from ..adm import ADM
+from ..common_definitions import load_common_definitions
 from ..exceptions import AdmError
 from ..elements import AudioBlockFormatBinaural, CartesianZone, PolarZone
 from ....common import CartesianPosition, PolarPosition, CartesianScreen, PolarScreen
@@ -18,7 +22,6 @@ class BaseADM(object):
     """Base ADM to start tests from, with utilities for interacting with it."""
 
     def __init__(self, fname):
-        import pkg_resources
         with pkg_resources.resource_stream(__name__, fname) as xml_file:
             self.xml = lxml.etree.parse(xml_file)
 
@@ -738,3 +741,166 @@ def test_round_trip_base(base):
 
 def test_round_trip_matrix(base_mat):
     check_round_trip(base_mat.adm)
+
+
+def check_same_elements(adm_a, adm_b):
+    assert len(list(adm_a.elements)) == len(list(adm_b.elements))
+
+    for element_a, element_b in zip(
+            sorted(adm_a.elements, key=lambda el: el.id),
+            sorted(adm_b.elements, key=lambda el: el.id)):
+        assert as_dict(element_a) == as_dict(element_b)
+
+
+@pytest.mark.parametrize("fname", ["base.xml", "example1.xml", "example5.xml"])
+def test_block_format_columns(fname):
+    from ..elements import ObjectsBlockFormatColumns, TypeDefinition
+    with pkg_resources.resource_stream(__name__, "test_adm_files/" + fname) as xml_file:
+        xml_str = xml_file.read()
+
+    adm = parse_string(xml_str, block_format_columns=True)
+    for acf in adm.audioChannelFormats:
+        assert isinstance(acf.audioBlockFormats, ObjectsBlockFormatColumns) == (acf.type == TypeDefinition.Objects)
+
+    check_same_elements(adm, parse_string(xml_str))
+    check_round_trip(adm)
+
+
+@pytest.mark.parametrize("fname", ["base.xml", "matrix.xml", "example1.xml", "example5.xml"])
+def test_lazy_block_formats(fname):
+    from ..elements import LazyBlockFormats, TypeDefinition
+    with pkg_resources.resource_stream(__name__, "test_adm_files/" + fname) as xml_file:
+        xml_str = xml_file.read()
+
+    adm = parse_string(xml_str, lazy_block_formats=True)
+    for acf in adm.audioChannelFormats:
+        if not acf.is_common_definition:
+            assert isinstance(acf.audioBlockFormats, LazyBlockFormats) == (acf.type != TypeDefinition.Matrix)
+
+    check_same_elements(adm, parse_string(xml_str))
+    check_round_trip(adm)
+
+
+@pytest.mark.parametrize("options", [dict(block_format_columns=True), dict(lazy_block_formats=True)])
+def test_generate_ids_block_format_storage(options):
+    from ..generate_ids import generate_ids
+    with pkg_resources.resource_stream(__name__, "test_adm_files/base.xml") as xml_file:
+        xml_str = xml_file.read()
+
+    # renumber the channel so that generate_ids has to change the block IDs
+    xml_str = xml_str.replace(b"00031001", b"00031005")
+
+    adm, adm_eager = parse_string(xml_str, **options), parse_string(xml_str)
+    generate_ids(adm)
+    generate_ids(adm_eager)
+
+    acf = adm["AC_00031001"]
+    assert [bf.id for bf in acf.audioBlockFormats] == ["AB_00031001_00000001"]
+
+    check_same_elements(adm, adm_eager)
+    check_round_trip(adm)
+
+
+def make_objects_channel(*block_times):
+    """Make an axml document containing an Objects audioChannelFormat, with
+    blocks having the given (rtime, duration) strings."""
+    return lxml.etree.tostring(E.ebuCoreMain(E.coreMetadata(E.format(E.audioFormatExtended(
+        E.audioChannelFormat(*[
+            E.audioBlockFormat(E.position("0", coordinate="azimuth"),
+                               E.position("0", coordinate="elevation"),
+                               audioBlockFormatID="AB_00031001_{:08X}".format(i + 1),
+                               rtime=rtime, duration=duration)
+            for i, (rtime, duration) in enumerate(block_times)],
+            audioChannelFormatID="AC_00031001", audioChannelFormatName="c", typeDefinition="Objects"))))),
+        pretty_print=True)
+
+
+@pytest.mark.parametrize("fix", [False, True])
+@pytest.mark.parametrize("block_times", [
+    # mismatched durations
+    [("00:00:00.00000", "00:00:01.00000"), ("00:00:01.50000", "00:00:01.00000"),
+     ("00:00:02.00000", "00:00:01.00000")],
+    # out of order
+    [("00:00:01.00000", "00:00:01.00000"), ("00:00:00.00000", "00:00:01.00000")],
+])
+def test_lazy_block_formats_timing(block_times, fix):
+    from ..elements import LazyBlockFormats
+    xml_str = make_objects_channel(*block_times)
+
+    with pytest.warns(UserWarning) as record_eager:
+        adm_eager = parse_string(xml_str, fix_block_format_durations=fix)
+    with pytest.warns(UserWarning) as record_lazy:
+        adm_lazy = parse_string(xml_str, fix_block_format_durations=fix, lazy_block_formats=True)
+
+    assert [str(w.message) for w in record_lazy] == [str(w.message) for w in record_eager]
+    assert list(get_acf(adm_lazy).audioBlockFormats) == get_acf(adm_eager).audioBlockFormats
+    assert isinstance(get_acf(adm_lazy).audioBlockFormats, LazyBlockFormats) == (block_times[0][0] == "00:00:00.00000")
+
+
+def test_lazy_block_formats_errors():
+    xml_str = make_objects_channel(("00:00:00.00000", "00:00:01.00000"))
+    xml_str = xml_str.replace(b'coordinate="elevation">0<', b'coordinate="elevation">e<')
+    block_line = xml_str[:xml_str.index(b":audioBlockFormat ")].count(b"\n") + 1
+    assert block_line > 1
+
+    adm = parse_string(xml_str, lazy_block_formats=True)
+    with pytest.raises(ParseError) as excinfo:
+        get_acf(adm).audioBlockFormats[0]
+    assert excinfo.value.element.sourceline == block_line
+
+    # errors in timing attributes are raised while loading
+    expected = "error while parsing attr rtime of element audioBlockFormat on line [0-9]+: ValueError: Cannot parse time: 't'$"
+    with pytest.raises(ParseError, match=expected):
+        parse_string(make_objects_channel(("t", "00:00:01.00000")), lazy_block_formats=True)
+
+
+@pytest.mark.parametrize("fname", ["base.xml", "matrix.xml", "example1.xml", "example5.xml"])
+def test_iterparse_matches_tree(fname):
+    with pkg_resources.resource_stream(__name__, "test_adm_files/" + fname) as xml_file:
+        xml_str = xml_file.read()
+
+    adm_tree = ADM()
+    load_common_definitions(adm_tree)
+    load_axml_doc(adm_tree, lxml.etree.fromstring(xml_str))
+
+    check_same_elements(adm_tree, parse_string(xml_str))
+    check_same_elements(adm_tree, parse_string(xml_str.decode("utf-8")))
+
+
+def test_parse_lazy_common_definitions():
+    with pkg_resources.resource_stream(__name__, "test_adm_files/base.xml") as xml_file:
+        xml_str = xml_file.read()
+
+    # all common definitions are loaded by default
+    adm = parse_string(xml_str)
+    assert len(adm.audioPackFormats) == 1 + 43
+
+    # only the ones which are used are loaded when lazy
+    adm_lazy = parse_string(xml_str, lazy_common_definitions=True)
+    assert len(adm_lazy.audioPackFormats) == 1
+
+
+def test_iterparse_frees_elements(monkeypatch):
+    """Check that parsed elements are removed from the tree while parsing."""
+    n_elements = 10000
+    xml = E.ebuCoreMain(E.coreMetadata(E.format(E.audioFormatExtended(*[
+        E.audioTrackUID(UID="ATU_{:08X}".format(i + 1), sampleRate="48000", bitDepth="24")
+        for i in range(n_elements)]))))
+    xml_str = lxml.etree.tostring(xml)
+
+    sizes = []
+    orig_iterparse = lxml.etree.iterparse
+
+    def iterparse(*args, **kwargs):
+        for event, element in orig_iterparse(*args, **kwargs):
+            yield event, element
+            sizes.append(sum(1 for _ in element.getroottree().iter()))
+
+    monkeypatch.setattr(lxml.etree, "iterparse", iterparse)
+    adm = ADM()
+    iterparse_adm_elements(adm, BytesIO(xml_str))
+
+    assert len(adm.audioTrackUIDs) == n_elements
+    assert len(sizes) == n_elements
+    # only elements which have been read but not yet parsed should remain
+    assert max(sizes) < n_elements // 10
@@ -7,27 +7,38 @@ _TIME_RE = re.compile(r"""
     :                    # :
     (?P<minute>\d{1,2})  # one or two minute digits
     :                    # :
-    (?P<second>          # second decimal consisting of:
-        \d{1,2}          #   two digits
-        (?:              #   then optionally
-            \.           #     a dot
-            \d*          #     and any number of digits
-        )
-    )
+    (?P<second>\d{1,2})  # one or two second digits
+    \.                   # a dot
+    (?P<fraction>\d*)    # and any number of fractional second digits
     \Z                   # end
 """, re.VERBOSE)
 
 
-def parse_time(time_string):
+def parse_time_ticks(time_string):
+    """Parse a time as an exact integer number of ticks.
+
+    This avoids Fraction arithmetic, so is much faster than parse_time.
+
+    Returns:
+        tuple of (int, int): number of ticks, and number of ticks per second,
+        which is 10 to the power of the number of fractional digits
+    """
     match = _TIME_RE.match(time_string)
     if match is None:
         raise ValueError("Cannot parse time: {!r}".format(time_string))
 
-    hour = int(match.group("hour"))
-    minute = int(match.group("minute"))
-    second = Fraction(match.group("second"))
+    hour, minute, second, fraction = match.groups()
+    ticks_per_second = 10 ** len(fraction)
+
+    seconds = ((int(hour) * 60) + int(minute)) * 60 + int(second)
+    ticks = seconds * ticks_per_second + (int(fraction) if fraction else 0)
 
-    return ((hour * 60) + minute) * 60 + second
+    return ticks, ticks_per_second
+
+
+def parse_time(time_string):
+    ticks, ticks_per_second = parse_time_ticks(time_string)
+    return Fraction(ticks, ticks_per_second)
 
 
 def unparse_time(time):
@@ -1,12 +1,13 @@
 import sys
 import warnings
 from fractions import Fraction
+from io import BytesIO
 
 from attr import attrs, attrib, Factory
 import lxml.etree
 from lxml.etree import QName
 from lxml.builder import ElementMaker
-from six import viewkeys, iteritems, reraise
+from six import viewkeys, iteritems, reraise, text_type
 
 from .adm import ADM
 from .elements import (
@@ -17,6 +18,8 @@ from .elements import (
     FormatDefinition, GainInteractionRange, PositionInteractionRange, TypeDefinition, Frequency)
 from .elements.geom import (DirectSpeakerPolarPosition, DirectSpeakerCartesianPosition,
                             ObjectPolarPosition, ObjectCartesianPosition)
+from .elements.block_format_columns import use_block_format_columns
+from .elements.lazy_block_formats import LazyBlockFormats, DurationMismatch
 from .time_format import parse_time, unparse_time
 from ...common import PolarPosition, CartesianPosition, CartesianScreen, PolarScreen
 
@@ -296,8 +299,7 @@ class ElementParser(object):
                     self.required_args.add(prop.arg_name)
                     self.arg_to_name[prop.arg_name] = QName(adm_name).localname
 
-    def parse(self, element):
-        kwargs = {}
+    def parse(self, element, **kwargs):
 
         def null_handler(kwargs, x):
             pass
@@ -1137,20 +1139,24 @@ track_uid_handler = ElementParser(AudioTrackUID, "audioTrackUID", [
 ])
 
 
-def parse_adm_elements(adm, element, common_definitions=False):
-    element_types = [
-        ("//{ns}audioProgramme", programme_handler.parse, adm.addAudioProgramme),
-        ("//{ns}audioContent", content_handler.parse, adm.addAudioContent),
-        ("//{ns}audioObject", object_handler.parse, adm.addAudioObject),
-        ("//{ns}audioChannelFormat", channel_format_handler.parse, adm.addAudioChannelFormat),
-        ("//{ns}audioPackFormat", pack_format_handler.parse, adm.addAudioPackFormat),
-        ("//{ns}audioStreamFormat", stream_format_handler.parse, adm.addAudioStreamFormat),
-        ("//{ns}audioTrackFormat", track_format_handler.parse, adm.addAudioTrackFormat),
-        ("//{ns}audioTrackUID", track_uid_handler.parse, adm.addAudioTrackUID),
+def _adm_element_types(adm):
+    """Get tuples of (element name, parse function, add function) for each
+    top-level ADM element type."""
+    return [
+        ("audioProgramme", programme_handler.parse, adm.addAudioProgramme),
+        ("audioContent", content_handler.parse, adm.addAudioContent),
+        ("audioObject", object_handler.parse, adm.addAudioObject),
+        ("audioChannelFormat", channel_format_handler.parse, adm.addAudioChannelFormat),
+        ("audioPackFormat", pack_format_handler.parse, adm.addAudioPackFormat),
+        ("audioStreamFormat", stream_format_handler.parse, adm.addAudioStreamFormat),
+        ("audioTrackFormat", track_format_handler.parse, adm.addAudioTrackFormat),
+        ("audioTrackUID", track_uid_handler.parse, adm.addAudioTrackUID),
     ]
 
-    for path, parse_func, add_func in element_types:
-        for sub_element in xpath(element, path):
+
+def parse_adm_elements(adm, element, common_definitions=False):
+    for name, parse_func, add_func in _adm_element_types(adm):
+        for sub_element in xpath(element, "//{ns}" + name):
             adm_element = parse_func(sub_element)
 
             if common_definitions:
@@ -1159,6 +1165,150 @@ def parse_adm_elements(adm, element, common_definitions=False):
             add_func(adm_element)
 
 
+# block format types which may be stored in LazyBlockFormats; Matrix blocks
+# contain references, which must be resolved while loading
+_lazy_block_format_types = set(block_format_handlers) - {TypeDefinition.Matrix}
+
+
+def _lazy_block_format_type(element):
+    """Get the type of an audioChannelFormat element if its block formats can
+    be stored in LazyBlockFormats, or None."""
+    kwargs = {}
+    handlers = {adm_name: handler for handler_type, adm_name, handler in type_handler.get_handlers()}
+    try:
+        for key, value in iteritems(element.attrib):
+            if key in handlers:
+                handlers[key](kwargs, value)
+    except ValueError:
+        # reported when the channel format is parsed
+        return None
+
+    type = kwargs.get("type")
+    return type if type in _lazy_block_format_types else None
+
+
+def _append_lazy_block_format(block_formats, element):
+    """Add an audioBlockFormat element to a LazyBlockFormats."""
+    timing = {}
+    for adm_name in ["rtime", "duration"]:
+        if adm_name in element.attrib:
+            try:
+                timing[adm_name] = TimeType.loads_func(element.attrib[adm_name])
+            except Exception as e:
+                reraise(ParseError, ParseError(e, element, adm_name), sys.exc_info()[2])
+
+    # as in _set_default_rtimes
+    if "rtime" not in timing and "duration" in timing:
+        timing["rtime"] = Fraction(0)
+
+    block_formats.append(lxml.etree.tostring(element, with_tail=False),
+                         id=element.attrib.get("audioBlockFormatID"),
+                         line=element.sourceline or 0,
+                         **timing)
+
+
+def _lazy_block_format_decoder(type):
+    """Get a function to decode block formats of a given type stored by
+    _append_lazy_block_format."""
+    handler = block_format_handlers[type]
+
+    def decode(encoded, line):
+        element = lxml.etree.fromstring(encoded)
+        # make line numbers in errors refer to the original document
+        for sub_element in element.iter():
+            if sub_element.sourceline is not None:
+                sub_element.sourceline += line - 1
+
+        # as in ElementParser.parse for the channel format
+        try:
+            block_format = handler(element)
+        except ParseError: raise
+        except Exception as e: reraise(ParseError, ParseError(e, element), sys.exc_info()[2])
+
+        if block_format.rtime is None and block_format.duration is not None:
+            block_format.rtime = Fraction(0)
+        return block_format
+
+    return decode
+
+
+def iterparse_adm_elements(adm, source, common_definitions=False, lazy_block_formats=False):
+    """Parse ADM elements from an xml document in a single pass, like
+    parse_adm_elements.
+
+    Elements are parsed as soon as they have been read, then removed from the
+    tree, so the memory used is proportional to the size of the largest
+    element rather than the whole document.
+
+    Args:
+        adm (ADM): ADM structure to add elements to
+        source: file name or file-like object to read the document from
+        common_definitions (bool): mark elements as common definitions
+        lazy_block_formats (bool): store the audioBlockFormats of each
+            audioChannelFormat (other than Matrix) in LazyBlockFormats, which
+            parses each block when it is accessed, rather than parsing them
+            all while loading. The unparsed blocks are removed from the tree as
+            they are read, so the memory used while loading does not depend
+            on the number of blocks in each channel.
+    """
+    handlers = {}
+    for name, parse_func, add_func in _adm_element_types(adm):
+        for qname in qnames(name):
+            handlers[qname] = (parse_func, add_func)
+
+    channel_format_tags = set(qnames("audioChannelFormat"))
+    block_format_tags = set(qnames("audioBlockFormat")) if lazy_block_formats else set()
+
+    # the channel format element whose block formats are being read, and the
+    # LazyBlockFormats they are stored in, or None if they are not lazy
+    lazy_parent, lazy_blocks = None, None
+
+    for event, sub_element in lxml.etree.iterparse(source, events=("end",),
+                                                   tag=list(handlers) + list(block_format_tags)):
+        if sub_element.tag in block_format_tags:
+            parent = sub_element.getparent()
+            if parent is None or parent.tag not in channel_format_tags:
+                continue
+
+            if parent is not lazy_parent:
+                lazy_parent = parent
+                lazy_blocks = LazyBlockFormats() if _lazy_block_format_type(parent) is not None else None
+
+            if lazy_blocks is not None:
+                _append_lazy_block_format(lazy_blocks, sub_element)
+                # the current element can not be removed while parsing, so
+                # clear it and remove it after the next block
+                sub_element.clear()
+                previous = sub_element.getprevious()
+                if previous is not None and previous.tag in block_format_tags:
+                    parent.remove(previous)
+            continue
+
+        parse_func, add_func = handlers[sub_element.tag]
+        if sub_element is lazy_parent and lazy_blocks is not None:
+            for child in list(sub_element):
+                if child.tag in block_format_tags:
+                    sub_element.remove(child)
+            adm_element = channel_format_handler.parse(sub_element, audioBlockFormats=lazy_blocks)
+            lazy_blocks.decode = _lazy_block_format_decoder(adm_element.type)
+            lazy_parent, lazy_blocks = None, None
+        else:
+            adm_element = parse_func(sub_element)
+
+        if common_definitions:
+            adm_element.is_common_definition = True
+
+        add_func(adm_element)
+
+        # free this element and any earlier siblings, which have all been
+        # dealt with, unless this is inside another element to be parsed
+        parent = sub_element.getparent()
+        if parent is None or parent.tag not in handlers:
+            sub_element.clear()
+            while sub_element.getprevious() is not None:
+                del parent[0]
+
+
 def _sort_block_formats(channelFormats):
     def sort_key(bf):
         return (bf.rtime if bf.rtime is not None else Fraction(0),
@@ -1167,6 +1317,12 @@ def _sort_block_formats(channelFormats):
     for channelFormat in channelFormats:
         block_formats = channelFormat.audioBlockFormats
 
+        if isinstance(block_formats, LazyBlockFormats):
+            if block_formats.out_of_order:
+                warnings.warn("out of order block formats in {id}".format(id=channelFormat.id))
+                channelFormat.audioBlockFormats = sorted(block_formats, key=sort_key)
+            continue
+
         if any(sort_key(bf_a) > sort_key(bf_b)
                for bf_a, bf_b in zip(block_formats[:-1], block_formats[1:])):
             warnings.warn("out of order block formats in {id}".format(id=channelFormat.id))
@@ -1182,41 +1338,56 @@ def _set_default_rtimes(channelFormats):
     InterpretTimingMetadata.
     """
     for channelFormat in channelFormats:
+        # done while decoding LazyBlockFormats
+        if isinstance(channelFormat.audioBlockFormats, LazyBlockFormats):
+            continue
+
         for bf in channelFormat.audioBlockFormats:
             if bf.rtime is None and bf.duration is not None:
                 bf.rtime = Fraction(0)
 
 
+def _duration_mismatches(block_formats):
+    """Find consecutive block formats where the duration of the first does not
+    match the difference between their rtimes.
+
+    Returns:
+        list of DurationMismatch
+    """
+    if isinstance(block_formats, LazyBlockFormats):
+        return block_formats.duration_mismatches
+
+    return [DurationMismatch(index=i, id_a=bf_a.id, id_b=bf_b.id, old=bf_a.duration, new=bf_b.rtime - bf_a.rtime)
+            for i, (bf_a, bf_b) in enumerate(zip(block_formats[:-1], block_formats[1:]))
+            if not (bf_a.rtime is None or bf_a.duration is None or
+                    bf_b.rtime is None or bf_b.duration is None) and
+            bf_a.duration != bf_b.rtime - bf_a.rtime]
+
+
 def _check_block_format_durations(channelFormats, fix=False):
     for channelFormat in channelFormats:
         block_formats = channelFormat.audioBlockFormats
 
-        for bf_a, bf_b in zip(block_formats[:-1], block_formats[1:]):
-            if (bf_a.rtime is None or bf_a.duration is None or
-                    bf_b.rtime is None or bf_b.duration is None):
-                continue
-
-            old_duration = bf_a.duration
-            new_duration = bf_b.rtime - bf_a.rtime
-
-            if old_duration != new_duration:
-                if fix:
-                    warnings.warn("{direction} duration of block format {id}; was: {old}, now: {new}".format(
-                        direction="expanded" if new_duration > old_duration else "contracted",
-                        id=bf_a.id,
-                        old=old_duration,
-                        new=new_duration))
-                    bf_a.duration = new_duration
+        for mismatch in _duration_mismatches(block_formats):
+            if fix:
+                warnings.warn("{direction} duration of block format {id}; was: {old}, now: {new}".format(
+                    direction="expanded" if mismatch.new > mismatch.old else "contracted",
+                    id=mismatch.id_a,
+                    old=mismatch.old,
+                    new=mismatch.new))
+                if isinstance(block_formats, LazyBlockFormats):
+                    block_formats.set_duration(mismatch.index, mismatch.new)
                 else:
-                    warnings.warn(
-                        "(rtime + duration) of block format {id_a} does not equal rtime of block format {id_b}.".format(
-                            id_a=bf_a.id,
-                            id_b=bf_b.id))
-
+                    block_formats[mismatch.index].duration = mismatch.new
+            else:
+                warnings.warn(
+                    "(rtime + duration) of block format {id_a} does not equal rtime of block format {id_b}.".format(
+                        id_a=mismatch.id_a,
+                        id_b=mismatch.id_b))
 
-def load_axml_doc(adm, element, lookup_references=True, fix_block_format_durations=False):
-    parse_adm_elements(adm, element)
 
+def _post_process(adm, lookup_references=True, fix_block_format_durations=False,
+                  block_format_columns=False):
     if lookup_references:
         adm.lazy_lookup_references()
 
@@ -1224,29 +1395,38 @@ def load_axml_doc(adm, element, lookup_references=True, fix_block_format_duratio
     _sort_block_formats(adm.audioChannelFormats)
     _check_block_format_durations(adm.audioChannelFormats, fix=fix_block_format_durations)
 
+    if block_format_columns:
+        use_block_format_columns(adm.audioChannelFormats)
+
+
+def load_axml_doc(adm, element, **kwargs):
+    parse_adm_elements(adm, element)
+    _post_process(adm, **kwargs)
+
 
 def load_axml_string(adm, axmlstr, **kwargs):
-    element = lxml.etree.fromstring(axmlstr)
-    load_axml_doc(adm, element, **kwargs)
+    if isinstance(axmlstr, text_type):
+        axmlstr = axmlstr.encode("utf-8")
+    load_axml_file(adm, BytesIO(axmlstr), **kwargs)
 
 
-def load_axml_file(adm, axmlfile, **kwargs):
-    element = lxml.etree.parse(axmlfile)
-    load_axml_doc(adm, element, **kwargs)
+def load_axml_file(adm, axmlfile, lazy_block_formats=False, **kwargs):
+    iterparse_adm_elements(adm, axmlfile, lazy_block_formats=lazy_block_formats)
+    _post_process(adm, **kwargs)
 
 
-def parse_string(axmlstr, **kwargs):
+def parse_string(axmlstr, lazy_common_definitions=False, **kwargs):
     adm = ADM()
     from .common_definitions import load_common_definitions
-    load_common_definitions(adm)
+    load_common_definitions(adm, lazy=lazy_common_definitions)
     load_axml_string(adm, axmlstr, **kwargs)
     return adm
 
 
-def parse_file(axmlfile, **kwargs):
+def parse_file(axmlfile, lazy_common_definitions=False, **kwargs):
     adm = ADM()
     from .common_definitions import load_common_definitions
-    load_common_definitions(adm)
+    load_common_definitions(adm, lazy=lazy_common_definitions)
     load_axml_file(adm, axmlfile, **kwargs)
     return adm
 
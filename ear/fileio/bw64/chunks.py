@@ -32,6 +32,16 @@ class Format(IntEnum):
     WAVE_FORMAT_EXTENSIBLE = 65534
 
 
+# supported bitsPerSample for each format
+_supported_bit_depths = {
+    Format.PCM: [16, 24, 32],
+    Format.WAVE_FORMAT_IEEE_FLOAT: [32, 64],
+}
+
+# the part of the WAVE_FORMAT_EXTENSIBLE subFormat GUID after the format tag
+SUBFORMAT_GUID_SUFFIX = b'\x00\x00\x00\x00\x10\x00\x80\x00\x00\xaa\x00\x38\x9b\x71'
+
+
 class FormatInfoChunk(object):
     """ Class representation of the FormatChunk
 
@@ -66,26 +76,13 @@ class FormatInfoChunk(object):
         if(self.formatTag not in list(Format)):
             raise ValueError('format not supported: ' + str(self.formatTag))
 
-        if self.cbSize:
-            if cbSize != self.cbSize:
-                raise ValueError(
-                    'sanity check failed. \'cbSize\' is ' +
-                    str(cbSize) + ' but should be ' +
-                    str(self.cbSize)
-                )
-
-        if(self.formatTag == Format.WAVE_FORMAT_EXTENSIBLE):
+        if(self._formatTag == Format.WAVE_FORMAT_EXTENSIBLE):
             if not self.extraData:
                 raise RuntimeError(
                     'missing extra data for WAVE_FORMAT_EXTENSIBLE')
-            if self.extraData.subFormat not in list(Format):
+            if self.extraData.subFormat not in [Format.PCM, Format.WAVE_FORMAT_IEEE_FLOAT]:
                 raise ValueError(
-                    'subformat not supported: ' + str(self.formatTag))
-            if formatTag != self.extraData.subFormat:
-                raise ValueError(
-                    'sanity check failed. \'formatTag\' and'
-                    '\'extraData.subFormat\' do not match.'
-                )
+                    'subformat not supported: ' + str(self.extraData.subFormat))
 
         if(self.channelCount < 1):
             raise ValueError('channelCount < 1')
@@ -93,7 +90,7 @@ class FormatInfoChunk(object):
         if(self.sampleRate < 1):
             raise ValueError('sampleRate < 1')
 
-        if(self.bitsPerSample not in [16, 24, 32]):
+        if(self.bitsPerSample not in _supported_bit_depths.get(self.formatTag, [])):
             raise ValueError('bit depth not supported: ' +
                              str(self._bitsPerSample))
 
@@ -122,6 +119,8 @@ class FormatInfoChunk(object):
 
     @property
     def formatTag(self):
+        """The format of the samples; for WAVE_FORMAT_EXTENSIBLE this is the
+        format tag from the subFormat."""
         if(self.extraData):
             return self.extraData.subFormat
         else:
@@ -160,7 +159,7 @@ class FormatInfoChunk(object):
 
     def asByteArray(self):
         byteArrayData = struct.pack('<HHIIHH',
-                                    self.formatTag,
+                                    self._formatTag,
                                     self.channelCount,
                                     self.sampleRate,
                                     self.bytesPerSecond,
@@ -194,7 +193,7 @@ class ExtraData(object):
     """ExtraData of a FormatChunk """
 
     def __init__(self, validBitsPerSample, dwChannelMask, subFormat,
-                 subFormatString):
+                 subFormatString=SUBFORMAT_GUID_SUFFIX):
         self._validBitsPerSample = int(validBitsPerSample)
         self._dwChannelMask = int(dwChannelMask)
         self._subFormat = int(subFormat)
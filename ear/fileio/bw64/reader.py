@@ -1,18 +1,64 @@
+import io
+import numpy as np
+import os
 import struct
-from .chunks import ChunkIndex, FormatInfoChunk, DataSize64Chunk, ChnaChunk, AudioID
-from .utils import deinterleave, decode_pcm_samples
+from .chunks import ChunkIndex, FormatInfoChunk, DataSize64Chunk, ChnaChunk, AudioID, Format
+from .utils import deinterleave, decode_samples
+
+
+# types of mapped samples for each format and bit depth, for Bw64Reader.samples
+_mapped_sample_types = {
+    (Format.PCM, 16): np.dtype('<i2'),
+    (Format.PCM, 32): np.dtype('<i4'),
+    (Format.WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype('<f4'),
+    (Format.WAVE_FORMAT_IEEE_FLOAT, 64): np.dtype('<f8'),
+}
+
+
+class _ChunkReader(io.RawIOBase):
+    """Read-only file-like object for the data of a chunk, which seeks in the
+    underlying buffer for each read, restoring its position afterwards."""
+
+    def __init__(self, buffer, chunk_index):
+        self._buffer = buffer
+        self._start = chunk_index.position.data
+        self._size = chunk_index.size
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        n = min(len(b), self._size - self._pos)
+        if n <= 0:
+            return 0
+
+        last_position = self._buffer.tell()
+        self._buffer.seek(self._start + self._pos)
+        data = self._buffer.read(n)
+        self._buffer.seek(last_position)
+
+        b[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
 
 
 class Bw64Reader(object):
     """Read a WAVE/RF64/BW64 file.
 
-    Only PCM data (16bit, 24bit, 32bit) is currently supported. The class
+    PCM data (16bit, 24bit, 32bit) and IEEE float data (32bit, 64bit) are
+    supported, including WAVE_FORMAT_EXTENSIBLE files. The class
     provides easy access to the axml, chna, bext chunks. The most important
     format information (samplerate, sample rate, bit rate, ...) can be directly
     accessed as properties.
+
+    If use_mmap is true, the data chunk is mapped into memory rather than being
+    read through buffer (which must then be a real file), so that the samples
+    can be accessed without copying (see samples), and readers of the same
+    file in different processes share the same memory.
     """
 
-    def __init__(self, buffer):
+    def __init__(self, buffer, use_mmap=False):
         self._buffer = buffer
         self._chunks = {}
         self._buffer.seek(0)
@@ -23,12 +69,14 @@ class Bw64Reader(object):
         self._read_chunks()
         self._read_fmt_chunk()
         self._read_chna_chunk()
+        self._data_map = self._map_data_chunk() if use_mmap else None
         self.seek(0)
 
     def __enter__(self):
         return self
 
     def __exit__(self, type, value, traceback):
+        self._data_map = None
         self._buffer.close()
 
     @property
@@ -69,6 +117,11 @@ class Bw64Reader(object):
     def bitdepth(self):
         return self._formatInfo.bitsPerSample
 
+    @property
+    def formatTag(self):
+        """Format of the samples: Format.PCM or Format.WAVE_FORMAT_IEEE_FLOAT."""
+        return self._formatInfo.formatTag
+
     def seek(self, offset, whence=0):
         frameOffset = offset * self._formatInfo.blockAlignment
         chunkIndex = self._chunks[b'data']
@@ -88,12 +141,64 @@ class Bw64Reader(object):
         else:
             self._buffer.seek(dataChunkOffset + frameOffset)
 
-    def read(self, numberOfFrames):
+    @property
+    def samples(self):
+        """Undecoded samples as an array of (frames, channels) integers or
+        floats, mapped from the data chunk without copying.
+
+        This is only available if the file was opened with use_mmap, and for
+        16 and 32 bit PCM or float samples.
+        """
+        if self._data_map is None:
+            raise ValueError("samples is only available when use_mmap is used")
+        if self._mapped_sample_type is None:
+            raise ValueError("samples is not available for {bitdepth} bit files".format(bitdepth=self.bitdepth))
+
+        return self._data_map.view(self._mapped_sample_type).reshape(-1, self.channels)
+
+    @property
+    def _mapped_sample_type(self):
+        return _mapped_sample_types.get((self.formatTag, self.bitdepth))
+
+    def _map_data_chunk(self):
+        """Map the whole frames in the data chunk into an array of bytes."""
+        dataStart = self._chunks[b'data'].position.data
+        # the data size may be larger than the file if it was truncated
+        fileSize = os.fstat(self._buffer.fileno()).st_size
+        numberOfFrames = min(len(self), (fileSize - dataStart) // self._formatInfo.blockAlignment)
+        numberOfBytes = max(numberOfFrames, 0) * self._formatInfo.blockAlignment
+
+        if numberOfBytes == 0:
+            return np.zeros(0, dtype=np.uint8)
+        return np.memmap(self._buffer, dtype=np.uint8, mode='r', offset=dataStart, shape=(numberOfBytes,))
+
+    def _read_mapped(self, numberOfFrames, dtype):
+        """Read samples from the mapped data chunk, decoding only the frames
+        requested."""
+        start = self.tell()
+        numberOfFrames = max(min(numberOfFrames, len(self._data_map) // self._formatInfo.blockAlignment - start), 0)
+        end = start + numberOfFrames
+        self.seek(end)
+
+        if self._mapped_sample_type is not None:
+            samples = self.samples[start:end].astype(dtype)
+            if self.formatTag == Format.PCM:
+                samples /= np.asarray(2**(self.bitdepth - 1) - 1, dtype=dtype)
+            return samples
+        else:
+            blockAlignment = self._formatInfo.blockAlignment
+            rawData = self._data_map[start * blockAlignment:end * blockAlignment]
+            return deinterleave(decode_samples(rawData, self.formatTag, self.bitdepth, dtype), self.channels)
+
+    def read(self, numberOfFrames, dtype=np.float64):
+        if self._data_map is not None:
+            return self._read_mapped(numberOfFrames, dtype)
+
         if(self.tell() + numberOfFrames > len(self)):
             numberOfFrames = len(self) - self.tell()
         rawData = self._buffer.read(
             numberOfFrames * self._formatInfo.blockAlignment)
-        samplesDecoded = decode_pcm_samples(rawData, self.bitdepth)
+        samplesDecoded = decode_samples(rawData, self.formatTag, self.bitdepth, dtype)
         return deinterleave(samplesDecoded, self.channels)
 
     def tell(self):
@@ -190,6 +295,15 @@ class Bw64Reader(object):
         self._formatInfo = FormatInfoChunk(*formatInfo)
         self._buffer.seek(last_position)
 
+    def open_chunk(self, chunk_name):
+        """Get a read-only file-like object for the binary data of a named
+        chunk, which reads the data from the file as it is required rather
+        than all at once, or None if there is no such chunk. Reading from this
+        does not change the position of the sample data."""
+        if chunk_name not in self._chunks:
+            return None
+        return io.BufferedReader(_ChunkReader(self._buffer, self._chunks[chunk_name]))
+
     def get_chunk_data(self, chunk_name):
         """Read and return the binary data of a named chunk."""
         self._buffer.seek(self._chunks[chunk_name].position.data)
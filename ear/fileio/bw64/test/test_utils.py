@@ -2,7 +2,9 @@ from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 import numpy as np
 import pytest
-from ..utils import interleave, deinterleave, decode_pcm_samples, encode_pcm_samples
+from ..utils import (interleave, deinterleave, decode_pcm_samples, encode_pcm_samples, decode_samples,
+                     encode_samples, SampleEncoder)
+from ..chunks import Format
 
 
 def test_interleave():
@@ -41,6 +43,11 @@ def test_decode_pcm_samples():
     decoded32bit = decode_pcm_samples(encoded32bit, 32)
     assert np.allclose(decoded32bit, samples, atol=1e-4)
 
+    decoded24bit_float32 = decode_pcm_samples(encoded24bit, 24, dtype=np.float32)
+    assert decoded24bit_float32.dtype == np.float32
+    assert np.allclose(decoded24bit_float32, samples, atol=1e-4)
+    assert deinterleave(decoded24bit_float32, 1).dtype == np.float32
+
 
 def test_encode_pcm_samples():
     samples = [0.0, 1.0, -1.0, 0.5, -0.5]
@@ -55,3 +62,72 @@ def test_encode_pcm_samples():
     assert encoded24bit == b'\x00\x00\x00\xff\xff\x7f\x01\x00\x80\xff\xff\x3f\x01\x00\xc0'
     encoded32bit = encode_pcm_samples(samples, 32)
     assert encoded32bit == b'\x00\x00\x00\x00\xff\xff\xff\x7f\x01\x00\x00\x80\xff\xff\xff\x3f\x01\x00\x00\xc0'
+
+
+def test_interleave_many_channels():
+    x = np.random.uniform(-1, 1, size=(100, 128))
+    x_interleaved = interleave(x)
+    assert x_interleaved.shape == (100 * 128,)
+    assert np.all(deinterleave(x_interleaved, 128) == x)
+
+
+def test_encode_clip():
+    assert encode_pcm_samples([2.0, -2.0], 16) == b'\xff\x7f\x01\x80'
+
+
+@pytest.mark.parametrize("bitdepth", [16, 24, 32])
+def test_pcm_round_trip(bitdepth):
+    scale = 2**(bitdepth - 1) - 1
+    samples = np.random.randint(-scale, scale + 1, size=1000) / scale
+    encoded = encode_samples(samples, Format.PCM, bitdepth)
+    assert len(encoded) == 1000 * bitdepth // 8
+    assert np.allclose(decode_samples(encoded, Format.PCM, bitdepth), samples, rtol=0, atol=1e-12)
+
+
+@pytest.mark.parametrize("bitdepth,dtype", [(32, '<f4'), (64, '<f8')])
+def test_float_samples(bitdepth, dtype):
+    samples = np.array([0.0, 1.0, -1.0, 0.5, -0.5, 1.5, -2.0])
+
+    encoded = encode_samples(samples, Format.WAVE_FORMAT_IEEE_FLOAT, bitdepth)
+    assert encoded == samples.astype(dtype).tobytes()
+
+    # not clipped
+    decoded = decode_samples(encoded, Format.WAVE_FORMAT_IEEE_FLOAT, bitdepth)
+    assert decoded.dtype == np.float64
+    assert np.all(decoded == samples)
+
+    decoded_float32 = decode_samples(encoded, Format.WAVE_FORMAT_IEEE_FLOAT, bitdepth, dtype=np.float32)
+    assert decoded_float32.dtype == np.float32
+
+    with pytest.raises(RuntimeError) as excinfo:
+        encode_samples(samples, Format.WAVE_FORMAT_IEEE_FLOAT, 16)
+    assert str(excinfo.value) == 'unsupported bitdepth'
+
+
+@pytest.mark.parametrize("bitdepth", [16, 24, 32])
+@pytest.mark.parametrize("dtype", [np.float32, np.float64])
+def test_sample_encoder(bitdepth, dtype):
+    samples = np.random.uniform(-1.5, 1.5, size=(100, 5)).astype(dtype)
+
+    encoder = SampleEncoder(Format.PCM, bitdepth)
+    expected = encoder.encode(samples).tobytes()
+    scale = 2**(bitdepth - 1) - 1
+    decoded = decode_pcm_samples(expected, bitdepth).reshape(samples.shape)
+    assert np.allclose(decoded, np.clip(samples, -1, 1), rtol=0, atol=1.01 / scale + 1e-6)
+
+    # non-contiguous input
+    wide = np.zeros((100, 10), dtype=dtype)
+    wide[:, ::2] = samples
+    assert encoder.encode(wide[:, ::2]).tobytes() == expected
+
+    # caller-provided output
+    out = np.zeros(encoder.encoded_size(samples) + 2, dtype=np.uint8)
+    encoder.encode(samples, out=out[1:-1])
+    assert out[1:-1].tobytes() == expected
+    assert out[0] == 0 and out[-1] == 0
+
+
+def test_sample_encoder_full_scale_32bit():
+    encoder = SampleEncoder(Format.PCM, 32)
+    encoded = encoder.encode(np.array([1.0, -1.0], dtype=np.float32))
+    assert encoded.tobytes() == b'\xff\xff\xff\x7f\x01\x00\x00\x80'
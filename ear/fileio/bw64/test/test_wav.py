@@ -1,5 +1,6 @@
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
+import numpy as np
 import pytest
 import os
 from ... import openBw64
@@ -21,6 +22,7 @@ def test_rect_16bit(datafiles):
         assert infile.bitdepth == 16
         assert infile.chna is None
         assert infile.axml is None
+        assert infile.open_chunk(b"axml") is None
         assert infile.bext is None
 
 
@@ -138,3 +140,32 @@ def test_rect_24bit_wrong_fmt_size(datafiles):
         with openBw64(rect_24bit_wrong_fmt_size_path):
             pass
     assert str(excinfo.value) == 'illegal format chunk size'
+
+
+@pytest.mark.parametrize("filename", ['rect_16bit.wav', 'rect_24bit.wav', 'rect_32bit.wav', 'rect_24bit_rf64.wav'])
+def test_read_mmap(filename):
+    path = os.path.join(FIXTURE_DIR, filename)
+    with openBw64(path) as infile, openBw64(path, use_mmap=True) as infile_mmap:
+        assert len(infile_mmap) == len(infile)
+
+        for numberOfFrames in [0, 10, 1000, 100000]:
+            for dtype in [np.float64, np.float32]:
+                infile.seek(5)
+                infile_mmap.seek(5)
+                samples = infile_mmap.read(numberOfFrames, dtype)
+                assert samples.dtype == dtype
+                np.testing.assert_array_equal(samples, infile.read(numberOfFrames, dtype))
+                assert infile_mmap.tell() == infile.tell()
+
+        if infile.bitdepth in (16, 32):
+            samples = infile_mmap.samples
+            assert samples.shape == (len(infile), infile.channels)
+            assert not samples.flags.owndata
+            infile.seek(0)
+            np.testing.assert_array_equal(samples / float(2**(infile.bitdepth - 1) - 1), infile.read(len(infile)))
+        else:
+            with pytest.raises(ValueError):
+                infile_mmap.samples
+
+        with pytest.raises(ValueError):
+            infile.samples
@@ -1,8 +1,9 @@
 from __future__ import (absolute_import, division,
                         print_function, unicode_literals)
 from ... import openBw64
-from ..chunks import FormatInfoChunk, ChnaChunk, AudioID
+from ..chunks import FormatInfoChunk, ChnaChunk, AudioID, Format
 import numpy as np
+import pytest
 
 
 def test_rect_16bit(tmpdir):
@@ -82,6 +83,92 @@ def test_rect_32bit(tmpdir):
         assert np.allclose(infile.read(100), samples, atol=1e-04)
 
 
+@pytest.mark.parametrize("bitdepth", [32, 64])
+@pytest.mark.parametrize("extensible", [False, True])
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_float(tmpdir, bitdepth, extensible, use_mmap):
+    # includes values outside of (-1, 1), which should not be clipped
+    samples = np.random.uniform(-2, 2, size=(100, 3))
+    if extensible:
+        fmtInfo = FormatInfoChunk(formatTag=Format.WAVE_FORMAT_EXTENSIBLE,
+                                  channelCount=3,
+                                  sampleRate=48000,
+                                  bitsPerSample=bitdepth,
+                                  extraData=(bitdepth, 0, Format.WAVE_FORMAT_IEEE_FLOAT))
+    else:
+        fmtInfo = FormatInfoChunk(formatTag=Format.WAVE_FORMAT_IEEE_FLOAT,
+                                  channelCount=3,
+                                  sampleRate=48000,
+                                  bitsPerSample=bitdepth)
+    filename = str(tmpdir / 'test_float.wav')
+
+    with openBw64(filename, 'w', formatInfo=fmtInfo) as outfile:
+        assert outfile.formatTag == Format.WAVE_FORMAT_IEEE_FLOAT
+        outfile.write(samples)
+
+    with openBw64(filename, use_mmap=use_mmap) as infile:
+        assert infile.channels == 3
+        assert infile.bitdepth == bitdepth
+        assert infile.formatTag == Format.WAVE_FORMAT_IEEE_FLOAT
+        assert (infile._formatInfo.extraData is not None) == extensible
+        expected = samples.astype(np.float32) if bitdepth == 32 else samples
+        assert np.all(infile.read(100) == expected)
+
+
+@pytest.mark.parametrize("bitdepth", [16, 24, 32])
+def test_extensible_pcm(tmpdir, bitdepth):
+    samples = ((np.arange(100) % 100 < 50) - 0.5) * 2
+    samples = samples[None, :].T
+    fmtInfo = FormatInfoChunk(formatTag=Format.WAVE_FORMAT_EXTENSIBLE,
+                              channelCount=1,
+                              sampleRate=48000,
+                              bitsPerSample=bitdepth,
+                              extraData=(bitdepth, 0, Format.PCM))
+    filename = str(tmpdir / 'test_extensible.wav')
+
+    with openBw64(filename, 'w', formatInfo=fmtInfo) as outfile:
+        outfile.write(samples)
+
+    with open(filename, 'rb') as f:
+        data = f.read()
+    fmt_start = data.index(b'fmt ')
+    assert data[fmt_start + 4:fmt_start + 10] == b'\x28\x00\x00\x00\xfe\xff'
+
+    with openBw64(filename) as infile:
+        assert infile.bitdepth == bitdepth
+        assert infile.formatTag == Format.PCM
+        assert np.allclose(infile.read(100), samples, atol=1e-04)
+
+
+@pytest.mark.parametrize("writeBufferSize", [0, 1000, 10**6])
+def test_write_buffer(tmpdir, writeBufferSize):
+    samples = np.random.uniform(-1.5, 1.5, size=(1000, 2))
+    samples[:, 1] *= 0.5
+    fmtInfo = FormatInfoChunk(channelCount=2, bitsPerSample=24)
+    filename = str(tmpdir / 'test_write_buffer.wav')
+
+    with openBw64(filename, 'w', formatInfo=fmtInfo, writeBufferSize=writeBufferSize, axml=b"FAKEXML") as outfile:
+        # blocks which are smaller and larger than the buffer
+        for start, end in [(0, 10), (10, 20), (20, 500), (500, 1000)]:
+            outfile.write(samples[start:end])
+
+        assert np.all(outfile.peak == np.max(np.abs(samples), axis=0))
+        assert np.all(outfile.clippedSamples == np.count_nonzero(np.abs(samples) > 1, axis=0))
+        assert outfile.clippedSamples[1] == 0
+
+    with openBw64(filename) as infile:
+        assert len(infile) == 1000
+        assert infile.axml == b"FAKEXML"
+
+        # chunk reads are interleaved with sample reads without affecting them
+        axml_file = infile.open_chunk(b"axml")
+        assert axml_file.read(4) == b"FAKE"
+        assert np.allclose(infile.read(500), np.clip(samples[:500], -1, 1), atol=1e-06)
+        assert axml_file.read() == b"XML"
+        assert axml_file.read() == b""
+        assert np.allclose(infile.read(500), np.clip(samples[500:], -1, 1), atol=1e-06)
+
+
 def test_force_bw64(tmpdir):
     samples = ((np.arange(100) % 100 < 50) - 0.5) * 2
     samples = samples[None, :].T
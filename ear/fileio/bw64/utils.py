@@ -1,62 +1,171 @@
 import numpy as np
+from .chunks import Format
 
 
 def interleave(deinterleaved):
-    deinterleaved = np.array(deinterleaved)
-    channels = deinterleaved.shape[1]
-    if channels == 1:
-        return deinterleaved.T[0]
-    interleaved = np.empty(deinterleaved.size)
-    for channel in range(channels):
-        interleaved[channel::channels] = deinterleaved[:, channel].T
-    return interleaved
+    """Interleave an array of (frames, channels) samples into a 1D array."""
+    return np.ascontiguousarray(deinterleaved).reshape(-1)
 
 
 def deinterleave(interleaved, channels):
-    interleaved = np.array(interleaved)
-    if channels == 1:
-        return interleaved[None, :].T
-    interleaved = np.array(interleaved)
-    numberOfFrames = int(interleaved.size / channels)
-    deinterleaved = np.empty([numberOfFrames, channels])
-    for channel in range(channels):
-        deinterleaved[:, channel] = interleaved[channel::channels]
-    return deinterleaved
-
-
-def decode_pcm_samples(samples, bitdepth):
-    numberOfSamples = len(samples) // (bitdepth // 8)
+    """Deinterleave a 1D array of samples into a (frames, channels) array;
+    this is a view of interleaved if possible."""
+    return np.asarray(interleaved).reshape(-1, channels)
+
+
+def _decode_24bit(samples):
+    """Decode packed little-endian 24 bit samples to int32."""
+    samples_8bit = np.frombuffer(samples, dtype='uint8').reshape(-1, 3)
+
+    # place the 3 bytes of each sample in the top of an int32, so that the
+    # sign is correct, then shift down
+    decodedSamples = np.zeros((len(samples_8bit), 4), dtype='uint8')
+    decodedSamples[:, 1:] = samples_8bit
+    decodedSamples = decodedSamples.view('<i4').reshape(-1)
+    decodedSamples >>= 8
+    return decodedSamples
+
+
+def decode_pcm_samples(samples, bitdepth, dtype=np.float64):
     if(bitdepth == 16):
-        decodedSamples = np.frombuffer(samples, dtype='int16')
+        decodedSamples = np.frombuffer(samples, dtype='<i2')
     elif(bitdepth == 24):
-        samples_8bit = np.frombuffer(samples, dtype='int8')
-        decodedSamples = np.zeros(numberOfSamples, dtype='int32')
-        decodedSamples.view(dtype='int8')[0::4] = samples_8bit[0::3]
-        decodedSamples.view(dtype='int8')[1::4] = samples_8bit[1::3]
-        decodedSamples.view(dtype='int8')[2::4] = samples_8bit[2::3]
-        decodedSamples[decodedSamples > 2**23 - 1] = (
-            decodedSamples[decodedSamples > 2**23 - 1] - 2**24
-        )
+        decodedSamples = _decode_24bit(samples)
     elif(bitdepth == 32):
-        decodedSamples = np.frombuffer(samples, dtype='int32')
+        decodedSamples = np.frombuffer(samples, dtype='<i4')
     else:
         raise RuntimeError('unsupported bitdepth')
-    return decodedSamples / float((2**(bitdepth - 1) - 1))
+    return decodedSamples.astype(dtype) / np.asarray(2**(bitdepth - 1) - 1, dtype=dtype)
 
 
 def encode_pcm_samples(samples, bitdepth):
-    samples = np.array(samples)
-    samples[samples > 1.0] = 1.0
-    samples[samples < -1.0] = -1.0
-    scaledSamples = samples * (2**(bitdepth - 1) - 1)
-    if(bitdepth == 16):
-        encodedSamples = scaledSamples.astype('int16').tobytes()
-    elif(bitdepth == 24):
-        encodedSamples = scaledSamples.astype('int32').tobytes()
-        encodedSamples = bytearray(encodedSamples)
-        del encodedSamples[3::4]
-    elif(bitdepth == 32):
-        encodedSamples = scaledSamples.astype('int32').tobytes()
+    return SampleEncoder(Format.PCM, bitdepth).encode(samples).tobytes()
+
+
+def decode_float_samples(samples, bitdepth, dtype=np.float64):
+    if(bitdepth == 32):
+        decodedSamples = np.frombuffer(samples, dtype='<f4')
+    elif(bitdepth == 64):
+        decodedSamples = np.frombuffer(samples, dtype='<f8')
     else:
         raise RuntimeError('unsupported bitdepth')
-    return encodedSamples
+    return decodedSamples.astype(dtype)
+
+
+def encode_float_samples(samples, bitdepth):
+    """Encode IEEE float samples; unlike encode_pcm_samples, samples are not
+    clipped."""
+    return SampleEncoder(Format.WAVE_FORMAT_IEEE_FLOAT, bitdepth).encode(samples).tobytes()
+
+
+def decode_samples(samples, formatTag, bitdepth, dtype=np.float64):
+    """Decode interleaved samples in a given format (Format.PCM or
+    Format.WAVE_FORMAT_IEEE_FLOAT) and bit depth."""
+    if formatTag == Format.WAVE_FORMAT_IEEE_FLOAT:
+        return decode_float_samples(samples, bitdepth, dtype)
+    else:
+        return decode_pcm_samples(samples, bitdepth, dtype)
+
+
+def encode_samples(samples, formatTag, bitdepth):
+    """Encode interleaved samples in a given format (Format.PCM or
+    Format.WAVE_FORMAT_IEEE_FLOAT) and bit depth."""
+    if formatTag == Format.WAVE_FORMAT_IEEE_FLOAT:
+        return encode_float_samples(samples, bitdepth)
+    else:
+        return encode_pcm_samples(samples, bitdepth)
+
+
+# types used to store encoded samples, other than packed 24 bit samples
+_encoded_types = {
+    (Format.PCM, 16): np.dtype('<i2'),
+    (Format.PCM, 32): np.dtype('<i4'),
+    (Format.WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype('<f4'),
+    (Format.WAVE_FORMAT_IEEE_FLOAT, 64): np.dtype('<f8'),
+}
+
+
+class SampleEncoder(object):
+    """Encode float samples into a reusable byte buffer.
+
+    Samples are scaled, clipped (for PCM) and converted straight into the
+    output buffer, without making an interleaved copy of the input; the
+    buffers used are kept between calls, so encoding blocks of the same size
+    does not allocate.
+
+    Parameters:
+        formatTag (Format): Format.PCM or Format.WAVE_FORMAT_IEEE_FLOAT
+        bitdepth (int): number of bits per sample
+    """
+
+    def __init__(self, formatTag, bitdepth):
+        if (formatTag, bitdepth) not in _encoded_types and (formatTag, bitdepth) != (Format.PCM, 24):
+            raise RuntimeError('unsupported bitdepth')
+
+        self.formatTag = formatTag
+        self.bitdepth = bitdepth
+
+        self._out = np.zeros(0, dtype=np.uint8)
+        self._scaled = np.zeros(0)
+        self._int24 = np.zeros(0, dtype='<i4')
+
+    @staticmethod
+    def _get_buffer(buf, size, dtype):
+        """Get an array of size elements of dtype from the start of buf,
+        re-allocating it if it is too small or the wrong type."""
+        if len(buf) < size or buf.dtype != dtype:
+            buf = np.empty(size, dtype=dtype)
+        return buf, buf[:size]
+
+    def encoded_size(self, samples):
+        """Number of bytes needed to encode an array of samples."""
+        return np.size(samples) * (self.bitdepth // 8)
+
+    def encode(self, samples, out=None):
+        """Encode samples.
+
+        Parameters:
+            samples (array of float): samples to encode, in interleaved order
+                if flattened; for a block of samples this is an array of
+                (frames, channels), which need not be contiguous
+            out (array of uint8 or None): array of encoded_size(samples) bytes
+                to write the encoded samples to; if None, an internal buffer
+                is used, which is overwritten on the next call
+
+        Returns:
+            array of uint8: encoded samples
+        """
+        samples = np.asarray(samples)
+
+        if out is None:
+            self._out, out = self._get_buffer(self._out, self.encoded_size(samples), np.uint8)
+        assert len(out) == self.encoded_size(samples)
+
+        if self.formatTag == Format.WAVE_FORMAT_IEEE_FLOAT:
+            encoded_type = _encoded_types[self.formatTag, self.bitdepth]
+            np.copyto(out.view(encoded_type).reshape(samples.shape), samples, casting='unsafe')
+            return out
+
+        # full scale for 32 bit samples is not exactly representable in
+        # float32, so scale these in float64
+        if self.bitdepth == 32 or not np.issubdtype(samples.dtype, np.floating):
+            scaled_type = np.dtype(np.float64)
+        else:
+            scaled_type = samples.dtype
+
+        scale = 2**(self.bitdepth - 1) - 1
+        self._scaled, scaled = self._get_buffer(self._scaled, samples.size, scaled_type)
+        scaled = scaled.reshape(samples.shape)
+        np.multiply(samples, scale, out=scaled)
+        np.clip(scaled, -scale, scale, out=scaled)
+
+        if self.bitdepth == 24:
+            self._int24, int24 = self._get_buffer(self._int24, samples.size, np.dtype('<i4'))
+            np.copyto(int24.reshape(samples.shape), scaled, casting='unsafe')
+            # the low 3 bytes of each little-endian int32
+            out.reshape(-1, 3)[:] = int24.view(np.uint8).reshape(-1, 4)[:, :3]
+        else:
+            encoded_type = _encoded_types[self.formatTag, self.bitdepth]
+            np.copyto(out.view(encoded_type).reshape(samples.shape), scaled, casting='unsafe')
+
+        return out
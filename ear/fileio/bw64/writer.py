@@ -1,17 +1,18 @@
 import struct
 import numpy as np
-from .chunks import ChunkIndex, FormatInfoChunk, DataSize64Chunk
-from .utils import interleave, encode_pcm_samples
+from .chunks import ChunkIndex, FormatInfoChunk, DataSize64Chunk, Format
+from .utils import SampleEncoder
 
 
 class Bw64Writer(object):
 
     def __init__(self, buffer, formatInfo=FormatInfoChunk(), chna=None,
-                 axml=None, bext=None, forceBw64=False):
+                 axml=None, bext=None, forceBw64=False, writeBufferSize=0):
         """Write / create a new bw64 file to buffer.
 
-        File format will be setup according to the specified formatinfo. Only
-        PCM data (16bit, 24bit, 32bit) is currently supported.
+        File format will be setup according to the specified formatinfo. PCM
+        data (16bit, 24bit, 32bit) and IEEE float data (32bit, 64bit) are
+        supported, optionally using WAVE_FORMAT_EXTENSIBLE.
 
         If axml data is given on construction, it will be written to the BW64
         file immediatly. If this is not possible on construction, one can use
@@ -21,6 +22,15 @@ class Bw64Writer(object):
         After creation, sample data can be written to the `data` using `write`.
         The file will be finalized by calling `close()`.
 
+        Samples are encoded into a reusable buffer. If writeBufferSize is
+        non-zero, encoded blocks are collected in a buffer of this many bytes,
+        which is written to buffer when full, so that small blocks do not
+        result in many small writes.
+
+        While writing, the peak absolute sample value and the number of
+        clipped samples in each channel are recorded in `peak` and
+        `clippedSamples`.
+
         Note
         ----
         If you forget to `close()` the output object, the resulting file will
@@ -33,6 +43,9 @@ class Bw64Writer(object):
             Target format of the BW64 file.
         axml: str
             Content for the axml chunk.
+        writeBufferSize: int
+            Size of the write buffer in bytes, or 0 to write each block
+            directly.
         """
         self._buffer = buffer
         self._chunks = {}
@@ -46,6 +59,13 @@ class Bw64Writer(object):
         self._bext = bext
         self._forceBw64 = forceBw64
 
+        self._encoder = SampleEncoder(formatInfo.formatTag, formatInfo.bitsPerSample)
+        self._writeBuffer = np.zeros(writeBufferSize, dtype=np.uint8)
+        self._writeBufferUsed = 0
+
+        self.peak = np.zeros(formatInfo.channelCount)
+        self.clippedSamples = np.zeros(formatInfo.channelCount, dtype=np.int64)
+
         self._buffer.seek(0)
         self._write_riff_chunk()
         self._write_junk_chunk()
@@ -77,6 +97,10 @@ class Bw64Writer(object):
     def bitdepth(self):
         return self._formatInfo.bitsPerSample
 
+    @property
+    def formatTag(self):
+        return self._formatInfo.formatTag
+
     @property
     def chna(self):
         return self._chna
@@ -108,14 +132,41 @@ class Bw64Writer(object):
         ----------
         samples: array - like, dtype float
             Array of audio samples, columns correspond to channels
-            Expects float sample values in the range(-1, 1).
+            Expects float sample values in the range(-1, 1); for PCM
+            formats, values outside of this range are clipped.
         """
-        assert np.array(samples).shape[1] == self.channels
+        samples = np.asarray(samples)
+        assert samples.ndim == 2 and samples.shape[1] == self.channels
+
+        self._update_stats(samples)
 
-        samplesInterleaved = interleave(samples)
-        samplesEncoded = encode_pcm_samples(samplesInterleaved, self.bitdepth)
-        self._buffer.write(samplesEncoded)
-        self._dataBytesWritten += len(samplesEncoded)
+        size = self._encoder.encoded_size(samples)
+        if self._writeBufferUsed + size > len(self._writeBuffer):
+            self._flush_write_buffer()
+
+        if size <= len(self._writeBuffer):
+            # encode straight into the write buffer
+            end = self._writeBufferUsed + size
+            self._encoder.encode(samples, out=self._writeBuffer[self._writeBufferUsed:end])
+            self._writeBufferUsed = end
+        else:
+            self._buffer.write(self._encoder.encode(samples).data)
+        self._dataBytesWritten += size
+
+    def _update_stats(self, samples):
+        """Update peak and clippedSamples for a block of samples."""
+        blockPeak = np.maximum(np.max(samples, axis=0, initial=0.0),
+                               -np.min(samples, axis=0, initial=0.0))
+        np.maximum(self.peak, blockPeak, out=self.peak)
+
+        # only look for clipped samples in blocks which contain them
+        if self.formatTag == Format.PCM and np.any(blockPeak > 1.0):
+            self.clippedSamples += np.count_nonzero(np.abs(samples) > 1.0, axis=0)
+
+    def _flush_write_buffer(self):
+        if self._writeBufferUsed:
+            self._buffer.write(self._writeBuffer[:self._writeBufferUsed].data)
+            self._writeBufferUsed = 0
 
     def close(self):
         """Close and finalize the BW64 output.
@@ -126,6 +177,8 @@ class Bw64Writer(object):
         corrupted. Thus, it might be a good idea to use this with a
         contextmanager.
         """
+        self._flush_write_buffer()
+
         if not self._chnaChunkWritten and self._chna:
             self._write_chna_chunk()
         if not self._axmlChunkWritten and self._axml:
@@ -1,7 +1,8 @@
 import logging
+import numpy as np
 from .bw64 import Bw64Reader, Bw64Writer
 from .adm.adm import ADM
-from .adm.xml import load_axml_string
+from .adm.xml import load_axml_file
 from .adm.common_definitions import load_common_definitions
 from .adm.chna import load_chna_chunk
 
@@ -25,11 +26,14 @@ def openBw64(filename, mode='r', **kwargs):
         raise RuntimeError('unknown mode: ' + str(mode))
 
 
-def openBw64Adm(filename, fix_block_format_durations=False):
+def openBw64Adm(filename, fix_block_format_durations=False, use_mmap=False, lazy_block_formats=False,
+                block_format_columns=False, lazy_common_definitions=False):
     fileHandle = open(filename, 'rb')
     try:
-        bw64FileHandle = Bw64Reader(fileHandle)
-        return Bw64AdmReader(bw64FileHandle, fix_block_format_durations)
+        bw64FileHandle = Bw64Reader(fileHandle, use_mmap=use_mmap)
+        return Bw64AdmReader(bw64FileHandle, fix_block_format_durations, lazy_block_formats=lazy_block_formats,
+                             block_format_columns=block_format_columns,
+                             lazy_common_definitions=lazy_common_definitions)
     except:  # noqa: E722
         fileHandle.close()
         raise
@@ -37,10 +41,14 @@ def openBw64Adm(filename, fix_block_format_durations=False):
 
 class Bw64AdmReader(object):
 
-    def __init__(self, bw64FileHandle, fix_block_format_durations=False):
+    def __init__(self, bw64FileHandle, fix_block_format_durations=False, lazy_block_formats=False,
+                 block_format_columns=False, lazy_common_definitions=False):
         self.logger = logging.getLogger(__name__)
         self._bw64 = bw64FileHandle
         self._fix_block_format_durations = fix_block_format_durations
+        self._lazy_block_formats = lazy_block_formats
+        self._block_format_columns = block_format_columns
+        self._lazy_common_definitions = lazy_common_definitions
         self.adm = self._parse_adm()
 
     def __enter__(self):
@@ -65,22 +73,40 @@ class Bw64AdmReader(object):
     def bitdepth(self):
         return self._bw64.bitdepth
 
+    @property
+    def formatTag(self):
+        return self._bw64.formatTag
+
     @property
     def selected_items(self):
         from ..core.select_items import select_rendering_items
         return select_rendering_items(self.adm)
 
-    def iter_sample_blocks(self, blockSize):
+    def __len__(self):
+        """Returns number of frames."""
+        return len(self._bw64)
+
+    def seek(self, offset):
+        """Seek to a frame offset from the start of the samples."""
+        self._bw64.seek(offset)
+
+    def iter_sample_blocks(self, blockSize, dtype=np.float64):
         """Read samples blockwise until next ChangeSet and yield it."""
         while(self._bw64.tell() != len(self._bw64)):
-            yield self._bw64.read(blockSize)
+            yield self._bw64.read(blockSize, dtype)
 
     def _parse_adm(self):
         adm = ADM()
-        load_common_definitions(adm)
-        if self._bw64.axml is not None:
+        load_common_definitions(adm, lazy=self._lazy_common_definitions)
+        # parse the axml chunk straight from the file, so that it is never all
+        # in memory
+        axml_file = self._bw64.open_chunk(b'axml')
+        if axml_file is not None:
             self.logger.info("Parsing")
-            load_axml_string(adm, self._bw64.axml, fix_block_format_durations=self._fix_block_format_durations)
+            load_axml_file(adm, axml_file,
+                           fix_block_format_durations=self._fix_block_format_durations,
+                           lazy_block_formats=self._lazy_block_formats,
+                           block_format_columns=self._block_format_columns)
             self.logger.info("Parsing done!")
         load_chna_chunk(adm, self._bw64.chna)
         return adm